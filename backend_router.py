@@ -0,0 +1,231 @@
+"""Health-aware routing across translatepy's backend services.
+
+translatepy's ``Translator`` tries its services in a fixed order, so one slow
+or failing upstream delays every request. ``BackendRouter`` keeps per-backend
+latency and error statistics, opens a circuit on backends that keep failing,
+tries the fastest healthy backend first and can optionally hedge a request
+by firing the next backend when the first has not answered within its p95
+latency. Each hedged attempt is made by the caller on its own pooled client
+(see ``hedged``), so a losing attempt never shares a client with anyone.
+Throttling errors of any backend are reported to the rate limiter, if one is
+given, even when the next backend then answers.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional
+
+from translatepy import Language
+from translatepy.exceptions import NoResult
+
+import metrics
+from rate_limiter import RateLimiter, is_throttling_error
+
+# Consecutive failures before a backend's circuit opens, and how long it stays open
+FAILURE_THRESHOLD = int(os.environ.get("BACKEND_FAILURE_THRESHOLD", "3"))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get("BACKEND_CIRCUIT_OPEN_SECONDS", "60"))
+
+# Hedged requests (off by default): fire the next backend when the first is slower than its p95
+HEDGE_REQUESTS = os.environ.get("BACKEND_HEDGE_REQUESTS", "0") == "1"
+HEDGE_MIN_SAMPLES = 20
+
+# Number of recent calls kept per backend for percentiles and error rates
+WINDOW = 200
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class BackendStats:
+    """Rolling latency and outcome statistics for one backend"""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=WINDOW)
+        self.outcomes = deque(maxlen=WINDOW)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def p50(self) -> Optional[float]:
+        return _percentile(list(self.latencies), 0.50)
+
+    def p95(self) -> Optional[float]:
+        return _percentile(list(self.latencies), 0.95)
+
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class BackendRouter:
+    """Routes translations to the fastest healthy backend (shared by all sessions)"""
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, open_seconds: float = CIRCUIT_OPEN_SECONDS,
+                 hedge: bool = HEDGE_REQUESTS, max_workers: int = 32, limiter: Optional[RateLimiter] = None):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.hedge = hedge
+        self.limiter = limiter
+        self._stats = {}
+        self._backends = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers) if hedge else None
+
+    def bind(self, translator, backend: Optional[str] = None) -> 'RoutedTranslator':
+        """Wrap a translator so its translations go through this router (only to ``backend``, if given)"""
+        return RoutedTranslator(translator, self, backend)
+
+    def record(self, name: str, latency: float, ok: bool) -> None:
+        """Record the outcome of one upstream call"""
+        with self._lock:
+            stats = self._stats.setdefault(name, BackendStats())
+            stats.outcomes.append(ok)
+            if ok:
+                stats.latencies.append(latency)
+                stats.consecutive_failures = 0
+                stats.open_until = 0.0
+            else:
+                stats.consecutive_failures += 1
+                if stats.consecutive_failures >= self.failure_threshold:
+                    stats.open_until = time.monotonic() + self.open_seconds
+
+    def order(self, names: List[str]) -> List[str]:
+        """Healthy backends by median latency, untried ones first in configured order.
+
+        Backends with an open circuit are skipped; once the open period has
+        passed one request is let through as a trial (half-open). If every
+        circuit is open, all backends are returned so requests are not
+        refused outright.
+        """
+        now = time.monotonic()
+        healthy = []
+        with self._lock:
+            for position, name in enumerate(names):
+                stats = self._stats.get(name)
+                if stats is not None and stats.open_until:
+                    if now < stats.open_until:
+                        continue
+                    # Half-open: let this request through as a trial and keep
+                    # the circuit armed for everyone else until it succeeds
+                    stats.open_until = now + self.open_seconds
+                latency = stats.p50() if stats is not None else None
+                healthy.append((latency or 0.0, position, name))
+        if not healthy:
+            return list(names)
+        return [name for _, _, name in sorted(healthy)]
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """p95 latency of a backend, once enough samples exist"""
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None or len(stats.latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            return stats.p95()
+
+    def snapshot(self) -> List[dict]:
+        """Per-backend health for display"""
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                'backend': name,
+                'p50_ms': (stats.p50() or 0.0) * 1000,
+                'p95_ms': (stats.p95() or 0.0) * 1000,
+                'error_rate': stats.error_rate(),
+                'calls': len(stats.outcomes),
+                'circuit': 'open' if now < stats.open_until else ('half-open' if stats.open_until else 'closed'),
+            } for name, stats in sorted(self._stats.items())]
+
+    def translate(self, translator, text: str, dest_lang: str, src_lang: str = 'auto',
+                  backend: Optional[str] = None):
+        """Translate with the best available backend of ``translator``, or only with ``backend``"""
+        services = getattr(translator, 'services', None)
+        if not services:
+            return translator.translate(text, dest_lang, src_lang)
+
+        names = [_service_name(service) for service in services]
+        self._backends = names
+        by_name = dict(zip(names, range(len(services))))
+        candidates = [backend] if backend in by_name else self.order(names)
+        dest = Language(dest_lang)
+        source = Language(src_lang)
+
+        def call(name: str):
+            index = by_name[name]
+            service = translator._instantiate_translator(services[index], services, index)
+            start = time.monotonic()
+            try:
+                result = service.translate(text=text, destination_language=dest, source_language=source)
+                if result is None:
+                    raise NoResult(f"{name} did not return any value")
+            except Exception as e:
+                self.record(name, time.monotonic() - start, False)
+                metrics.observe('translation_upstream_seconds', time.monotonic() - start, backend=name, outcome='error')
+                if self.limiter is not None and is_throttling_error(e):
+                    self.limiter.report_throttled()
+                raise
+            self.record(name, time.monotonic() - start, True)
+            metrics.observe('translation_upstream_seconds', time.monotonic() - start, backend=name, outcome='ok')
+            return result
+
+        last_error = None
+        for name in candidates:
+            try:
+                return call(name)
+            except Exception as e:
+                last_error = e
+        raise NoResult(f"No service has returned a valid result ({last_error})")
+
+    def hedged(self, attempt: Callable[[Optional[str], bool], object]):
+        """Run ``attempt(backend, hedge)`` on the best backend, hedging on the next ones.
+
+        The next backend is started whenever every attempt in flight has
+        failed or the newest one exceeds its p95 latency; the first success
+        wins. ``attempt`` must borrow its own client (and pass the rate
+        limiter) so an attempt that loses can finish on its own. ``hedge`` is
+        True for attempts started while another is still in flight. Until the
+        backends are known, or with hedging off, this is one plain attempt.
+        """
+        if self._executor is None or not self._backends:
+            return attempt(None, False)
+
+        in_flight = {}
+        remaining = self.order(self._backends)
+        delay = None
+        last_error = None
+        while remaining or in_flight:
+            if remaining:
+                name = remaining.pop(0)
+                in_flight[self._executor.submit(attempt, name, bool(in_flight))] = name
+                delay = self.hedge_delay(name)
+            done, _ = wait(in_flight, timeout=delay if remaining else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_error = e
+        raise NoResult(f"No service has returned a valid result ({last_error})")
+
+
+class RoutedTranslator:
+    """Drop-in translator whose ``translate`` goes through a ``BackendRouter``"""
+
+    def __init__(self, translator, router: BackendRouter, backend: Optional[str] = None):
+        self.translator = translator
+        self.router = router
+        self.backend = backend
+
+    def translate(self, text: str, destination_language: str, source_language: str = 'auto'):
+        return self.router.translate(self.translator, text, destination_language, source_language, self.backend)
+
+    def language(self, text: str):
+        return self.translator.language(text)
+
+
+def _service_name(service) -> str:
+    """Stable backend name for an instantiated or not-yet-instantiated service"""
+    return service.__name__ if isinstance(service, type) else type(service).__name__
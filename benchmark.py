@@ -0,0 +1,440 @@
+"""Offline benchmark of the translation pipeline against a simulated backend.
+
+The full stack used by the app (translator pool, backend router, rate
+limiter, request coalescing, translation cache and memory) is driven the
+same way ``translate_text`` and ``translate_file_content`` drive it, but
+every upstream call goes to an in-process mock with configurable latency,
+jitter, error rate and throttling. Nothing touches the network.
+
+Each scenario reports throughput, p50/p99 latency, upstream call counts and
+peak memory: the process peak RSS, plus the scenario's own peak allocations
+with ``--trace-memory`` (which slows CPU-bound stages noticeably). Results
+are written as JSON so runs of different versions can be compared with
+``--baseline``::
+
+    python benchmark.py --quick
+    python benchmark.py --latency-ms 80 --error-rate 0.05 --output after.json --baseline before.json
+"""
+import argparse
+import io
+import json
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, List, Optional
+
+from backend_router import BackendRouter
+from rate_limiter import RateLimiter
+from request_coalescing import RequestCoalescer
+from translation_cache import TranslationCache
+from translation_engine import SpooledOutput
+from translation_memory import TranslationMemory
+from translation_service import TranslationService, read_text
+from translator_pool import TranslatorPool
+
+# Default location of the machine-readable results
+RESULTS_PATH = "bench_results.json"
+
+# Document sizes (characters) and file types of the synthetic corpus
+FILE_SIZES = (10_000, 100_000, 1_000_000)
+QUICK_FILE_SIZES = (10_000, 50_000)
+FILE_TYPES = ('txt', 'md', 'json', 'csv', 'py', 'html')
+TEXT_SIZES = (200, 2_000, 10_000)
+
+# French vocabulary, so local language detection behaves as with real uploads
+WORDS = (
+    "le la les des et est un une que qui dans pour pas sur avec ce il vous nous je du au mais "
+    "maison ville temps jour année monde travail projet document fichier traduction langue "
+    "nouveau grand petit premier dernier important rapide simple général public équipe client "
+    "service produit système version modèle rapport réunion semaine matin soir question réponse "
+    "voir faire prendre donner trouver utiliser envoyer recevoir préparer vérifier changer"
+).split()
+
+
+class MockResult:
+    """Shape of a translatepy result as used by the engine"""
+
+    def __init__(self, result: str, source_language: Optional[str], service: str):
+        self.result = result
+        self.source_language = source_language
+        self.service = service
+
+
+class MockBackend:
+    """Simulated upstream shared by all mock services.
+
+    Latency, jitter and failures are drawn from a generator seeded with the
+    request text and how often it was seen, so a run is reproducible no
+    matter how threads interleave. Requests beyond ``throttle_rps`` (per
+    rolling second) fail with a 429-style error.
+    """
+
+    def __init__(self, latency: float, jitter: float, error_rate: float, throttle_rps: float, seed: int):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rps = throttle_rps
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._recent = []
+        self.calls = 0
+        self.characters = 0
+        self.errors = 0
+        self.throttled = 0
+
+    def call(self, text: str, operation: str) -> None:
+        """Account for one request and simulate its latency and outcome"""
+        now = time.monotonic()
+        with self._lock:
+            attempt = self._seen.get((operation, text), 0)
+            self._seen[(operation, text)] = attempt + 1
+            self.calls += 1
+            self.characters += len(text)
+            self._recent = [t for t in self._recent if now - t < 1.0]
+            throttled = bool(self.throttle_rps) and len(self._recent) >= self.throttle_rps
+            if throttled:
+                self.throttled += 1
+            else:
+                self._recent.append(now)
+
+        rng = random.Random(f"{self.seed}:{operation}:{attempt}:{text}")
+        time.sleep(max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter)))
+        if throttled:
+            raise RuntimeError("429 Too Many Requests")
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise RuntimeError("Simulated upstream failure")
+
+    def counters(self) -> dict:
+        with self._lock:
+            return {'calls': self.calls, 'characters': self.characters,
+                    'errors': self.errors, 'throttled': self.throttled}
+
+
+class MockService:
+    """One simulated translation service; translation prefixes each line with the target"""
+
+    def __init__(self, backend: MockBackend):
+        self.backend = backend
+
+    def translate(self, text: str, destination_language, source_language='auto'):
+        self.backend.call(text, 'translate')
+        target = getattr(destination_language, 'alpha2', destination_language)
+        source = getattr(source_language, 'alpha2', source_language)
+        translation = '\n'.join(f"[{target}] {line}" if line.strip() else line for line in text.split('\n'))
+        return MockResult(translation, 'fr' if source in (None, 'auto') else source, type(self).__name__)
+
+
+class MockTranslator:
+    """Stand-in for translatepy's ``Translator`` with several mock services"""
+
+    def __init__(self, backend: MockBackend, service_count: int = 2):
+        # Distinct classes so the router tracks each service under its own name
+        self.services = [type(f"MockService{i}", (MockService,), {})(backend) for i in range(service_count)]
+        self.backend = backend
+
+    def _instantiate_translator(self, service, services, index):
+        return service
+
+    def translate(self, text: str, destination_language: str, source_language: str = 'auto'):
+        last_error = None
+        for service in self.services:
+            try:
+                return service.translate(text, destination_language, source_language)
+            except Exception as e:
+                last_error = e
+        raise last_error
+
+    def language(self, text: str):
+        self.backend.call(text, 'language')
+        return MockResult('fr', 'fr', 'MockService0')
+
+
+class Pipeline(TranslationService):
+    """The app's translation service wired to a mock backend (cold cache and memory)"""
+
+    def __init__(self, backend: MockBackend, args):
+        limiter = RateLimiter(rate=args.rate, burst=args.burst)
+        super().__init__(
+            pool=TranslatorPool(size=args.pool_size, factory=lambda: MockTranslator(backend)),
+            router=BackendRouter(limiter=limiter),
+            limiter=limiter,
+            coalescer=RequestCoalescer(),
+            cache=TranslationCache(path=''),
+            memory=TranslationMemory(path=''),
+            max_workers=args.concurrency
+        )
+
+    def translate_uploads(self, files: List[tuple], src_lang: str, dest_lang: str) -> List[tuple]:
+        """Same path as a batch job: streamed decoding into spooled outputs"""
+        results = self.translate_documents(
+            [read_text(io.BytesIO(data), name) for name, data in files], [name for name, _ in files],
+            src_lang, [dest_lang], user='benchmark',
+            sinks=[[SpooledOutput()] for _ in files], sizes=[len(data) for _, data in files]
+        )
+        return [outputs[0] for outputs in results]
+
+
+# Synthetic corpora
+
+def sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+    return ' '.join(words).capitalize() + rng.choice('..........?!')
+
+
+def paragraph(rng: random.Random) -> str:
+    return ' '.join(sentence(rng) for _ in range(rng.randint(2, 6)))
+
+
+def make_text(size: int, rng: random.Random) -> str:
+    parts = []
+    length = 0
+    while length < size:
+        parts.append(paragraph(rng))
+        length += len(parts[-1]) + 2
+    return '\n\n'.join(parts)
+
+
+def make_document(file_type: str, size: int, rng: random.Random) -> str:
+    """Synthetic document of roughly ``size`` characters in the given format"""
+    parts = []
+    length = 0
+    i = 0
+    while length < size:
+        i += 1
+        if file_type == 'json':
+            parts.append(json.dumps({'id': i, 'title': sentence(rng), 'body': paragraph(rng)}, ensure_ascii=False))
+        elif file_type == 'csv':
+            parts.append(f'{i},"{sentence(rng)}","{paragraph(rng)}"')
+        elif file_type == 'py':
+            parts.append(f'# {sentence(rng)}\ndef step_{i}():\n    return "{sentence(rng)}"\n')
+        elif file_type == 'html':
+            parts.append(f'<h2>{sentence(rng)}</h2>\n<p>{paragraph(rng)}</p>')
+        elif file_type == 'md':
+            parts.append(f'## {sentence(rng)}\n\n{paragraph(rng)}\n\n- {sentence(rng)}\n- {sentence(rng)}')
+        else:
+            parts.append(paragraph(rng))
+        length += len(parts[-1]) + 2
+
+    if file_type == 'json':
+        return '[\n' + ',\n'.join(parts) + '\n]\n'
+    if file_type == 'csv':
+        return 'id,title,body\n' + '\n'.join(parts) + '\n'
+    if file_type == 'py':
+        return '\n\n'.join(parts)
+    if file_type == 'html':
+        return '<html><body>\n' + '\n'.join(parts) + '\n</body></html>\n'
+    return '\n\n'.join(parts) + '\n'
+
+
+# Measurement
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_scenario(name: str, args, operations: List[Callable[[Pipeline], int]], **params) -> dict:
+    """Run operations (each returning characters processed) on a fresh pipeline and summarize"""
+    backend = MockBackend(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate,
+                          args.throttle_rps, args.seed)
+    pipeline = Pipeline(backend, args)
+    if args.trace_memory:
+        tracemalloc.start()
+
+    latencies = []
+    characters = 0
+    errors = 0
+    start = time.perf_counter()
+    for operation in operations:
+        op_start = time.perf_counter()
+        try:
+            characters += operation(pipeline)
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - op_start)
+    wall = time.perf_counter() - start
+
+    peak = None
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+    upstream = backend.counters()
+    result = {
+        'scenario': name,
+        **params,
+        'operations': len(operations),
+        'failed_operations': errors,
+        'characters': characters,
+        'wall_seconds': round(wall, 4),
+        'chars_per_second': round(characters / wall, 1) if wall else 0.0,
+        'ops_per_second': round(len(operations) / wall, 3) if wall else 0.0,
+        'latency_p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'latency_p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'upstream_calls': upstream['calls'],
+        'upstream_characters': upstream['characters'],
+        'upstream_errors': upstream['errors'],
+        'upstream_throttled': upstream['throttled'],
+        'peak_rss_bytes': peak_rss,
+        'peak_traced_bytes': peak,
+    }
+    print(f"{name:<28} {json.dumps(params, ensure_ascii=False):<36} "
+          f"{result['chars_per_second']:>12,.0f} chars/s  p50 {result['latency_p50_ms']:>9.1f} ms  "
+          f"p99 {result['latency_p99_ms']:>9.1f} ms  {upstream['calls']:>6} calls"
+          + f"  rss {peak_rss / 1024 / 1024:.0f} MiB"
+          + (f"  traced {peak / 1024 / 1024:.1f} MiB" if peak is not None else ''))
+    return result
+
+
+def text_operation(text: str) -> Callable[[Pipeline], int]:
+    def operation(pipeline: Pipeline) -> int:
+        pipeline.translate_text(text, 'auto', 'en')
+        return len(text)
+    return operation
+
+
+def edit_operations(text: str, edits: int, rng: random.Random) -> List[Callable[[Pipeline], int]]:
+    """Translate a text, then re-translate it after each single-sentence edit"""
+    state = {'segments': None, 'text': text}
+
+    def operation(pipeline: Pipeline) -> int:
+        _, _, state['segments'] = pipeline.translate_text(state['text'], 'auto', 'en', previous=state['segments'])
+        processed = len(state['text'])
+        # Replace one sentence for the next run
+        sentences = state['text'].split('. ')
+        sentences[rng.randrange(len(sentences))] = sentence(rng).rstrip('.?!')
+        state['text'] = '. '.join(sentences)
+        return processed
+
+    return [operation] * (edits + 1)
+
+
+def file_operation(content: str, filename: str) -> Callable[[Pipeline], int]:
+    def operation(pipeline: Pipeline) -> int:
+        pipeline.translate_file_content(content, 'auto', 'en', filename)
+        return len(content)
+    return operation
+
+
+def batch_operation(files: List[tuple]) -> Callable[[Pipeline], int]:
+    def operation(pipeline: Pipeline) -> int:
+        results = pipeline.translate_uploads(files, 'auto', 'en')
+        for output, _ in results:
+            output.close()
+        return sum(len(data) for _, data in files)
+    return operation
+
+
+def run_suite(args) -> List[dict]:
+    rng = random.Random(args.seed)
+    results = []
+
+    for size in TEXT_SIZES:
+        texts = [make_text(size, rng) for _ in range(args.repeat)]
+        results.append(run_scenario('text', args, [text_operation(text) for text in texts], size=size))
+
+    results.append(run_scenario('text_incremental_edit', args,
+                                edit_operations(make_text(TEXT_SIZES[-1], rng), args.repeat, rng),
+                                size=TEXT_SIZES[-1]))
+
+    sizes = QUICK_FILE_SIZES if args.quick else FILE_SIZES
+    for file_type in FILE_TYPES:
+        for size in sizes:
+            documents = [make_document(file_type, size, rng) for _ in range(args.file_repeat)]
+            results.append(run_scenario(
+                'file', args, [file_operation(document, f"document.{file_type}") for document in documents],
+                file_type=file_type, size=size
+            ))
+
+    files = [(f"upload_{i}.{FILE_TYPES[i % len(FILE_TYPES)]}",
+              make_document(FILE_TYPES[i % len(FILE_TYPES)], args.batch_file_size, rng).encode('utf-8'))
+             for i in range(args.batch_files)]
+    results.append(run_scenario('batch_upload', args, [batch_operation(files)],
+                                files=len(files), size=args.batch_file_size))
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def scenario_key(result: dict) -> tuple:
+    return tuple(sorted((k, v) for k, v in result.items() if k in ('scenario', 'size', 'file_type', 'files')))
+
+
+def compare(results: List[dict], baseline_path: str) -> None:
+    """Print throughput and p99 changes against an earlier results file"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {scenario_key(result): result for result in json.load(f)['results']}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        before = baseline.get(scenario_key(result))
+        if before is None or not before['chars_per_second'] or not before['latency_p99_ms']:
+            continue
+        throughput = result['chars_per_second'] / before['chars_per_second'] - 1
+        p99 = result['latency_p99_ms'] / before['latency_p99_ms'] - 1
+        calls = result['upstream_calls'] - before['upstream_calls']
+        label = ' '.join(str(value) for _, value in scenario_key(result))
+        print(f"{label:<40} throughput {throughput:+7.1%}  p99 {p99:+7.1%}  upstream calls {calls:+d}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the translation pipeline")
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="Mean simulated upstream latency")
+    parser.add_argument('--jitter-ms', type=float, default=20.0, help="Uniform jitter around the latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of upstream calls that fail")
+    parser.add_argument('--throttle-rps', type=float, default=0.0,
+                        help="Upstream requests per second before 429 errors (0 disables throttling)")
+    parser.add_argument('--rate', type=float, default=1000.0, help="Client-side rate limit (requests/s)")
+    parser.add_argument('--burst', type=int, default=1000, help="Client-side rate limit burst")
+    parser.add_argument('--pool-size', type=int, default=8, help="Translator clients in the pool")
+    parser.add_argument('--concurrency', type=int, default=8, help="Chunks translated in parallel")
+    parser.add_argument('--repeat', type=int, default=5, help="Texts per text scenario")
+    parser.add_argument('--file-repeat', type=int, default=2, help="Documents per file scenario")
+    parser.add_argument('--batch-files', type=int, default=20, help="Files in the batch upload scenario")
+    parser.add_argument('--batch-file-size', type=int, default=5_000, help="Characters per batch file")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--quick', action='store_true', help="Smaller documents for a fast run")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Also measure each scenario's peak allocations with tracemalloc (slower)")
+    parser.add_argument('--output', default=RESULTS_PATH, help="Where to write the JSON results")
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = run_suite(args)
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': vars(args),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""Command line front end of the translation engine (no Streamlit required).
+
+Translate files, directories or glob patterns into one or more languages::
+
+    python cli.py translate docs/ 'notes/**/*.md' --to de,fr --out translated/
+
+Files are streamed: each is read, decoded and segmented as its chunks are
+needed, chunks of every file and target share one pool of ``--workers``
+in-flight requests, and each translated file is written out (and reported)
+as soon as it is complete. Output keeps the directory layout of the inputs
+and uses the app's ``<name>_translated_<lang>.<ext>`` names.
+
+Serve the HTTP API for programmatic and bulk callers (see ``http_api.py``)::
+
+    TRANSLATION_API_KEYS=alice=<key> python cli.py serve --port 8080
+"""
+import argparse
+import asyncio
+import glob
+import os
+import re
+import sys
+from typing import Iterator, List, Tuple
+
+import http_api
+from quota import QuotaManager
+from translation_engine import MAX_CONCURRENT_CHUNKS
+from translation_service import TEXT_EXTENSIONS, TranslationService, read_text, translated_filename
+
+# Names written by earlier runs (see ``translated_filename``)
+TRANSLATED_NAME = re.compile(r'_translated_[A-Za-z]{2,3}(?:-[A-Za-z]+)?(?:\.[^.]*)?$')
+
+
+class FileSink:
+    """Translated output written to a file that is only created on the first write"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self.size = 0
+
+    def write(self, text: str) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'w', encoding='utf-8', newline='')
+        self._file.write(text)
+        self.size += len(text)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+def glob_root(pattern: str) -> str:
+    """Directory part of a glob pattern before its first wildcard"""
+    parts = []
+    for part in pattern.split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or '.'
+
+
+def expand_inputs(patterns: List[str]) -> List[Tuple[str, str]]:
+    """Resolve files, directories and glob patterns to (path, path relative to its input root)"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, names in os.walk(pattern):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                for name in sorted(names):
+                    path = os.path.join(root, name)
+                    files.append((path, os.path.relpath(path, pattern)))
+        elif os.path.isfile(pattern):
+            files.append((pattern, os.path.basename(pattern)))
+        else:
+            matches = sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+            if not matches:
+                raise FileNotFoundError(f"No files match {pattern!r}")
+            files.extend((path, os.path.relpath(path, glob_root(pattern))) for path in matches)
+    return list(dict.fromkeys(files))
+
+
+def skip_reason(path: str, out_given: bool) -> str:
+    """Why an input file is not translated, or '' to translate it"""
+    if not path.lower().endswith(TEXT_EXTENSIONS):
+        return "unsupported file type"
+    if not out_given and TRANSLATED_NAME.search(os.path.basename(path)):
+        return "output of an earlier run"
+    return ''
+
+
+def read_file(path: str) -> Iterator[str]:
+    """Decoded text of a file, opened only once translation reaches it"""
+    with open(path, 'rb') as f:
+        yield from read_text(f, os.path.basename(path))
+
+
+def translate_command(args) -> int:
+    dest_langs = [lang.strip() for lang in args.to.split(',') if lang.strip()]
+    files = expand_inputs(args.paths)
+    if args.out:
+        # Never pick up earlier output when it lives inside an input directory
+        out_dir = os.path.join(os.path.abspath(args.out), '')
+        files = [(path, relative) for path, relative in files if not os.path.abspath(path).startswith(out_dir)]
+    selected = []
+    for path, relative in files:
+        reason = skip_reason(path, bool(args.out))
+        if reason:
+            print(f"SKIPPED {path}: {reason}", file=sys.stderr)
+        else:
+            selected.append((path, relative))
+    files = selected
+    service = TranslationService(max_workers=args.workers)
+
+    sinks = []
+    for path, relative in files:
+        directory = os.path.join(args.out, os.path.dirname(relative)) if args.out else os.path.dirname(path)
+        sinks.append([FileSink(os.path.join(directory, translated_filename(os.path.basename(path), dest_lang)))
+                      for dest_lang in dest_langs])
+
+    failures = 0
+
+    def file_done(index: int, sink: FileSink, errors: list, dest_lang: str):
+        nonlocal failures
+        sink.close()
+        path = files[index][0]
+        fatal = [message for chunk_index, message in errors if chunk_index is None]
+        if fatal:
+            failures += 1
+            print(f"FAILED  {path} [{dest_lang}]: {fatal[0]}", file=sys.stderr)
+            return
+        print(f"{sink.path}" + (f"  ({len(errors)} chunk(s) left untranslated)" if errors else ''))
+        for chunk_index, message in errors:
+            print(f"  chunk {chunk_index + 1}: {message}", file=sys.stderr)
+
+    def progress(state: dict):
+        if args.quiet:
+            return
+        print(f"\r{state['done_files']}/{state['total_files']} files, "
+              f"{state['done_chunks']}/{state['total_chunks']} chunks", end='', file=sys.stderr, flush=True)
+
+    service.translate_documents(
+        [read_file(path) for path, _ in files], [os.path.basename(path) for path, _ in files],
+        args.source, dest_langs, user=args.user, fuzzy=args.fuzzy,
+        sinks=sinks, sizes=[os.path.getsize(path) for path, _ in files],
+        on_progress=progress, on_file_done=file_done
+    )
+    if not args.quiet:
+        print(file=sys.stderr)
+    return 1 if failures else 0
+
+
+def serve_command(args) -> int:
+    if not http_api.parse_api_keys(http_api.API_KEYS):
+        print("error: set TRANSLATION_API_KEYS (e.g. alice=<key>) to serve the API", file=sys.stderr)
+        return 2
+    # Remote callers share upstream capacity, so their usage is metered and budgeted
+    service = TranslationService(quota=QuotaManager(), max_workers=args.workers)
+    try:
+        asyncio.run(http_api.serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Translate files or serve the translation HTTP API")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    translate = commands.add_parser('translate', help="Translate files, directories or glob patterns")
+    translate.add_argument('paths', nargs='+', help="Files, directories or glob patterns (quote '**' patterns)")
+    translate.add_argument('--to', required=True, help="Target language code(s), comma separated (e.g. de,fr)")
+    translate.add_argument('--from', dest='source', default='auto', help="Source language code (default: auto)")
+    translate.add_argument('--out', help="Output directory (default: next to each input file)")
+    translate.add_argument('--workers', type=int, default=MAX_CONCURRENT_CHUNKS,
+                           help="Maximum chunk translations in flight")
+    translate.add_argument('--fuzzy', action='store_true', help="Reuse similar sentences from the translation memory")
+    translate.add_argument('--user', default='cli', help="Caller name used for rate limiting")
+    translate.add_argument('--quiet', action='store_true', help="Do not print progress")
+    translate.set_defaults(handler=translate_command)
+
+    serve = commands.add_parser('serve', help="Serve the HTTP API")
+    serve.add_argument('--host', default=http_api.API_HOST)
+    serve.add_argument('--port', type=int, default=http_api.API_PORT)
+    serve.add_argument('--workers', type=int, default=MAX_CONCURRENT_CHUNKS,
+                       help="Maximum chunk translations in flight per request")
+    serve.set_defaults(handler=serve_command)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except FileNotFoundError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""Format-aware extraction of translatable text spans from structured files.
+
+Each extractor returns a list of ``TextSpan`` objects pointing into the
+original content. Only the span texts are sent upstream; everything else
+(markup, keys, code, quoting) is copied through untouched when the
+translations are written back with ``apply_translations``.
+"""
+import csv
+import html
+import io
+import json
+import re
+import tokenize
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+
+class TextSpan(NamedTuple):
+    """A translatable region ``content[start:end]``"""
+    start: int
+    end: int
+    text: str                       # Decoded text to translate
+    render: Callable[[str], str]    # Encodes a translation back into the source syntax
+
+
+def _identity(text: str) -> str:
+    return text
+
+
+def _has_words(text: str) -> bool:
+    """True for text containing at least one letter (skips numbers, dates, symbols)"""
+    return any(c.isalpha() for c in text)
+
+
+def _looks_like_prose(text: str) -> bool:
+    """Heuristic for code string literals: several words, not an identifier or key"""
+    return _has_words(text) and len(text.split()) > 1
+
+
+def _core_span(content: str, start: int, end: int, render=_identity, decode=_identity) -> Optional[TextSpan]:
+    """Span for ``content[start:end]`` with surrounding whitespace left out"""
+    raw = content[start:end]
+    core = raw.strip()
+    if not core:
+        return None
+    start += raw.index(core)
+    return TextSpan(start, start + len(core), decode(core), render)
+
+
+# --- JSON -------------------------------------------------------------------
+
+JSON_STRING = re.compile(r'"(?:[^"\\\n]|\\.)*"')
+JSON_KEY_FOLLOWS = re.compile(r'\s*:')
+
+
+def _render_json(text: str) -> str:
+    return json.dumps(text, ensure_ascii=False)[1:-1]
+
+
+def extract_json(content: str) -> List[TextSpan]:
+    """String values of a JSON document (object keys are left alone)"""
+    try:
+        json.loads(content)
+    except ValueError as e:
+        raise ValueError(f"invalid JSON: {e}")
+
+    spans = []
+    for match in JSON_STRING.finditer(content):
+        if JSON_KEY_FOLLOWS.match(content, match.end()):
+            continue
+        text = json.loads(match.group())
+        if _has_words(text):
+            spans.append(TextSpan(match.start() + 1, match.end() - 1, text, _render_json))
+    return spans
+
+
+# --- CSV --------------------------------------------------------------------
+
+def _render_csv(delimiter: str, quoted: bool) -> Callable[[str], str]:
+    def render(text: str) -> str:
+        if quoted:
+            return text.replace('"', '""')
+        if any(c in text for c in (delimiter, '"', '\n', '\r')):
+            return '"' + text.replace('"', '""') + '"'
+        return text
+    return render
+
+
+def extract_csv(content: str) -> List[TextSpan]:
+    """Cell values of a CSV file (the header row is kept when one is detected)"""
+    sample = content[:8192]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
+        delimiter = dialect.delimiter
+        has_header = csv.Sniffer().has_header(sample)
+    except csv.Error:
+        delimiter, has_header = ',', False
+
+    spans = []
+    row = 0
+    pos = 0
+    length = len(content)
+    while pos < length:
+        # Parse one field starting at pos
+        if content[pos] == '"':
+            end = pos + 1
+            while True:
+                end = content.find('"', end)
+                if end == -1:
+                    raise ValueError("unterminated quoted CSV field")
+                if content.startswith('""', end):
+                    end += 2
+                    continue
+                break
+            text = content[pos + 1:end].replace('""', '"')
+            field_start, field_end, quoted = pos + 1, end, True
+            pos = end + 1
+        else:
+            end = pos
+            while end < length and content[end] not in (delimiter, '\n', '\r'):
+                end += 1
+            text = content[pos:end]
+            field_start, field_end, quoted = pos, end, False
+            pos = end
+
+        if row > 0 or not has_header:
+            span = _core_span(content, field_start, field_end, _render_csv(delimiter, quoted),
+                              lambda core: core.replace('""', '"') if quoted else core)
+            if span and _has_words(text):
+                spans.append(span)
+
+        # Field separator or end of record
+        if pos < length and content[pos] == delimiter:
+            pos += 1
+        elif pos < length and content[pos] in '\r\n':
+            if content.startswith('\r\n', pos):
+                pos += 1
+            pos += 1
+            row += 1
+    return spans
+
+
+# --- XML / HTML -------------------------------------------------------------
+
+MARKUP_TOKEN = re.compile(
+    r'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<\?.*?\?>|<![^>]*>|<(/?)([A-Za-z][\w:.-]*)(?:"[^"]*"|\'[^\']*\'|[^>"\'])*>',
+    re.DOTALL
+)
+
+# Elements whose content is code, not text
+RAW_TEXT_ELEMENTS = {'script', 'style'}
+
+
+def _render_markup(text: str) -> str:
+    return html.escape(text, quote=False)
+
+
+def extract_markup(content: str) -> List[TextSpan]:
+    """Text nodes of an XML or HTML document (tags, attributes and comments are kept)"""
+    spans = []
+    pos = 0
+    raw_element = None
+    for match in MARKUP_TOKEN.finditer(content):
+        if raw_element is None:
+            span = _core_span(content, pos, match.start(), _render_markup, html.unescape)
+            if span and _has_words(span.text):
+                spans.append(span)
+
+        closing, tag = match.group(1), (match.group(2) or '').lower()
+        if tag in RAW_TEXT_ELEMENTS and not match.group().endswith('/>'):
+            raw_element = None if closing else tag
+        pos = match.end()
+
+    if raw_element is None:
+        span = _core_span(content, pos, len(content), _render_markup, html.unescape)
+        if span and _has_words(span.text):
+            spans.append(span)
+    return spans
+
+
+# --- Python / JavaScript ----------------------------------------------------
+
+def _comment_spans(content: str, start: int, end: int) -> List[TextSpan]:
+    """One span per comment line, skipping leading ``*`` decoration of block comments"""
+    spans = []
+    line_start = start
+    while line_start < end:
+        line_end = content.find('\n', line_start, end)
+        if line_end == -1:
+            line_end = end
+        text_start = line_start
+        while text_start < line_end and (content[text_start].isspace() or content[text_start] == '*'):
+            text_start += 1
+        span = _core_span(content, text_start, line_end)
+        if span and _has_words(span.text):
+            spans.append(span)
+        line_start = line_end + 1
+    return spans
+
+
+def _render_string(quote: str) -> Callable[[str], str]:
+    def render(text: str) -> str:
+        text = text.replace('\\', '\\\\').replace(quote[0], '\\' + quote[0])
+        if len(quote) == 1:
+            text = text.replace('\n', '\\n')
+        return text
+    return render
+
+
+def _string_span(content: str, start: int, end: int, prefix_len: int, quote: str) -> Optional[TextSpan]:
+    """Span for the body of a string literal without escape sequences"""
+    body_start = start + prefix_len + len(quote)
+    body_end = end - len(quote)
+    body = content[body_start:body_end]
+    if '\\' in body or not _looks_like_prose(body):
+        return None
+    return _core_span(content, body_start, body_end, _render_string(quote))
+
+
+def extract_python(content: str) -> List[TextSpan]:
+    """Comments and prose string literals of Python source"""
+    # Split lines exactly as tokenize reads them (str.splitlines also breaks on \x0c, \x85, ...)
+    line_offsets = [0]
+    for line in io.StringIO(content).readlines():
+        line_offsets.append(line_offsets[-1] + len(line))
+
+    def offset(position: tuple) -> int:
+        row, col = position
+        return line_offsets[row - 1] + col
+
+    spans = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(content).readline):
+            start, end = offset(token.start), offset(token.end)
+            if token.type == tokenize.COMMENT:
+                spans.extend(_comment_spans(content, start + 1, end))
+            elif token.type == tokenize.STRING:
+                prefix = re.match(r'[A-Za-z]*', token.string).group()
+                if set(prefix.lower()) & {'b', 'f', 'r'}:
+                    continue  # Bytes, f-strings and raw strings are left alone
+                rest = token.string[len(prefix):]
+                quote = rest[:3] if rest[:3] in ('"""', "'''") else rest[0]
+                span = _string_span(content, start, end, len(prefix), quote)
+                if span:
+                    spans.append(span)
+    except (tokenize.TokenError, IndentationError, SyntaxError) as e:
+        raise ValueError(f"invalid Python source: {e}")
+    return spans
+
+
+JS_TOKEN = re.compile(
+    r'//[^\n]*|/\*.*?\*/|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|`(?:[^`\\]|\\.)*`',
+    re.DOTALL
+)
+
+
+def extract_javascript(content: str) -> List[TextSpan]:
+    """Comments and prose string literals of JavaScript source"""
+    spans = []
+    for match in JS_TOKEN.finditer(content):
+        token = match.group()
+        if token.startswith('//'):
+            spans.extend(_comment_spans(content, match.start() + 2, match.end()))
+        elif token.startswith('/*'):
+            spans.extend(_comment_spans(content, match.start() + 2, match.end() - 2))
+        elif token.startswith('`') and '${' in token:
+            continue  # Template literals with substitutions are left alone
+        else:
+            span = _string_span(content, match.start(), match.end(), 0, token[0])
+            if span:
+                spans.append(span)
+    return spans
+
+
+# Extractors by file extension
+EXTRACTORS: Dict[str, Callable[[str], List[TextSpan]]] = {
+    '.json': extract_json,
+    '.csv': extract_csv,
+    '.xml': extract_markup,
+    '.html': extract_markup,
+    '.py': extract_python,
+    '.js': extract_javascript,
+}
+
+
+def get_extractor(filename: str) -> Optional[Callable[[str], List[TextSpan]]]:
+    """Return the extractor for a filename, or None for plain text"""
+    if '.' not in filename:
+        return None
+    return EXTRACTORS.get('.' + filename.rsplit('.', 1)[1].lower())
+
+
+def apply_translations(content: str, spans: List[TextSpan], translations: Dict[str, str]) -> str:
+    """Write translated span texts back into the original content"""
+    parts = []
+    pos = 0
+    for span in sorted(spans, key=lambda span: span.start):
+        parts.append(content[pos:span.start])
+        translation = translations.get(span.text)
+        parts.append(span.render(translation) if translation is not None else content[span.start:span.end])
+        pos = span.end
+    parts.append(content[pos:])
+    return ''.join(parts)
@@ -0,0 +1,141 @@
+"""Durable, append-only translation history in SQLite.
+
+Records are small: who translated what when, language names, a short
+preview and, for text translations, hashes of the original and translated
+text. The texts themselves are stored once in a content-addressed table, so
+repeated translations of the same text do not duplicate it, and are only
+loaded for the records actually displayed. Indexes on (user, id) and id keep
+per-user and all-user pages fast however long the history grows.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from translation_cache import normalize_text, text_hash
+
+# History configuration (override through environment variables)
+HISTORY_PATH = os.environ.get("TRANSLATION_HISTORY_PATH", ".translation_history.sqlite3")
+
+# Characters of the original text kept inline in each record
+PREVIEW_CHARS = 120
+
+TEXT = 'text'
+BATCH_FILES = 'batch_files'
+
+
+class HistoryStore:
+    """Translation history shared by all sessions (newest first)"""
+
+    def __init__(self, path: str = HISTORY_PATH):
+        self._lock = threading.Lock()
+        try:
+            self._db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error:
+            # Keep a memory-only history if the database file is unavailable
+            self._db = sqlite3.connect(':memory:', check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                kind TEXT NOT NULL,
+                from_lang TEXT NOT NULL,
+                to_lang TEXT NOT NULL,
+                preview TEXT,
+                original_hash TEXT,
+                translated_hash TEXT,
+                files TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_history_user ON history (user, id);
+            CREATE TABLE IF NOT EXISTS texts (
+                hash TEXT PRIMARY KEY,
+                content TEXT NOT NULL
+            );
+        """)
+        self._db.commit()
+
+    def add_text(self, user: str, from_lang: str, to_lang: str, original: str, translated: str) -> None:
+        """Record a text translation"""
+        with self._lock:
+            original_hash = self._store_text(original)
+            translated_hash = self._store_text(translated)
+            self._db.execute(
+                "INSERT INTO history (user, created_at, kind, from_lang, to_lang, preview, original_hash, translated_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user, time.time(), TEXT, from_lang, to_lang, original[:PREVIEW_CHARS], original_hash, translated_hash)
+            )
+            self._db.commit()
+
+    def add_batch(self, user: str, from_lang: str, to_lang: str, files: List[str]) -> None:
+        """Record a batch file translation"""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO history (user, created_at, kind, from_lang, to_lang, files) VALUES (?, ?, ?, ?, ?, ?)",
+                (user, time.time(), BATCH_FILES, from_lang, to_lang, json.dumps(files))
+            )
+            self._db.commit()
+
+    def page(self, user: Optional[str] = None, before: Optional[int] = None, limit: int = 5) -> List[dict]:
+        """Up to ``limit`` records older than id ``before``, for one user or everyone.
+
+        Keyset pagination: pass the id of the last record of a page as
+        ``before`` to get the next one.
+        """
+        query = ("SELECT id, user, created_at, kind, from_lang, to_lang, preview, original_hash, translated_hash, files"
+                 " FROM history WHERE 1 = 1")
+        params = []
+        if user is not None:
+            query += " AND user = ?"
+            params.append(user)
+        if before is not None:
+            query += " AND id < ?"
+            params.append(before)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [{
+            'id': row[0],
+            'user': row[1],
+            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row[2])),
+            'type': row[3],
+            'from_lang': row[4],
+            'to_lang': row[5],
+            'preview': row[6],
+            'original_hash': row[7],
+            'translated_hash': row[8],
+            'files': json.loads(row[9]) if row[9] else [],
+        } for row in rows]
+
+    def count(self, user: Optional[str] = None) -> int:
+        with self._lock:
+            if user is None:
+                return self._db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+            return self._db.execute("SELECT COUNT(*) FROM history WHERE user = ?", (user,)).fetchone()[0]
+
+    def users(self) -> List[str]:
+        """Users with at least one record"""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT user FROM history ORDER BY user")]
+
+    def texts(self, hashes: List[str]) -> Dict[str, str]:
+        """Load stored texts by hash (only for the records being displayed)"""
+        hashes = [h for h in set(hashes) if h]
+        if not hashes:
+            return {}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT hash, content FROM texts WHERE hash IN ({','.join('?' * len(hashes))})", hashes
+            ).fetchall()
+        return dict(rows)
+
+    def _store_text(self, text: str) -> str:
+        """Store a text once under its hash (called with the lock held)"""
+        key = text_hash(text)
+        self._db.execute("INSERT OR IGNORE INTO texts (hash, content) VALUES (?, ?)", (key, normalize_text(text)))
+        return key
@@ -0,0 +1,267 @@
+"""Lightweight asynchronous HTTP API over the translation engine.
+
+Built on asyncio streams only, so it needs nothing beyond the standard
+library. The event loop only parses requests and writes responses; every
+translation runs on a thread pool through ``TranslationService``, so slow
+upstream calls never block other connections. Connections are kept alive
+between requests for bulk callers.
+
+Endpoints (JSON in, JSON out)::
+
+    POST /translate  {"text": "...", "to": "de", "from": "auto", "fuzzy": false}
+                     -> {"translation": "...", "detected_language": "en"}
+    POST /translate  {"texts": ["...", ...], "to": "de"}
+                     -> {"translations": [{"translation": ..., "detected_language": ...}, ...]}
+    POST /files      {"files": [{"name": "a.md", "content": "..."}], "to": ["de", "fr"], "from": "auto"}
+                     -> {"files": [{"name", "dest_lang", "translated_name", "content", "errors"}, ...]}
+    GET  /health     -> {"status": "ok"}
+    GET  /metrics    -> Prometheus text format
+
+Every endpoint but ``/health`` requires one of the API keys configured in
+``TRANSLATION_API_KEYS``, sent as ``Authorization: Bearer <key>`` or
+``X-API-Key: <key>``; requests without a valid key get a 401. The name the
+key is configured under identifies the caller to the rate limiter's fair
+scheduling and to quotas, so a budget cannot be reset by a client. Requests
+that do not fit in the caller's character budget get a 429.
+"""
+import asyncio
+import hmac
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import metrics
+from quota import QuotaExceeded
+from translation_service import TranslationService, translated_filename
+
+# Default listen address of ``cli.py serve`` (override through environment variables)
+API_HOST = os.environ.get("TRANSLATION_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("TRANSLATION_API_PORT", "8080"))
+
+# Requests translated at once; further requests wait for a free worker
+API_WORKERS = int(os.environ.get("TRANSLATION_API_WORKERS", "8"))
+
+# Largest accepted request body
+MAX_BODY_BYTES = int(os.environ.get("TRANSLATION_API_MAX_BODY_MB", "20")) * 1024 * 1024
+
+# Idle keep-alive connections are closed after this many seconds
+KEEP_ALIVE_SECONDS = 30
+
+# API keys of the callers, e.g. "alice=<key>,batch-jobs=<key>"; without any every request is refused
+API_KEYS = os.environ.get("TRANSLATION_API_KEYS", "")
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 429: 'Too Many Requests', 500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_api_keys(spec: str) -> Dict[str, str]:
+    """Parse "name=key,name=key" API keys into {name: key}"""
+    keys = {}
+    for item in spec.split(','):
+        if '=' in item:
+            name, key = item.split('=', 1)
+            if name.strip() and key.strip():
+                keys[name.strip()] = key.strip()
+    return keys
+
+
+def _languages(value, name: str) -> list:
+    """One language code or a list of them"""
+    languages = [value] if isinstance(value, str) else value
+    if not languages or not isinstance(languages, list) or not all(isinstance(lang, str) and lang
+                                                                   for lang in languages):
+        raise HTTPError(400, f"'{name}' must be a language code or a list of language codes")
+    return languages
+
+
+class TranslationAPI:
+    """Request routing of the HTTP API"""
+
+    def __init__(self, service: TranslationService, workers: int = API_WORKERS,
+                 api_keys: Optional[Dict[str, str]] = None):
+        self.service = service
+        self.api_keys = parse_api_keys(API_KEYS) if api_keys is None else api_keys
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http-api')
+
+    async def run(self, fn, *args):
+        """Run blocking engine work on the worker pool"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def authenticate(self, headers: dict) -> str:
+        """Name of the API key a request carries; raises a 401 without a valid one"""
+        authorization = headers.get('authorization', '')
+        if authorization[:7].lower() == 'bearer ':
+            key = authorization[7:].strip()
+        else:
+            key = headers.get('x-api-key', '')
+        name = None
+        for candidate, expected in self.api_keys.items():
+            # Compare against every key so the response time does not reveal a match
+            if hmac.compare_digest(key.encode('utf-8'), expected.encode('utf-8')):
+                name = candidate
+        if not key or name is None:
+            raise HTTPError(401, "Missing or invalid API key")
+        return name
+
+    async def handle(self, method: str, path: str, headers: dict, body: bytes) -> Tuple[int, str, bytes]:
+        """Return (status, content type, body) for one request"""
+        if path == '/health':
+            return self._json(200, {'status': 'ok'})
+        user = self.authenticate(headers)
+        if path == '/metrics':
+            return 200, 'text/plain; version=0.0.4; charset=utf-8', metrics.REGISTRY.render_prometheus().encode('utf-8')
+        routes = {'/translate': self.translate, '/files': self.files}
+        if path not in routes:
+            raise HTTPError(404, f"Unknown path {path}")
+        if method != 'POST':
+            raise HTTPError(405, f"{path} only accepts POST")
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError as e:
+            raise HTTPError(400, f"Invalid JSON: {e}")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        try:
+            return self._json(200, await routes[path](payload, user))
+        except QuotaExceeded as e:
+            raise HTTPError(429, str(e))
+
+    async def translate(self, payload: dict, user: str) -> dict:
+        dest_lang = payload.get('to')
+        if not isinstance(dest_lang, str) or not dest_lang:
+            raise HTTPError(400, "'to' must be a language code")
+        src_lang = payload.get('from', 'auto')
+        fuzzy = bool(payload.get('fuzzy', False))
+        texts = payload['texts'] if 'texts' in payload else [payload.get('text')]
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            raise HTTPError(400, "'text' must be a string and 'texts' a list of strings")
+
+        def translate_one(text: str) -> dict:
+            translation, detected, _ = self.service.translate_text(text, src_lang, dest_lang, user=user, fuzzy=fuzzy)
+            return {'translation': translation, 'detected_language': detected}
+
+        # Texts of one request are translated concurrently and share the cache and coalescer
+        results = await asyncio.gather(*(self.run(translate_one, text) for text in texts))
+        if 'texts' in payload:
+            return {'translations': results}
+        return results[0]
+
+    async def files(self, payload: dict, user: str) -> dict:
+        dest_langs = _languages(payload.get('to'), 'to')
+        files = payload.get('files')
+        if not isinstance(files, list) or not all(
+                isinstance(f, dict) and isinstance(f.get('name'), str) and isinstance(f.get('content'), str)
+                for f in files):
+            raise HTTPError(400, "'files' must be a list of {\"name\": ..., \"content\": ...} objects")
+
+        # Admitted (or refused) on the size of the request and the user's running
+        # batches before any work starts: a request never waits on an executor thread
+        admission = self.service.admit(user, sum(len(f['content']) for f in files) * len(dest_langs), start=True)
+        results = await self.run(lambda: self.service.translate_documents(
+            [f['content'] for f in files], [f['name'] for f in files], payload.get('from', 'auto'), dest_langs,
+            user=user, fuzzy=bool(payload.get('fuzzy', False)), admission=admission
+        ))
+        return {'files': [
+            {
+                'name': f['name'],
+                'dest_lang': dest_lang,
+                'translated_name': translated_filename(f['name'], dest_lang),
+                'content': output,
+                'errors': [{'chunk': index, 'message': message} for index, message in errors],
+            }
+            for f, outputs in zip(files, results)
+            for dest_lang, (output, errors) in zip(dest_langs, outputs)
+        ]}
+
+    @staticmethod
+    def _json(status: int, data) -> Tuple[int, str, bytes]:
+        return status, 'application/json', json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    async def connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one connection until the client closes it or stops sending"""
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                route = path if path in ('/translate', '/files', '/health', '/metrics') else 'other'
+                try:
+                    with metrics.span('http_api_request_seconds', route=route):
+                        status, content_type, data = await self.handle(method, path, headers, body)
+                except HTTPError as e:
+                    status, content_type, data = self._json(e.status, {'error': str(e)})
+                except Exception as e:
+                    status, content_type, data = self._json(500, {'error': str(e)})
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, content_type, data, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            # Malformed request: answer once and drop the connection
+            status, content_type, data = self._json(e.status, {'error': str(e)})
+            self._write_response(writer, status, content_type, data, keep_alive=False)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[tuple]:
+        """Parse one request as (method, path, headers, body); None when the client is done"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_SECONDS)
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise HTTPError(400, "Incomplete request")
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(400, "Request headers too large")
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', '0'))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body exceeds {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target.split('?', 1)[0], headers, body
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, content_type: str, data: bytes,
+                        keep_alive: bool) -> None:
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+        )
+
+
+async def serve(service: TranslationService, host: str = API_HOST, port: int = API_PORT,
+                api_keys: Optional[Dict[str, str]] = None) -> None:
+    """Serve the API until cancelled"""
+    api = TranslationAPI(service, api_keys=api_keys)
+    server = await asyncio.start_server(api.connection, host, port)
+    print(f"Translation API listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,176 @@
+"""Background job queue for batch translations.
+
+Jobs run on a small worker pool owned by the process, so they keep going
+across Streamlit reruns and their results can be fetched again without
+translating twice. The UI only submits jobs and polls their state.
+
+A job may hold a concurrency slot of the user's quota (a
+``quota.Admission``): it stays queued here, without taking a worker, until
+the slot can be claimed, so one user's extra batches never tie up the pool.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from quota import Admission
+
+# Batches translated at the same time (each one fans out over its own chunk pool)
+JOB_WORKERS = int(os.environ.get("TRANSLATION_JOB_WORKERS", "2"))
+
+# Finished jobs and their result files are dropped after this many seconds
+JOB_RETENTION_SECONDS = int(os.environ.get("TRANSLATION_JOB_RETENTION_SECONDS", "3600"))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class TranslationJob:
+    """State of one batch translation, updated by a worker thread and read by the UI"""
+
+    def __init__(self, user: str, **info):
+        self.id = uuid.uuid4().hex[:12]
+        self.user = user
+        self.info = info
+        self.status = QUEUED
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.progress = {}
+        self.files = []
+        self._lock = threading.Lock()
+
+    def update_progress(self, progress: dict) -> None:
+        with self._lock:
+            self.progress = dict(progress)
+
+    def add_file(self, file_info: dict) -> None:
+        with self._lock:
+            self.files.append(file_info)
+
+    def snapshot(self) -> dict:
+        """Consistent copy of the job state for rendering"""
+        with self._lock:
+            return {
+                'id': self.id,
+                'user': self.user,
+                'status': self.status,
+                'error': self.error,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at,
+                'progress': dict(self.progress),
+                'files': list(self.files),
+                **self.info,
+            }
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+
+class JobManager:
+    """Process-wide registry and worker pool for translation jobs"""
+
+    def __init__(self, workers: int = JOB_WORKERS, retention: int = JOB_RETENTION_SECONDS):
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="translation-job")
+        self._jobs = {}
+        self._pending = []      # (job, run, slot) waiting for a concurrency slot, oldest first
+        self._lock = threading.Lock()
+
+    def submit(self, user: str, run: Callable[[TranslationJob], None], slot: Optional[Admission] = None,
+               **info) -> TranslationJob:
+        """Queue ``run(job)`` on the worker pool and return the job.
+
+        With a ``slot`` the job is handed to the pool only once the slot can
+        be started; it is released when the job ends.
+        """
+        self._cleanup()
+        job = TranslationJob(user, **info)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._pending.append((job, run, slot))
+        self._dispatch()
+        return job
+
+    def pending(self, user: Optional[str] = None) -> int:
+        """Jobs (of one user, or of everyone) still waiting for a concurrency slot"""
+        with self._lock:
+            return sum(1 for job, run, slot in self._pending if user is None or job.user == user)
+
+    def get(self, job_id: str) -> Optional[TranslationJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs_for(self, user: Optional[str] = None) -> List[TranslationJob]:
+        """Jobs of one user (or all users), newest first"""
+        self._cleanup()
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if user is None or job.user == user]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def remove(self, job_id: str) -> None:
+        """Forget a finished job and release its result files"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.active:
+                return
+            del self._jobs[job_id]
+        _release(job)
+
+    def _dispatch(self) -> None:
+        """Hand every pending job whose slot is free to the pool, keeping each user's jobs in order"""
+        with self._lock:
+            blocked = set()
+            ready = []
+            for entry in self._pending:
+                job, run, slot = entry
+                if job.user in blocked:
+                    continue
+                if slot is None or slot.try_start():
+                    ready.append(entry)
+                else:
+                    blocked.add(job.user)
+            for entry in ready:
+                self._pending.remove(entry)
+        for job, run, slot in ready:
+            self._executor.submit(self._run, job, run, slot)
+
+    def _run(self, job: TranslationJob, run: Callable[[TranslationJob], None],
+             slot: Optional[Admission] = None) -> None:
+        job.status = RUNNING
+        try:
+            run(job)
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            if slot is not None:
+                slot.release()
+                self._dispatch()
+
+    def _cleanup(self) -> None:
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [job for job in self._jobs.values() if job.finished_at and job.finished_at < cutoff]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            _release(job)
+
+
+def _release(job: TranslationJob) -> None:
+    """Close the spooled output files and the download bundle of a job"""
+    for file_info in job.files:
+        output = file_info.get('output')
+        if output is not None:
+            output.close()
+    bundle = job.info.get('bundle')
+    if bundle is not None:
+        bundle.close()
@@ -0,0 +1,187 @@
+"""Offline, in-process language identification.
+
+Detection works in two stages. The dominant Unicode script settles most
+non-Latin languages outright (Thai, Korean, Georgian, ...) and narrows
+shared scripts (Cyrillic, Arabic, Devanagari, Han) with characters or words
+that only one language uses. Latin-script text is scored against per-language
+profiles of common function words and distinctive letters. When the evidence
+is weak ``detect_language`` returns None so callers can fall back to the
+remote detector.
+"""
+import re
+import unicodedata
+from collections import Counter
+from typing import Optional
+
+# How much text is inspected when detecting a whole document
+SAMPLE_CHARS = 2000
+
+# Minimum number of Latin-profile hits and lead over the runner-up
+MIN_HITS = 2
+MIN_MARGIN = 1.2
+
+# Texts of at most SHORT_WORDS words need a lead of SHORT_MARGIN over the
+# runner-up: a couple of words shared by several profiles prove nothing
+SHORT_WORDS = 6
+SHORT_MARGIN = 2.0
+
+# Share of the words that must match the winning profile
+MIN_COVERAGE = 0.2
+
+# Scripts that identify a single language
+SCRIPT_LANGUAGES = {
+    'THAI': 'th',
+    'HANGUL': 'ko',
+    'HIRAGANA': 'ja',
+    'KATAKANA': 'ja',
+    'HEBREW': 'he',
+    'GEORGIAN': 'ka',
+    'ETHIOPIC': 'am',
+    'BENGALI': 'bn',
+    'TAMIL': 'ta',
+    'TELUGU': 'te',
+    'KANNADA': 'kn',
+    'MALAYALAM': 'ml',
+    'GUJARATI': 'gu',
+    'GURMUKHI': 'pa',
+    'SINHALA': 'si',
+    'MYANMAR': 'my',
+    'KHMER': 'km',
+    'LAO': 'lo',
+}
+
+# Letters that separate languages sharing a non-Latin script
+UKRAINIAN_LETTERS = set('іїєґІЇЄҐ')
+URDU_LETTERS = set('ٹڈڑںےہھ')
+PERSIAN_LETTERS = set('پچژگکی')
+
+NEPALI_WORDS = {'छ', 'छन्', 'र', 'मा', 'पनि', 'गर्न', 'हो', 'थियो', 'भएको', 'लागि', 'यो', 'तपाईं'}
+HINDI_WORDS = {'है', 'हैं', 'के', 'में', 'की', 'और', 'का', 'से', 'था', 'लिए', 'यह', 'आप', 'नहीं'}
+
+# Common function words per Latin-script language
+LATIN_WORDS = {
+    'en': 'the and of to is in that it was for with you this are have be not on as what '
+          'i a an am do can my me we he she they at by or from how where will would there',
+    'es': 'el la los las de que y en un una es por con para no se del al como pero está muy',
+    'fr': 'le la les des et est un une que qui dans pour pas sur avec ce il vous nous je du au mais',
+    'de': 'der die das und ist nicht ein eine zu mit den dem ich sie es auf für von auch sich wir',
+    'it': 'il lo gli della che non è per una sono con del questo anche come ma mi ci nel alla di',
+    'pt': 'o os as que não é um uma para com do da dos das em no na você mas muito está',
+    'nl': 'de het een en van is niet dat op te zijn met voor ik je maar ook wat er hij',
+    'sv': 'och att det är en som på för med inte jag har till av den om var men så vi',
+    'da': 'og at det er en som på for med ikke jeg har til af den de var men så vi hvad nu mig dig ved efter være',
+    'no': 'og at det er en som på for med ikke jeg har til av den de var men så vi hva nå meg deg vet etter bare',
+    'fi': 'ja on ei se että oli hän ovat mutta kun niin kuin tämä myös minä sinä olen ole mitä',
+    'pl': 'i w nie się na to jest że z do jak ale co tak po od dla już tylko czy',
+    'cs': 'a je se na v že to s z do jsou jako ale pro tak by není které jsem být co také',
+    'sk': 'a je sa na v že to s z do sú ako ale pre tak by nie ktoré som byť čo aj tiež',
+    'hu': 'a az és hogy nem is egy van de meg csak már ez mint volt még vagy ami én',
+    'tr': 've bir bu da de için ile ne çok daha gibi ama olarak var yok ben sen değil mi',
+    'vi': 'và của là có không được trong một cho những các này với người tôi đã để',
+    'id': 'yang dan di ini itu dengan untuk tidak dari dalam akan ada saya kami adalah juga bisa karena sangat tetapi',
+    'ms': 'yang dan di ini itu dengan untuk tidak dari dalam akan ada saya kami adalah juga boleh kerana ialah',
+    'sw': 'na ya wa kwa ni katika hii la za kama lakini sana hiyo huo yake mimi wewe kuwa',
+    'zu': 'ukuthi futhi kodwa ngoba uma kanye wena mina lokhu yini kakhulu nje abantu',
+    'af': 'die en is van het nie in n te wat vir op met dat ek jy sy was ook maar',
+    'is': 'og að er í á það ekki sem við til með um hann hún var ég en eru þetta',
+    'mt': 'il ta li u ma fil għal huwa hija dan din jew minn kien biex wkoll kif ħafna',
+    'cy': 'y yr a ac yn o i ar mae ei bod wedi gyda hyn ddim fel am roedd chi ni',
+    'ga': 'an na agus is ar i ag le go sé sí bhí tá ní seo sin mé atá leis don',
+    'eu': 'eta da ez du bat ere baina zen dira hau ditu dute izan bere nik zu hori oso',
+    'ca': 'el la els les de que i en un una és per amb no del al com però més molt aquest',
+    'gl': 'o a os as de que e en un unha é por con non do da dos das no na pero moi máis',
+    'eo': 'la kaj de en estas mi vi li ŝi ni ne al por kun kiu tio sed ankaŭ estis unu',
+}
+LATIN_WORDS = {code: set(words.split()) for code, words in LATIN_WORDS.items()}
+
+# Letters that are rare outside a few Latin-script languages
+LATIN_LETTERS = {
+    'es': set('ñ¿¡'),
+    'fr': set('çèêùœëî'),
+    'de': set('ßäöü'),
+    'pt': set('ãõç'),
+    'ca': set('ŀçò'),
+    'sv': set('åäö'),
+    'da': set('æøå'),
+    'no': set('æøå'),
+    'fi': set('äö'),
+    'pl': set('ąćęłńśźż'),
+    'cs': set('ěščřžůý'),
+    'sk': set('ľĺŕôäť'),
+    'hu': set('őűáé'),
+    'tr': set('ğşıç'),
+    'vi': set('ăđơưạảấầẩậếềểệịọỏốồổộớờởợụủứừửự'),
+    'is': set('ðþæ'),
+    'mt': set('ħġżċ'),
+    'cy': set('ŵŷ'),
+    'eo': set('ĉĝĥĵŝŭ'),
+}
+
+WORD = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+
+def _script(char: str) -> Optional[str]:
+    """Unicode script of a letter, taken from its character name"""
+    try:
+        name = unicodedata.name(char)
+    except ValueError:
+        return None
+    if name.startswith('CJK'):
+        return 'HAN'
+    return name.split(' ', 1)[0]
+
+
+def _detect_latin(words: list) -> Optional[str]:
+    """Score Latin-script words against the function-word and letter profiles"""
+    scores = Counter()
+    for word in words:
+        for code, vocabulary in LATIN_WORDS.items():
+            if word in vocabulary:
+                scores[code] += 1
+        letters = set(word)
+        for code, distinctive in LATIN_LETTERS.items():
+            if letters & distinctive:
+                scores[code] += 0.5
+
+    ranked = scores.most_common(2)
+    if not ranked:
+        return None
+    best_code, best = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0
+    margin = SHORT_MARGIN if len(words) <= SHORT_WORDS else MIN_MARGIN
+    if best < MIN_HITS or best < runner_up * margin or best / len(words) < MIN_COVERAGE:
+        return None  # Unsure: let the backend detect it
+    return best_code
+
+
+def detect_language(text: str) -> Optional[str]:
+    """Detect the language of a text locally; None when unsure"""
+    sample = text[:SAMPLE_CHARS]
+    scripts = Counter(_script(c) for c in sample if c.isalpha())
+    scripts.pop(None, None)
+    if not scripts:
+        return None
+
+    script, count = scripts.most_common(1)[0]
+    if count * 2 < sum(scripts.values()):
+        return None  # No dominant script
+
+    if script in ('HIRAGANA', 'KATAKANA', 'HAN') and (scripts['HIRAGANA'] or scripts['KATAKANA']):
+        return 'ja'
+    if script == 'HAN':
+        return 'ko' if scripts['HANGUL'] else 'zh'
+    if script in SCRIPT_LANGUAGES:
+        return SCRIPT_LANGUAGES[script]
+    if script == 'CYRILLIC':
+        return 'uk' if UKRAINIAN_LETTERS & set(sample) else 'ru'
+    if script == 'ARABIC':
+        letters = set(sample)
+        if URDU_LETTERS & letters:
+            return 'ur'
+        return 'fa' if PERSIAN_LETTERS & letters else 'ar'
+    if script == 'DEVANAGARI':
+        words = set(sample.split())
+        return 'ne' if len(words & NEPALI_WORDS) > len(words & HINDI_WORDS) else 'hi'
+    if script == 'LATIN':
+        return _detect_latin([word.lower() for word in WORD.findall(sample)])
+    return None
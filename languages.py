@@ -0,0 +1,73 @@
+"""Languages offered by the app and the selector options derived from them.
+
+Kept out of the Streamlit script so the option lists are built once per
+process instead of on every rerun.
+"""
+
+LANGUAGES = {
+    'auto': 'Auto Detect',
+    'en': 'English',
+    'es': 'Spanish', 
+    'fr': 'French',
+    'de': 'German',
+    'it': 'Italian',
+    'pt': 'Portuguese',
+    'ru': 'Russian',
+    'zh': 'Chinese',
+    'ja': 'Japanese',
+    'ko': 'Korean',
+    'ar': 'Arabic',
+    'hi': 'Hindi',
+    'nl': 'Dutch',
+    'sv': 'Swedish',
+    'da': 'Danish',
+    'no': 'Norwegian',
+    'fi': 'Finnish',
+    'pl': 'Polish',
+    'cs': 'Czech',
+    'sk': 'Slovak',
+    'hu': 'Hungarian',
+    'tr': 'Turkish',
+    'uk': 'Ukrainian',
+    'he': 'Hebrew',
+    'th': 'Thai',
+    'vi': 'Vietnamese',
+    'id': 'Indonesian',
+    'ms': 'Malay',
+    'fa': 'Persian',
+    'ur': 'Urdu',
+    'bn': 'Bengali',
+    'ta': 'Tamil',
+    'te': 'Telugu',
+    'kn': 'Kannada',
+    'ml': 'Malayalam',
+    'gu': 'Gujarati',
+    'pa': 'Punjabi',
+    'ne': 'Nepali',
+    'si': 'Sinhala',
+    'my': 'Myanmar',
+    'km': 'Khmer',
+    'lo': 'Lao',
+    'ka': 'Georgian',
+    'am': 'Amharic',
+    'sw': 'Swahili',
+    'zu': 'Zulu',
+    'af': 'Afrikaans',
+    'is': 'Icelandic',
+    'mt': 'Maltese',
+    'cy': 'Welsh',
+    'ga': 'Irish',
+    'eu': 'Basque',
+    'ca': 'Catalan',
+    'gl': 'Galician',
+    'eo': 'Esperanto'
+}
+
+SOURCE_OPTIONS = list(LANGUAGES.keys())
+SOURCE_LABELS = [f"{LANGUAGES[code]} ({code})" for code in SOURCE_OPTIONS]
+
+TARGET_OPTIONS = [code for code in LANGUAGES.keys() if code != 'auto']
+TARGET_LABELS = [f"{LANGUAGES[code]} ({code})" for code in TARGET_OPTIONS]
+
+# Default to English
+DEFAULT_TARGET = TARGET_OPTIONS.index('en') if 'en' in TARGET_OPTIONS else 0
@@ -0,0 +1,188 @@
+"""Process-wide metrics: timing spans, latency histograms and counters.
+
+Hot paths record into the module-level ``REGISTRY`` through ``span``,
+``observe`` and ``inc``. Metrics can be read as a snapshot for the admin
+panel or exported in the Prometheus text format, optionally served over HTTP
+on ``METRICS_HOST``:``METRICS_PORT`` (local only unless configured otherwise).
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+# Address of the Prometheus scrape endpoint; disabled when the port is unset
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: tuple, extra: Optional[tuple] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction: float) -> float:
+        """Approximate quantile: upper bound of the bucket holding it"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled counters and histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}     # name -> {labels: value}
+        self._histograms = {}   # name -> {labels: Histogram}
+        self._help = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """Time a block into histogram ``name``; ``outcome`` records whether it raised"""
+        start = time.perf_counter()
+        outcome = 'ok'
+        try:
+            yield
+        except BaseException:
+            outcome = 'error'
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, outcome=outcome, **labels)
+
+    def snapshot(self) -> dict:
+        """Counters and histogram summaries for display"""
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for name, series in sorted(self._counters.items())
+                    for labels, value in sorted(series.items())
+                ],
+                'histograms': [
+                    {
+                        'name': name,
+                        'labels': dict(labels),
+                        'count': histogram.count,
+                        'sum': histogram.sum,
+                        'p50': histogram.quantile(0.50),
+                        'p95': histogram.quantile(0.95),
+                    }
+                    for name, series in sorted(self._histograms.items())
+                    for labels, histogram in sorted(series.items())
+                ],
+            }
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe('translation_stage_seconds', 'Time spent per pipeline stage')
+REGISTRY.describe('translation_upstream_seconds', 'Latency of upstream calls per backend')
+REGISTRY.describe('translation_upstream_requests_total', 'Upstream calls by method')
+REGISTRY.describe('translation_characters_total', 'Characters sent upstream for translation')
+REGISTRY.describe('translation_user_characters_total', 'Characters sent upstream per user (cache hits excluded)')
+REGISTRY.describe('translation_chunk_retries_total', 'Chunks resubmitted after a failure')
+REGISTRY.describe('translation_cache_lookups_total', 'Translation cache lookups by result')
+REGISTRY.describe('translation_memory_lookups_total', 'Translation memory lookups by result')
+REGISTRY.describe('streamlit_rerun_seconds', 'Script run time of full app reruns and of fragment reruns')
+REGISTRY.describe('http_api_request_seconds', 'Latency of HTTP API requests per route')
+
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+span = REGISTRY.span
+
+
+def start_http_server(port: int = METRICS_PORT, registry: MetricsRegistry = REGISTRY,
+                      host: str = METRICS_HOST) -> ThreadingHTTPServer:
+    """Serve ``/metrics`` for Prometheus from a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes are frequent; keep them out of the app log
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
@@ -0,0 +1,241 @@
+"""Per-user metering of upstream usage and cost-aware admission control.
+
+Every request ``UpstreamTranslator`` sends upstream on a user's behalf is
+metered in characters and requests, per user and per language pair. Cache
+and translation memory hits never reach it, so they cost nothing. Outside a
+batch a request that does not fit in the remaining budget is refused as it
+is metered, before it is sent.
+
+Each user has a character budget per window (a day by default) and a
+limit on batches running at once. A batch is admitted before it starts,
+with an estimate taken from its upload sizes: an estimate that does not fit
+in the remaining budget is rejected. Admitted estimates are reserved until
+the batch ends, so simultaneous submissions cannot overdraw a budget
+together; as a batch is metered its reservation shrinks.
+
+Concurrency slots never block a thread: ``Admission.try_start`` claims one
+if the user has one free, so schedulers (``jobs.JobManager``) keep a batch
+queued until it can start and the HTTP API refuses it instead.
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import metrics
+
+# Characters each user may send upstream per window; 0 means unlimited
+QUOTA_CHARS_PER_WINDOW = int(os.environ.get("QUOTA_CHARS_PER_WINDOW", "5000000"))
+QUOTA_WINDOW_SECONDS = int(os.environ.get("QUOTA_WINDOW_SECONDS", str(24 * 3600)))
+
+# Per-user overrides, e.g. "admin=0,team=20000000"
+QUOTA_USER_BUDGETS = os.environ.get("QUOTA_USER_BUDGETS", "")
+
+# Batches one user may have translating at the same time; further ones wait
+QUOTA_MAX_CONCURRENT_JOBS = int(os.environ.get("QUOTA_MAX_CONCURRENT_JOBS", "2"))
+
+
+class QuotaExceeded(Exception):
+    """The requested work does not fit in the user's remaining budget"""
+
+
+def parse_budgets(spec: str) -> Dict[str, int]:
+    """Parse "user=chars,user=chars" budget overrides"""
+    budgets = {}
+    for item in spec.split(','):
+        if '=' in item:
+            user, chars = item.split('=', 1)
+            budgets[user.strip()] = int(chars)
+    return budgets
+
+
+class Admission:
+    """An admitted batch: holds its reservation and, while running, a concurrency slot.
+
+    Use it as a context manager around the batch, which claims a slot unless
+    ``try_start`` already did (raising ``QuotaExceeded`` if none is free) and
+    releases slot and reservation at the end. Pass it as the ``meter`` of the
+    batch's translators so its own usage is deducted from the reservation as
+    it is metered.
+    """
+
+    def __init__(self, manager: 'QuotaManager', user: str, estimate: int):
+        self.manager = manager
+        self.user = user
+        self.estimate = estimate
+        self.used = 0
+        self.running = False
+
+    @property
+    def outstanding(self) -> int:
+        """Part of the estimate not metered yet"""
+        return max(0, self.estimate - self.used)
+
+    def record(self, user: str, src_lang: str, dest_lang: str, chars: int) -> None:
+        self.manager.record(user, src_lang, dest_lang, chars, admission=self)
+
+    def try_start(self) -> bool:
+        """Claim a concurrency slot if the user has one free (never blocks)"""
+        return self.manager._try_start(self)
+
+    def release(self) -> None:
+        """Give back the slot and what is left of the reservation (idempotent)"""
+        self.manager._finish(self)
+
+    def __enter__(self) -> 'Admission':
+        if not self.running and not self.try_start():
+            self.release()
+            raise QuotaExceeded(f"{self.manager.max_jobs} of your batches are already running; "
+                                f"try again when one has finished.")
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class QuotaManager:
+    """Process-wide usage meter and admission control for all users"""
+
+    def __init__(self, default_budget: int = QUOTA_CHARS_PER_WINDOW, budgets: Optional[Dict[str, int]] = None,
+                 window: int = QUOTA_WINDOW_SECONDS, max_jobs: int = QUOTA_MAX_CONCURRENT_JOBS):
+        self.default_budget = default_budget
+        self.budgets = parse_budgets(QUOTA_USER_BUDGETS) if budgets is None else budgets
+        self.window = window
+        self.max_jobs = max(1, max_jobs)
+        self._cond = threading.Condition()
+        self._window_start = self._current_window()
+        self._usage = {}        # user -> {'chars', 'requests'} in the current window
+        self._pairs = {}        # (user, src, dest) -> {'chars', 'requests'} in the current window
+        self._admissions = {}   # user -> [Admission] reserved or running
+        self.rejected = 0
+
+    def budget(self, user: str) -> int:
+        """Characters per window for a user (0 = unlimited)"""
+        return self.budgets.get(user, self.default_budget)
+
+    def record(self, user: str, src_lang: str, dest_lang: str, chars: int,
+               admission: Optional[Admission] = None) -> None:
+        """Meter one upstream request of ``chars`` characters (made for ``admission``, if given).
+
+        Requests of an admitted batch draw on its reservation; any other
+        request is refused with ``QuotaExceeded`` when it does not fit in the
+        remaining budget.
+        """
+        with self._cond:
+            self._roll()
+            if admission is not None:
+                admission.used += chars
+            else:
+                remaining = self._remaining(user)
+                if remaining is not None and chars > remaining:
+                    self.rejected += 1
+                    raise QuotaExceeded(f"Character budget exhausted: {remaining:,} of {self.budget(user):,} left, "
+                                        f"{chars:,} needed. It resets in {self._resets_in():.0f} minutes.")
+            for counter in (self._usage.setdefault(user, {'chars': 0, 'requests': 0}),
+                            self._pairs.setdefault((user, src_lang, dest_lang), {'chars': 0, 'requests': 0})):
+                counter['chars'] += chars
+                counter['requests'] += 1
+        metrics.inc('translation_user_characters_total', chars, user=user)
+
+    def remaining(self, user: str) -> Optional[int]:
+        """Characters left in the window after usage and reservations (None = unlimited)"""
+        with self._cond:
+            self._roll()
+            return self._remaining(user)
+
+    def admit(self, user: str, estimate: int, start: bool = False) -> Admission:
+        """Reserve ``estimate`` characters for a batch or raise ``QuotaExceeded``.
+
+        With ``start`` a concurrency slot is claimed as well, and a user with
+        none free is refused instead of queued.
+        """
+        with self._cond:
+            self._roll()
+            remaining = self._remaining(user)
+            if remaining is not None and estimate > remaining:
+                self.rejected += 1
+                raise QuotaExceeded(
+                    f"This batch needs about {estimate:,} characters but only {remaining:,} of your "
+                    f"{self.budget(user):,} are left. The budget resets in {self._resets_in():.0f} minutes."
+                )
+            if start and self._running(user) >= self.max_jobs:
+                self.rejected += 1
+                raise QuotaExceeded(f"{self.max_jobs} of your batches are already running; "
+                                    f"try again when one has finished.")
+            admission = Admission(self, user, estimate)
+            admission.running = start
+            self._admissions.setdefault(user, []).append(admission)
+            return admission
+
+    def usage(self, user: str) -> dict:
+        """Usage of one user in the current window for display"""
+        with self._cond:
+            self._roll()
+            counter = self._usage.get(user, {'chars': 0, 'requests': 0})
+            return {
+                'chars': counter['chars'],
+                'requests': counter['requests'],
+                'budget': self.budget(user),
+                'remaining': self._remaining(user),
+                'reserved': sum(a.outstanding for a in self._admissions.get(user, [])),
+                'running': self._running(user),
+                'pairs': {f"{src}→{dest}": dict(value) for (owner, src, dest), value in sorted(self._pairs.items())
+                          if owner == user},
+            }
+
+    def stats(self) -> dict:
+        """Usage of every user in the current window for display"""
+        with self._cond:
+            users = sorted(set(self._usage) | set(self._admissions))
+        return {
+            'window_seconds': self.window,
+            'resets_in_minutes': self._resets_in(),
+            'rejected': self.rejected,
+            'users': {user: self.usage(user) for user in users},
+        }
+
+    def _try_start(self, admission: Admission) -> bool:
+        with self._cond:
+            if admission.running:
+                return True
+            if admission not in self._admissions.get(admission.user, []):
+                return False  # Already released
+            if self._running(admission.user) >= self.max_jobs:
+                return False
+            admission.running = True
+            return True
+
+    def _finish(self, admission: Admission) -> None:
+        with self._cond:
+            admissions = self._admissions.get(admission.user, [])
+            if admission in admissions:
+                admissions.remove(admission)
+            if not admissions:
+                self._admissions.pop(admission.user, None)
+            admission.running = False
+
+    def _running(self, user: str) -> int:
+        return sum(1 for a in self._admissions.get(user, []) if a.running)
+
+    def _remaining(self, user: str) -> Optional[int]:
+        """Remaining budget (called with the lock held)"""
+        budget = self.budget(user)
+        if budget <= 0:
+            return None
+        used = self._usage.get(user, {'chars': 0})['chars']
+        reserved = sum(a.outstanding for a in self._admissions.get(user, []))
+        return max(0, budget - used - reserved)
+
+    def _current_window(self) -> float:
+        return time.time() // self.window * self.window
+
+    def _resets_in(self) -> float:
+        return (self._window_start + self.window - time.time()) / 60
+
+    def _roll(self) -> None:
+        """Start a new window once the current one is over (called with the lock held)"""
+        window_start = self._current_window()
+        if window_start != self._window_start:
+            self._window_start = window_start
+            self._usage.clear()
+            self._pairs.clear()
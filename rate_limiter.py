@@ -0,0 +1,117 @@
+"""Process-wide upstream rate limiting with priorities, per-user fairness and adaptive backoff"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Sustained upstream requests per second and burst size
+RATE_LIMIT = float(os.environ.get("UPSTREAM_RATE_LIMIT", "10"))
+RATE_BURST = int(os.environ.get("UPSTREAM_RATE_BURST", "20"))
+
+# Adaptive backoff: the rate is halved on throttling and recovers additively
+MIN_RATE = 0.5
+RECOVERY_STEP = 0.1
+MAX_BACKOFF_SECONDS = 30.0
+
+# Request priorities, lowest value served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+THROTTLING_MARKERS = ('429', 'too many requests', 'rate limit', 'ratelimit', 'throttl', 'quota')
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """Heuristic for upstream errors caused by rate limiting"""
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLING_MARKERS)
+
+
+class RateLimiter:
+    """Token bucket shared by all sessions.
+
+    Waiting requests are queued per priority and per user: interactive
+    requests always go before bulk ones, and within a priority users are
+    served round-robin so one large batch cannot starve everyone else. When
+    upstream reports throttling the rate is halved and all requests pause
+    for an exponentially growing backoff; successes raise the rate again
+    step by step up to the configured limit (AIMD).
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT, burst: int = RATE_BURST):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff = 1.0
+        self._queues = {PRIORITY_INTERACTIVE: OrderedDict(), PRIORITY_BULK: OrderedDict()}
+        self._cond = threading.Condition()
+        self.throttled = 0
+
+    def acquire(self, user: str = '', priority: int = PRIORITY_BULK) -> None:
+        """Block until this caller may send one upstream request"""
+        ticket = object()
+        with self._cond:
+            self._queues[priority].setdefault(user, deque()).append(ticket)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._head() is ticket and self._tokens >= 1 and now >= self._paused_until:
+                    self._tokens -= 1
+                    self._dequeue(priority, user)
+                    self._cond.notify_all()
+                    return
+                self._cond.wait(timeout=self._wait_time(now))
+
+    def report_throttled(self) -> None:
+        """Upstream throttled us: halve the rate and pause with exponential backoff"""
+        with self._cond:
+            self.throttled += 1
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self._paused_until = max(self._paused_until, time.monotonic() + self._backoff)
+            self._backoff = min(MAX_BACKOFF_SECONDS, self._backoff * 2)
+            self._tokens = min(self._tokens, 1.0)
+
+    def report_success(self) -> None:
+        """A request went through: recover the rate additively"""
+        with self._cond:
+            self._backoff = 1.0
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + RECOVERY_STEP)
+
+    def stats(self) -> dict:
+        """Limiter state for display"""
+        with self._cond:
+            return {
+                'rate': self.rate,
+                'max_rate': self.max_rate,
+                'throttled': self.throttled,
+                'waiting': sum(len(q) for queues in self._queues.values() for q in queues.values()),
+            }
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _head(self):
+        """Ticket allowed to go next: highest priority, then round-robin across users"""
+        for priority in sorted(self._queues):
+            for tickets in self._queues[priority].values():
+                return tickets[0]
+        return None
+
+    def _dequeue(self, priority: int, user: str) -> None:
+        """Remove a granted ticket and move its user to the back of the round-robin"""
+        users = self._queues[priority]
+        tickets = users.pop(user)
+        tickets.popleft()
+        if tickets:
+            users[user] = tickets
+
+    def _wait_time(self, now: float) -> float:
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        return 1.0  # Not at the head of the queue: woken by the next grant, re-check as a safety net
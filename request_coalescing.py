@@ -0,0 +1,200 @@
+"""Coalescing of concurrent upstream translation requests across all sessions.
+
+Two techniques cut the number of upstream calls when many users are active:
+
+* Single-flight: concurrent identical requests (same text and language pair)
+  share one upstream call; every waiter receives the same result.
+* Micro-batching: short single-line texts for the same language pair that
+  arrive within a few milliseconds of each other are sent as one request,
+  one text per line, and the response is split back by line. If the backend
+  does not keep the lines apart the texts are translated one by one instead.
+
+A shared call is made with its first caller's translate function, so it
+waits in the rate limiter at that caller's priority: requests are only
+shared with others of the same priority, and an interactive text never
+rides in a bulk batch.
+"""
+import os
+import threading
+from typing import Callable, NamedTuple, Optional
+
+# How long the first text of a micro-batch waits for others to join
+BATCH_WINDOW_SECONDS = float(os.environ.get("COALESCE_BATCH_WINDOW_MS", "20")) / 1000
+
+# Size limits of one micro-batch and of the texts that may join one
+BATCH_MAX_CHARS = int(os.environ.get("COALESCE_BATCH_MAX_CHARS", "2000"))
+BATCH_MAX_ITEMS = int(os.environ.get("COALESCE_BATCH_MAX_ITEMS", "50"))
+BATCH_ITEM_MAX_CHARS = int(os.environ.get("COALESCE_BATCH_ITEM_MAX_CHARS", "300"))
+
+
+class BatchedResult(NamedTuple):
+    """Translation of one micro-batched text (mirrors translatepy's result attributes)"""
+    result: str
+    source_language: str
+
+
+class _Call:
+    """One upstream call that several callers wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs ``fn`` once per key at a time; concurrent callers share its outcome"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, fn: Callable):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class _Batch:
+    """Texts collected for one micro-batched upstream request"""
+
+    def __init__(self):
+        self.texts = []
+        self.chars = 0
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Groups short texts of one language pair and priority into a single upstream request.
+
+    The first caller of a batch waits up to ``window`` seconds for others to
+    join (or until the batch is full), then sends it with its own translate
+    function; later callers wait for the shared response.
+    """
+
+    def __init__(self, window: float = BATCH_WINDOW_SECONDS, max_chars: int = BATCH_MAX_CHARS,
+                 max_items: int = BATCH_MAX_ITEMS, item_max_chars: int = BATCH_ITEM_MAX_CHARS):
+        self.window = window
+        self.max_chars = max_chars
+        self.max_items = max_items
+        self.item_max_chars = item_max_chars
+        self._lock = threading.Lock()
+        self._open = {}
+        self.batches = 0
+        self.batched_texts = 0
+        self.fallbacks = 0
+
+    def accepts(self, text: str, src_lang: str) -> bool:
+        """Only short single-line texts with a known source language are batched"""
+        return src_lang != 'auto' and '\n' not in text and 0 < len(text) <= self.item_max_chars
+
+    def translate(self, translate_fn: Callable, text: str, dest_lang: str, src_lang: str,
+                  priority: Optional[int] = None) -> BatchedResult:
+        key = (priority, src_lang, dest_lang)
+        with self._lock:
+            batch = self._open.get(key)
+            if batch is not None and batch.chars + len(text) + 1 > self.max_chars:
+                self._close(key, batch)
+                batch = None
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+            index = len(batch.texts)
+            batch.texts.append(text)
+            batch.chars += len(text) + 1
+            if len(batch.texts) >= self.max_items:
+                self._close(key, batch)
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                self._close(key, batch)
+            self._send(translate_fn, batch, dest_lang, src_lang)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return BatchedResult(batch.results[index], src_lang)
+
+    def _close(self, key: tuple, batch: _Batch) -> None:
+        """Stop a batch from accepting texts (called with the lock held)"""
+        if self._open.get(key) is batch:
+            del self._open[key]
+        batch.full.set()
+
+    def _send(self, translate_fn: Callable, batch: _Batch, dest_lang: str, src_lang: str) -> None:
+        try:
+            if len(batch.texts) == 1:
+                batch.results = [translate_fn(batch.texts[0], dest_lang, src_lang).result]
+            else:
+                lines = translate_fn('\n'.join(batch.texts), dest_lang, src_lang).result.split('\n')
+                if len(lines) == len(batch.texts):
+                    batch.results = [line.strip() for line in lines]
+                    self.batches += 1
+                    self.batched_texts += len(batch.texts)
+                else:
+                    # Lines were merged or split upstream: translate the texts separately
+                    self.fallbacks += 1
+                    batch.results = [translate_fn(text, dest_lang, src_lang).result for text in batch.texts]
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+
+class RequestCoalescer:
+    """Process-wide single-flight and micro-batching front for upstream translations"""
+
+    def __init__(self, single_flight: Optional[SingleFlight] = None, batcher: Optional[MicroBatcher] = None):
+        self.single_flight = single_flight or SingleFlight()
+        self.batcher = batcher or MicroBatcher()
+        self.requests = 0
+
+    def translate(self, translate_fn: Callable, text: str, dest_lang: str, src_lang: str = 'auto',
+                  priority: Optional[int] = None):
+        """Translate through ``translate_fn(text, dest, src)``, sharing calls with requests of the same priority"""
+        self.requests += 1
+
+        def call():
+            if self.batcher.accepts(text, src_lang):
+                return self.batcher.translate(translate_fn, text, dest_lang, src_lang, priority)
+            return translate_fn(text, dest_lang, src_lang)
+
+        return self.single_flight.do(('translate', priority, text, dest_lang, src_lang), call)
+
+    def stats(self) -> dict:
+        """Coalescing counters for display"""
+        batcher = self.batcher
+        return {
+            'requests': self.requests,
+            'shared': self.single_flight.shared,
+            'batches': batcher.batches,
+            'batched_texts': batcher.batched_texts,
+            'fallbacks': batcher.fallbacks,
+            'saved_calls': self.single_flight.shared + batcher.batched_texts - batcher.batches,
+        }
@@ -0,0 +1,108 @@
+"""Boundary-aware, lossless text segmentation for translation requests"""
+import re
+from typing import Iterable, Iterator, List, Optional
+
+# Default size budget for one segment (characters per upstream request)
+MAX_SEGMENT_CHARS = 5000
+
+# A blank line (plus any whitespace around it) separates paragraphs
+PARAGRAPH_BREAK = re.compile(r'\n[ \t\r\f\v]*\n\s*')
+
+# End of a sentence: terminal punctuation, optional closing quotes/brackets, then whitespace
+SENTENCE_END = re.compile(r'[.!?。！？]+[\)\]"\'»”’]*\s+')
+
+# Boundary between sentence units: a sentence end or any line break
+UNIT_BREAK = re.compile(r'[.!?。！？]+[\)\]"\'»”’]*[ \t]+|\s*\n\s*')
+
+
+def _cut_point(buffer: str, max_chars: int) -> int:
+    """Best place to cut an oversized buffer: line, then sentence, then word boundary"""
+    window = buffer[:max_chars]
+
+    newline = window.rfind('\n')
+    if newline > 0:
+        return newline + 1
+
+    sentence_end = 0
+    for match in SENTENCE_END.finditer(window):
+        sentence_end = match.end()
+    if sentence_end:
+        return sentence_end
+
+    for i in range(len(window) - 1, 0, -1):
+        if window[i].isspace():
+            return i + 1
+
+    return max_chars  # No boundary at all, hard cut
+
+
+def _next_cut(buffer: str, max_chars: int, final: bool) -> Optional[int]:
+    """Where the next complete segment ends, or None if more input is needed"""
+    if len(buffer) <= max_chars:
+        # Everything buffered still fits; later pieces may add more paragraphs
+        return len(buffer) if final and buffer else None
+
+    # Pack as many whole paragraphs as fit in the budget. Any break ending
+    # within it is followed by more text, so it cannot grow with the next piece
+    cut = 0
+    for match in PARAGRAPH_BREAK.finditer(buffer):
+        if match.end() > max_chars:
+            break
+        cut = match.end()
+    # Only a paragraph too large on its own is cut inside
+    return cut or _cut_point(buffer, max_chars)
+
+
+def iter_segments(pieces: Iterable[str], max_chars: int = MAX_SEGMENT_CHARS) -> Iterator[str]:
+    """Split streamed text into segments of at most ``max_chars``.
+
+    Whole paragraphs are packed into each segment while they fit the budget;
+    a paragraph longer than the budget is cut at line, sentence or word
+    boundaries. Separators stay attached to the segment they follow, so
+    ``''.join(segments)`` always reproduces the input exactly.
+    """
+    buffer = ''
+    for piece in pieces:
+        buffer += piece
+        cut = _next_cut(buffer, max_chars, final=False)
+        while cut is not None:
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+            cut = _next_cut(buffer, max_chars, final=False)
+
+    cut = _next_cut(buffer, max_chars, final=True)
+    while cut is not None:
+        yield buffer[:cut]
+        buffer = buffer[cut:]
+        cut = _next_cut(buffer, max_chars, final=True)
+
+
+def segment_text(text: str, max_chars: int = MAX_SEGMENT_CHARS) -> List[str]:
+    """Segment a complete string (see ``iter_segments``)"""
+    return list(iter_segments([text], max_chars))
+
+
+def split_whitespace(segment: str) -> tuple:
+    """Split a segment into (leading whitespace, translatable core, trailing whitespace)"""
+    core = segment.strip()
+    if not core:
+        return segment, '', ''
+    start = segment.index(core)
+    return segment[:start], core, segment[start + len(core):]
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences and lines, separators attached; ``''.join`` is lossless.
+
+    No sentence core (see ``split_whitespace``) contains a line break, so
+    cores can be sent upstream one per line and matched back by position.
+    """
+    units = []
+    start = 0
+    for match in UNIT_BREAK.finditer(text):
+        if match.end() > start:
+            units.append(text[start:match.end()])
+            start = match.end()
+    if start < len(text):
+        units.append(text[start:])
+    return units
@@ -1,7 +1,22 @@
 import streamlit as st
-from translatepy import Translator
 import time
 import hashlib
+import functools
+from contextlib import contextmanager
+import metrics
+from backend_router import BackendRouter
+from history_store import HistoryStore
+from jobs import JobManager
+from languages import (DEFAULT_TARGET, LANGUAGES, SOURCE_LABELS, SOURCE_OPTIONS, TARGET_LABELS,
+                       TARGET_OPTIONS)
+from quota import QuotaExceeded, QuotaManager
+from rate_limiter import RateLimiter
+from request_coalescing import RequestCoalescer
+from translation_cache import TranslationCache
+from translation_engine import SpooledOutput, ZipBundle, memory_suggestions
+from translation_memory import TranslationMemory
+from translation_service import TranslationService, read_text, translated_filename
+from translator_pool import TranslatorPool
 
 # Page configuration
 st.set_page_config(
@@ -121,15 +136,99 @@ def logout_button():
             st.session_state.username = None
             st.rerun()
 
+@st.cache_resource
+def get_translation_cache() -> TranslationCache:
+    """Process-wide translation cache shared by all sessions"""
+    return TranslationCache()
+
+@st.cache_resource
+def get_translation_memory() -> TranslationMemory:
+    """Process-wide sentence-level translation memory shared by all sessions"""
+    return TranslationMemory()
+
+@st.cache_resource
+def get_history_store() -> HistoryStore:
+    """Process-wide persistent translation history"""
+    return HistoryStore()
+
+@st.cache_resource
+def get_translator_pool() -> TranslatorPool:
+    """Process-wide pool of translator clients shared by all sessions"""
+    return TranslatorPool()
+
+@st.cache_resource
+def get_backend_router() -> BackendRouter:
+    """Process-wide backend health tracker and router (reports throttled backends to the rate limiter)"""
+    return BackendRouter(limiter=get_rate_limiter())
+
+@st.cache_resource
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide upstream rate limiter shared by all sessions"""
+    return RateLimiter()
+
+@st.cache_resource
+def get_request_coalescer() -> RequestCoalescer:
+    """Process-wide single-flight and micro-batching of upstream requests"""
+    return RequestCoalescer()
+
+@st.cache_resource
+def get_quota_manager() -> QuotaManager:
+    """Process-wide per-user usage meter, budgets and batch admission control"""
+    return QuotaManager()
+
+@st.cache_resource
+def get_translation_service() -> TranslationService:
+    """Process-wide translation engine built on the shared resources above"""
+    return TranslationService(
+        pool=get_translator_pool(),
+        router=get_backend_router(),
+        limiter=get_rate_limiter(),
+        coalescer=get_request_coalescer(),
+        cache=get_translation_cache(),
+        memory=get_translation_memory(),
+        quota=get_quota_manager()
+    )
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Serve Prometheus metrics once per process when METRICS_PORT is set"""
+    return metrics.start_http_server() if metrics.METRICS_PORT else None
+
+# How often the job panel refreshes while a batch is running
+JOB_POLL_SECONDS = 1.0
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """Process-wide background worker pool for batch translation jobs"""
+    return JobManager()
+
+@contextmanager
+def rerun_timer(scope: str):
+    """Record how long one run of the app script (or of one fragment) takes"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        # st.rerun() and st.stop() end a run by raising, so no outcome is recorded
+        metrics.observe('streamlit_rerun_seconds', time.perf_counter() - start, scope=scope)
+
+def timed_fragment(scope: str, run_every=None):
+    """``st.fragment`` whose reruns are timed under ``scope``"""
+    def decorator(render):
+        @functools.wraps(render)
+        def timed(*args, **kwargs):
+            with rerun_timer(scope):
+                return render(*args, **kwargs)
+        return st.fragment(timed, run_every=run_every)
+    return decorator
+
 # Initialize session state
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
 if 'username' not in st.session_state:
     st.session_state.username = None
-if 'translation_history' not in st.session_state:
-    st.session_state.translation_history = []
-if 'translator' not in st.session_state:
-    st.session_state.translator = Translator()
+if 'history_pages' not in st.session_state:
+    st.session_state.history_pages = [None]  # Keyset cursor of each page visited so far
 
 # Authentication check
 if not st.session_state.authenticated:
@@ -139,414 +238,538 @@ if not st.session_state.authenticated:
 # Add logout button to sidebar
 logout_button()
 
-# Language options
-LANGUAGES = {
-    'auto': 'Auto Detect',
-    'en': 'English',
-    'es': 'Spanish', 
-    'fr': 'French',
-    'de': 'German',
-    'it': 'Italian',
-    'pt': 'Portuguese',
-    'ru': 'Russian',
-    'zh': 'Chinese',
-    'ja': 'Japanese',
-    'ko': 'Korean',
-    'ar': 'Arabic',
-    'hi': 'Hindi',
-    'nl': 'Dutch',
-    'sv': 'Swedish',
-    'da': 'Danish',
-    'no': 'Norwegian',
-    'fi': 'Finnish',
-    'pl': 'Polish',
-    'cs': 'Czech',
-    'sk': 'Slovak',
-    'hu': 'Hungarian',
-    'tr': 'Turkish',
-    'uk': 'Ukrainian',
-    'he': 'Hebrew',
-    'th': 'Thai',
-    'vi': 'Vietnamese',
-    'id': 'Indonesian',
-    'ms': 'Malay',
-    'fa': 'Persian',
-    'ur': 'Urdu',
-    'bn': 'Bengali',
-    'ta': 'Tamil',
-    'te': 'Telugu',
-    'kn': 'Kannada',
-    'ml': 'Malayalam',
-    'gu': 'Gujarati',
-    'pa': 'Punjabi',
-    'ne': 'Nepali',
-    'si': 'Sinhala',
-    'my': 'Myanmar',
-    'km': 'Khmer',
-    'lo': 'Lao',
-    'ka': 'Georgian',
-    'am': 'Amharic',
-    'sw': 'Swahili',
-    'zu': 'Zulu',
-    'af': 'Afrikaans',
-    'is': 'Icelandic',
-    'mt': 'Maltese',
-    'cy': 'Welsh',
-    'ga': 'Irish',
-    'eu': 'Basque',
-    'ca': 'Catalan',
-    'gl': 'Galician',
-    'eo': 'Esperanto'
-}
-
 def translate_text(text: str, src_lang: str, dest_lang: str) -> tuple:
-    """Translate text using translatepy"""
+    """Translate text using translatepy, re-translating only sentences edited since the last run"""
     try:
-        translator = st.session_state.translator
-        
-        if src_lang == 'auto':
-            # Auto-detect source language
-            result = translator.translate(text, dest_lang)
-            detected = translator.language(text)
-            return result.result, detected.result
-        else:
-            result = translator.translate(text, dest_lang, src_lang)
-            return result.result, src_lang
+        # Segments of the previous translation are kept per session and language pair
+        previous = st.session_state.get('text_segments')
+        if previous is None or previous['languages'] != (src_lang, dest_lang):
+            previous = {'languages': (src_lang, dest_lang), 'segments': [], 'detected': None}
+        
+        translated_text, detected, segments = get_translation_service().translate_text(
+            text, src_lang, dest_lang, user=st.session_state.username or '',
+            previous=previous['segments'], fuzzy=st.session_state.get('reuse_fuzzy', False)
+        )
+        detected = detected or previous['detected']
+        st.session_state.text_segments = {'languages': (src_lang, dest_lang), 'segments': segments, 'detected': detected}
+        return translated_text, detected
             
     except Exception as e:
         st.error(f"Translation error: {str(e)}")
         return "", ""
 
-def translate_file_content(content: str, src_lang: str, dest_lang: str) -> str:
-    """Translate the content of a file"""
-    try:
-        translator = st.session_state.translator
-        
-        # Split content into smaller chunks to avoid API limits
-        chunks = [content[i:i+5000] for i in range(0, len(content), 5000)]
-        translated_chunks = []
-        
-        for chunk in chunks:
-            if chunk.strip():  # Only translate non-empty chunks
-                if src_lang == 'auto':
-                    result = translator.translate(chunk, dest_lang)
-                else:
-                    result = translator.translate(chunk, dest_lang, src_lang)
-                translated_chunks.append(result.result)
-            else:
-                translated_chunks.append(chunk)  # Keep empty chunks as is
-        
-        return '\n'.join(translated_chunks)
-        
-    except Exception as e:
-        st.error(f"Error translating file content: {str(e)}")
-        return content  # Return original content if translation fails
-
-def main():
-    # Header
-    st.markdown('<h1 class="main-header">🌐 Secure File Translator</h1>', unsafe_allow_html=True)
-    st.markdown("**Multi-language translation with secure access control**")
+def render_file_result(file_info: dict):
+    """Display download and preview controls for one translated file"""
+    key = file_info.get('key', file_info['translated_name'])
+    col1, col2 = st.columns([3, 1])
     
-    # Create tabs for different functionalities
-    tab1, tab2 = st.tabs(["📄 File Translation", "✍️ Text Translation"])
+    with col1:
+        st.markdown(f"**{file_info['translated_name']}**")
     
-    with tab1:
-        st.subheader("📁 Batch File Translation")
-        
-        # Language selection for files
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("**From Language:**")
-            source_options = list(LANGUAGES.keys())
-            source_labels = [f"{LANGUAGES[code]} ({code})" for code in source_options]
+    with col2:
+        st.download_button(
+            label="📥 Download",
+            data=file_info['output'].getvalue,  # Read from the spooled file only when downloaded
+            file_name=file_info['translated_name'],
+            mime='text/plain',
+            key=f"download_{key}"
+        )
+    
+    # The preview is only rendered while its expander is open
+    preview = st.expander(f"👁️ Preview: {file_info['translated_name']}", key=f"preview_{key}", on_change="rerun")
+    with preview:
+        if preview.open:
+            col_orig, col_trans = st.columns(2)
             
-            selected_src_idx_file = st.selectbox(
-                "Source language:",
-                range(len(source_options)),
-                format_func=lambda x: source_labels[x],
-                key="src_lang_file",
-                index=0  # Default to auto-detect
+            with col_orig:
+                st.markdown("**Original:**")
+                st.text_area(
+                    "Original content",
+                    value=file_info['original_preview'] + ("..." if file_info['original_size'] > len(file_info['original_preview'].encode('utf-8')) else ""),
+                    height=200,
+                    key=f"orig_{key}",
+                    disabled=True
+                )
+            
+            with col_trans:
+                st.markdown("**Translated:**")
+                st.text_area(
+                    "Translated content",
+                    value=file_info['output'].preview + ("..." if file_info['output'].size > len(file_info['output'].preview.encode('utf-8')) else ""),
+                    height=200,
+                    key=f"trans_{key}",
+                    disabled=True
+                )
+
+def batch_estimate(uploaded_files: list, dest_langs: list) -> int:
+    """Upper bound of the characters a batch sends upstream: UTF-8 never has fewer bytes than characters"""
+    return sum(uploaded_file.size for uploaded_file in uploaded_files) * len(dest_langs)
+
+def submit_batch_job(uploaded_files: list, src_lang: str, dest_langs: list):
+    """Queue a batch translation of the uploaded files into one or more languages as a background job.
+    
+    Raises ``QuotaExceeded`` before anything is queued when the batch does not fit in the user's budget.
+    """
+    # Everything that needs the script context is resolved here, before the job starts
+    service = get_translation_service()
+    files = list(uploaded_files)
+    username = st.session_state.username
+    admission = service.admit(username, batch_estimate(files, dest_langs))
+    fuzzy = st.session_state.get('reuse_fuzzy', False)
+    from_lang = LANGUAGES[src_lang]
+    to_lang = ', '.join(LANGUAGES[dest_lang] for dest_lang in dest_langs)
+    bundle = ZipBundle()
+    
+    def run(job):
+        # Uploads are decoded, segmented and detected once as they are read;
+        # every file's chunks for every target share one work queue and
+        # output is spooled
+        previews = {}
+        
+        def file_done(index: int, output: SpooledOutput, errors: list, dest_lang: str):
+            uploaded_file = files[index]
+            fatal = [message for chunk_index, message in errors if chunk_index is None]
+            translated_name = translated_filename(uploaded_file.name, dest_lang)
+            if not fatal:
+                # Finished files go into the download bundle straight away
+                translated_name = bundle.add(translated_name, output)
+            job.add_file({
+                'original_name': uploaded_file.name,
+                'translated_name': translated_name,
+                'dest_lang': dest_lang,
+                'key': f"{job.id}_{translated_name}",
+                'output': output,
+                'original_preview': previews.get(uploaded_file.name, ''),
+                'original_size': uploaded_file.size,
+                'errors': errors,
+                'error': fatal[0] if fatal else None
+            })
+        
+        try:
+            service.translate_documents(
+                [read_text(uploaded_file, uploaded_file.name, uploaded_file.type, previews) for uploaded_file in files],
+                [uploaded_file.name for uploaded_file in files],
+                src_lang, dest_langs, user=username or '', fuzzy=fuzzy, admission=admission,
+                sinks=[[SpooledOutput() for _ in dest_langs] for _ in files],
+                sizes=[uploaded_file.size for uploaded_file in files],
+                on_progress=job.update_progress,
+                on_file_done=file_done
             )
-            selected_src_code_file = source_options[selected_src_idx_file]
+        finally:
+            bundle.finalize()
         
-        with col2:
-            st.markdown("**To Language:**")
-            target_options = [code for code in LANGUAGES.keys() if code != 'auto']
-            target_labels = [f"{LANGUAGES[code]} ({code})" for code in target_options]
-            
-            # Default to English
-            default_target = target_options.index('en') if 'en' in target_options else 0
-            
+        translated = list(dict.fromkeys(file_info['original_name'] for file_info in job.files if not file_info['error']))
+        if translated:
+            history.add_batch(username, from_lang, to_lang, translated)
+    
+    history = get_history_store()
+    return get_job_manager().submit(
+        username, run, slot=admission,
+        src_lang=src_lang, dest_langs=list(dest_langs), file_count=len(files), bundle=bundle
+    )
+
+def render_job(state: dict):
+    """Display progress or results of one batch job"""
+    status_labels = {'queued': '⏳ Queued', 'running': '🔄 Running', 'done': '✅ Completed', 'failed': '❌ Failed'}
+    targets = ', '.join(LANGUAGES[dest_lang] for dest_lang in state['dest_langs'])
+    st.markdown(
+        f"**📦 Job {state['id']}** | {state['file_count']} file(s) | "
+        f"{LANGUAGES[state['src_lang']]} → {targets} | {status_labels[state['status']]}"
+    )
+    
+    progress = state['progress']
+    if state['status'] == 'queued':
+        st.info(f"⏳ Waiting for a free worker or for one of your other batches to finish "
+                f"(at most {get_quota_manager().max_jobs} run at once)")
+    elif state['status'] == 'running':
+        st.progress(min(progress.get('done_bytes', 0) / max(progress.get('total_bytes', 0), 1), 1.0))
+        st.text(
+            f"Translating... {progress.get('done_files', 0)}/{state['file_count'] * len(state['dest_langs'])} files, "
+            f"{progress.get('done_chunks', 0)}/{progress.get('total_chunks', 0)} chunks, "
+            f"{progress.get('done_bytes', 0) / 1024:.1f}/{progress.get('total_bytes', 0) / 1024:.1f} KB"
+        )
+    elif state['status'] == 'failed':
+        st.error(f"Error translating files: {state['error']}")
+    
+    stage_seconds = progress.get('stage_seconds')
+    if state['status'] == 'done' and stage_seconds:
+        st.caption(
+            f"⏱️ {stage_seconds['wall']:.1f}s total: reading {stage_seconds['read']:.1f}s, "
+            f"translation {stage_seconds['translate']:.1f}s (summed over parallel chunks), "
+            f"reassembly {stage_seconds['assemble']:.1f}s, {progress.get('retries', 0)} retries"
+        )
+    
+    # One bundle and one file picker keep the page the same size however many files there are
+    translated = [file_info for file_info in state['files'] if not file_info['error']]
+    problems = [file_info for file_info in state['files'] if file_info['error'] or file_info['errors']]
+    if problems:
+        with st.expander(f"⚠️ {len(problems)} file(s) with problems"):
+            for file_info in problems:
+                if file_info['error']:
+                    st.markdown(f"- ❌ {file_info['original_name']} ({file_info['dest_lang']}): {file_info['error']}")
+                    continue
+                for chunk_index, message in file_info['errors']:
+                    st.markdown(f"- ⚠️ {file_info['translated_name']}: chunk {chunk_index + 1} could not be translated: {message}")
+    
+    bundle = state['bundle']
+    if bundle.finalized and bundle.count:
+        st.download_button(
+            label=f"📦 Download all ({bundle.count} files, ZIP)",
+            data=bundle.getvalue,  # Read from the temp file only when downloaded
+            file_name=f"translations_{state['id']}.zip",
+            mime='application/zip',
+            key=f"bundle_{state['id']}"
+        )
+    
+    # Files can be fetched one at a time as soon as they complete
+    if translated:
+        choice = st.selectbox(
+            "Single file",
+            range(len(translated)),
+            format_func=lambda index: translated[index]['translated_name'],
+            key=f"pick_{state['id']}"
+        )
+        render_file_result(translated[min(choice or 0, len(translated) - 1)])
+    
+    if state['status'] in ('done', 'failed'):
+        if st.button("🗑️ Dismiss", key=f"dismiss_{state['id']}"):
+            get_job_manager().remove(state['id'])
+            st.rerun()
+
+def render_jobs():
+    """Show this user's batch jobs, polling while any of them is still running"""
+    manager = get_job_manager()
+    username = st.session_state.username
+    jobs = manager.jobs_for(username)
+    if not jobs:
+        return
+    
+    running = any(job.active for job in jobs)
+    
+    @timed_fragment('jobs', run_every=JOB_POLL_SECONDS if running else None)
+    def job_panel():
+        current = manager.jobs_for(username)
+        st.subheader("📥 Download Translated Files")
+        for job in current:
+            render_job(job.snapshot())
+            st.markdown("---")
+        
+        # A full rerun stops polling and refreshes the history
+        if running and not any(job.active for job in current):
+            st.rerun()
+    
+    job_panel()
+
+def render_metrics_panel():
+    """Admin view of stage timings and counters from the metrics registry"""
+    snapshot = metrics.REGISTRY.snapshot()
+    with st.expander("📈 Metrics"):
+        st.markdown("**Timings (p50 / p95 / total):**")
+        for histogram in snapshot['histograms']:
+            labels = ', '.join(f"{key}={value}" for key, value in histogram['labels'].items())
+            st.markdown(
+                f"- {histogram['name']} ({labels}): {histogram['count']} × "
+                f"{histogram['p50'] * 1000:.0f} / {histogram['p95'] * 1000:.0f} ms, {histogram['sum']:.1f}s"
+            )
+        st.markdown("**Counters:**")
+        for counter in snapshot['counters']:
+            labels = ', '.join(f"{key}={value}" for key, value in counter['labels'].items())
+            st.markdown(f"- {counter['name']}{f' ({labels})' if labels else ''}: {counter['value']:.0f}")
+        st.download_button(
+            "📥 Prometheus export",
+            data=metrics.REGISTRY.render_prometheus,
+            file_name="metrics.txt",
+            mime='text/plain',
+            key="metrics_export"
+        )
+        if metrics.METRICS_PORT:
+            st.caption(f"Scrape endpoint: http://{metrics.METRICS_HOST}:{metrics.METRICS_PORT}/metrics")
+
+# Records per Recent Activity page
+HISTORY_PAGE_SIZE = 5
+
+@timed_fragment('history')
+def render_history():
+    """Paginated Recent Activity panel backed by the history store (reruns on its own)"""
+    store = get_history_store()
+    is_admin = st.session_state.username == 'admin'
+    
+    # Users see their own records; admins see everyone's or filter by user
+    user = st.session_state.username
+    if is_admin:
+        users = store.users()
+        choice = st.session_state.get('history_user', 'All users')
+        if choice != 'All users' and choice not in users:
+            choice = 'All users'
+        user = None if choice == 'All users' else choice
+    
+    pages = st.session_state.history_pages
+    records = store.page(user, before=pages[-1], limit=HISTORY_PAGE_SIZE)
+    if not records and len(pages) == 1:
+        return
+    
+    st.subheader("📚 Recent Activity")
+    if is_admin:
+        st.selectbox("Show activity of:", ['All users'] + users, key='history_user', on_change=reset_history_pages)
+    
+    for record in records:
+        if record['type'] == 'batch_files':
+            with st.expander(f"📁 Batch: {len(record['files'])} files | {record['from_lang']} → {record['to_lang']} ({record['timestamp']})"):
+                if is_admin:
+                    st.markdown(f"**User:** {record['user']}")
+                st.markdown(f"**Files translated:** {len(record['files'])}")
+                st.markdown(f"**Languages:** {record['from_lang']} → {record['to_lang']}")
+                st.markdown("**Files:**\n" + "\n".join(f"- {filename}" for filename in record['files']))
+        else:
+            # Full texts are loaded only when a record is opened
+            expander = st.expander(
+                f"✍️ Text: {record['from_lang']} → {record['to_lang']} ({record['timestamp']})",
+                key=f"history_record_{record['id']}", on_change="rerun"
+            )
+            with expander:
+                if expander.open:
+                    texts = store.texts([record['original_hash'], record['translated_hash']])
+                    if is_admin:
+                        st.markdown(f"**User:** {record['user']}")
+                    st.markdown(f"**Original ({record['from_lang']}):**")
+                    st.write(texts.get(record['original_hash'], record['preview']))
+                    st.markdown(f"**Translation ({record['to_lang']}):**")
+                    st.write(texts.get(record['translated_hash'], ''))
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if len(pages) > 1:
+            st.button("⬅️ Newer", key="history_newer", use_container_width=True, on_click=pages.pop)
+    with col2:
+        st.caption(f"Page {len(pages)} of {max(1, -(-store.count(user) // HISTORY_PAGE_SIZE))}")
+    with col3:
+        if len(records) == HISTORY_PAGE_SIZE:
+            st.button("Older ➡️", key="history_older", use_container_width=True,
+                      on_click=pages.append, args=(records[-1]['id'],))
+
+def reset_history_pages():
+    """Go back to the newest history page"""
+    st.session_state.history_pages = [None]
+
+@timed_fragment('file_tab')
+def file_tab():
+    """Batch file translation tab (reruns on its own)"""
+    st.subheader("📁 Batch File Translation")
+    
+    # Language selection for files
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("**From Language:**")
+        selected_src_idx_file = st.selectbox(
+            "Source language:",
+            range(len(SOURCE_OPTIONS)),
+            format_func=lambda x: SOURCE_LABELS[x],
+            key="src_lang_file",
+            index=0  # Default to auto-detect
+        )
+        selected_src_code_file = SOURCE_OPTIONS[selected_src_idx_file]
+    
+    with col2:
+        st.markdown("**To Language:**")
+        # Several targets: each file is read and detected once and fanned out to all of them
+        if st.toggle("🌍 Translate into several languages", key="multi_target_file"):
+            selected_dest_codes_file = st.multiselect(
+                "Target languages:",
+                TARGET_OPTIONS,
+                default=[TARGET_OPTIONS[DEFAULT_TARGET]],
+                format_func=lambda code: f"{LANGUAGES[code]} ({code})",
+                key="dest_langs_file"
+            )
+        else:
             selected_dest_idx_file = st.selectbox(
                 "Target language:",
-                range(len(target_options)),
-                format_func=lambda x: target_labels[x],
+                range(len(TARGET_OPTIONS)),
+                format_func=lambda x: TARGET_LABELS[x],
                 key="dest_lang_file",
-                index=default_target
+                index=DEFAULT_TARGET
             )
-            selected_dest_code_file = target_options[selected_dest_idx_file]
-        
-        # File upload
-        st.markdown("### 📎 Upload Files")
-        uploaded_files = st.file_uploader(
-            "Choose text files to translate",
-            type=['txt', 'md', 'csv', 'py', 'js', 'html', 'xml', 'json'],
-            accept_multiple_files=True,
-            help="You can upload multiple files at once. Supported formats: .txt, .md, .csv, .py, .js, .html, .xml, .json"
+            selected_dest_codes_file = [TARGET_OPTIONS[selected_dest_idx_file]]
+    
+    # File upload
+    st.markdown("### 📎 Upload Files")
+    uploaded_files = st.file_uploader(
+        "Choose text files to translate",
+        type=['txt', 'md', 'csv', 'py', 'js', 'html', 'xml', 'json'],
+        accept_multiple_files=True,
+        help="You can upload multiple files at once. Supported formats: .txt, .md, .csv, .py, .js, .html, .xml, .json"
+    )
+    
+    if uploaded_files:
+        st.success(f"📁 {len(uploaded_files)} file(s) uploaded successfully!")
+        
+        # Display file list
+        with st.expander("📋 Uploaded Files", expanded=True):
+            st.markdown("\n".join(f"- **{file.name}** ({file.size / 1024:.1f} KB)" for file in uploaded_files))
+        
+        # The upload sizes bound what the batch can cost before anything is sent
+        estimate = batch_estimate(uploaded_files, selected_dest_codes_file)
+        remaining = get_quota_manager().remaining(st.session_state.username)
+        st.caption(
+            f"📏 Up to {estimate:,} characters"
+            + (f" of your {remaining:,} remaining" if remaining is not None else "")
         )
         
-        if uploaded_files:
-            st.success(f"📁 {len(uploaded_files)} file(s) uploaded successfully!")
-            
-            # Display file list
-            with st.expander("📋 Uploaded Files", expanded=True):
-                for file in uploaded_files:
-                    file_size = len(file.getvalue()) / 1024  # Size in KB
-                    st.markdown(f"• **{file.name}** ({file_size:.1f} KB)")
+        # Translation button for files
+        if st.button("🚀 Translate All Files", type="primary", use_container_width=True):
+            if selected_dest_codes_file:
+                try:
+                    submit_batch_job(uploaded_files, selected_src_code_file, selected_dest_codes_file)
+                    st.success("✅ Translation job started! Results will appear below as files complete.")
+                except QuotaExceeded as e:
+                    st.error(f"🚫 {e}")
+            else:
+                st.warning("⚠️ Please select at least one target language")
+    
+    # Batch jobs run in the background and survive reruns
+    render_jobs()
+
+def clear_text():
+    """Empty the text box and drop the last result"""
+    st.session_state.input_text = ""
+    st.session_state.pop('text_result', None)
+
+@timed_fragment('text_tab')
+def text_tab():
+    """Text translation tab (reruns on its own)"""
+    # Language selection for text
+    st.subheader("🔤 Select Languages")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("**From Language:**")
+        selected_src_idx = st.selectbox(
+            "Source language:",
+            range(len(SOURCE_OPTIONS)),
+            format_func=lambda x: SOURCE_LABELS[x],
+            key="src_lang_text",
+            index=0  # Default to auto-detect
+        )
+        selected_src_code = SOURCE_OPTIONS[selected_src_idx]
+    
+    with col2:
+        st.markdown("**To Language:**")
+        selected_dest_idx = st.selectbox(
+            "Target language:",
+            range(len(TARGET_OPTIONS)),
+            format_func=lambda x: TARGET_LABELS[x],
+            key="dest_lang_text",
+            index=DEFAULT_TARGET
+        )
+        selected_dest_code = TARGET_OPTIONS[selected_dest_idx]
+    
+    # Translation interface
+    st.subheader("✍️ Translation")
+    
+    # Input text
+    input_text = st.text_area(
+        "Enter text to translate:",
+        height=150,
+        placeholder="Type your text here...",
+        key="input_text"
+    )
+    
+    # Translation controls
+    col1, col2, col3 = st.columns([1, 1, 2])
+    
+    with col1:
+        translate_button = st.button("🚀 Translate", type="primary", use_container_width=True)
+    
+    with col2:
+        st.button("🗑️ Clear", use_container_width=True, on_click=clear_text)
+    
+    # Perform translation
+    if translate_button and input_text.strip():
+        with st.spinner("Translating..."):
+            # Near-identical sentences translated before are offered for reuse
+            suggestions = []
+            if not st.session_state.get('reuse_fuzzy', False):
+                suggestions = memory_suggestions(get_translation_memory(), input_text, selected_src_code, selected_dest_code)
+            translated_text, detected_lang = translate_text(input_text, selected_src_code, selected_dest_code)
             
-            # Translation button for files
-            if st.button("🚀 Translate All Files", type="primary", use_container_width=True):
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                translated_files = []
-                
-                for i, uploaded_file in enumerate(uploaded_files):
-                    status_text.text(f"Translating {uploaded_file.name}...")
-                    progress_bar.progress((i + 1) / len(uploaded_files))
-                    
-                    try:
-                        # Read file content
-                        if uploaded_file.type == "text/plain" or uploaded_file.name.endswith(('.txt', '.md', '.py', '.js', '.html', '.xml', '.json', '.csv')):
-                            content = uploaded_file.getvalue().decode('utf-8')
-                        else:
-                            content = uploaded_file.getvalue().decode('utf-8', errors='ignore')
-                        
-                        # Translate content
-                        translated_content = translate_file_content(content, selected_src_code_file, selected_dest_code_file)
-                        
-                        # Create new filename
-                        name_parts = uploaded_file.name.rsplit('.', 1)
-                        if len(name_parts) == 2:
-                            new_filename = f"{name_parts[0]}_translated_{selected_dest_code_file}.{name_parts[1]}"
-                        else:
-                            new_filename = f"{uploaded_file.name}_translated_{selected_dest_code_file}.txt"
-                        
-                        translated_files.append({
-                            'original_name': uploaded_file.name,
-                            'translated_name': new_filename,
-                            'content': translated_content,
-                            'original_content': content
-                        })
-                        
-                    except Exception as e:
-                        st.error(f"Error processing {uploaded_file.name}: {str(e)}")
+            if translated_text:
+                # Add to history
+                from_lang_name = LANGUAGES.get(detected_lang, detected_lang) if selected_src_code == 'auto' else LANGUAGES[selected_src_code]
+                get_history_store().add_text(
+                    st.session_state.username, from_lang_name, LANGUAGES[selected_dest_code],
+                    input_text, translated_text
+                )
                 
-                status_text.text("✅ Translation completed!")
-                
-                # Display results
-                if translated_files:
-                    st.subheader("📥 Download Translated Files")
-                    
-                    # Create download buttons for each file
-                    for file_info in translated_files:
-                        col1, col2, col3 = st.columns([2, 1, 1])
-                        
-                        with col1:
-                            st.markdown(f"**{file_info['translated_name']}**")
-                        
-                        with col2:
-                            st.download_button(
-                                label="📥 Download",
-                                data=file_info['content'],
-                                file_name=file_info['translated_name'],
-                                mime='text/plain',
-                                key=f"download_{file_info['translated_name']}"
-                            )
-                        
-                        with col3:
-                            if st.button("👁️ Preview", key=f"preview_{file_info['translated_name']}"):
-                                st.session_state[f"show_preview_{file_info['translated_name']}"] = True
-                        
-                        # Show preview if requested
-                        if st.session_state.get(f"show_preview_{file_info['translated_name']}", False):
-                            with st.expander(f"Preview: {file_info['translated_name']}", expanded=True):
-                                col_orig, col_trans = st.columns(2)
-                                
-                                with col_orig:
-                                    st.markdown("**Original:**")
-                                    st.text_area(
-                                        "Original content",
-                                        value=file_info['original_content'][:1000] + ("..." if len(file_info['original_content']) > 1000 else ""),
-                                        height=200,
-                                        key=f"orig_{file_info['translated_name']}",
-                                        disabled=True
-                                    )
-                                
-                                with col_trans:
-                                    st.markdown("**Translated:**")
-                                    st.text_area(
-                                        "Translated content",
-                                        value=file_info['content'][:1000] + ("..." if len(file_info['content']) > 1000 else ""),
-                                        height=200,
-                                        key=f"trans_{file_info['translated_name']}",
-                                        disabled=True
-                                    )
-                    
-                    # Add to history
-                    batch_record = {
-                        'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
-                        'type': 'batch_files',
-                        'from_lang': LANGUAGES[selected_src_code_file],
-                        'to_lang': LANGUAGES[selected_dest_code_file],
-                        'file_count': len(translated_files),
-                        'files': [f['original_name'] for f in translated_files],
-                        'user': st.session_state.username
-                    }
-                    st.session_state.translation_history.insert(0, batch_record)
-                    st.session_state.translation_history = st.session_state.translation_history[:20]
+                # The result is kept in the session so the full rerun that refreshes the history shows it
+                st.session_state.text_result = {
+                    'input': input_text,
+                    'languages': (selected_src_code, selected_dest_code),
+                    'translation': translated_text,
+                    'detected': detected_lang,
+                    'suggestions': suggestions,
+                }
+                st.rerun()
     
-    with tab2:
-        # Language selection for text
-        st.subheader("🔤 Select Languages")
-        
-        col1, col2 = st.columns(2)
-        
+    elif translate_button and not input_text.strip():
+        st.markdown('<div class="error-message">❌ Please enter some text to translate.</div>', unsafe_allow_html=True)
+    
+    # Show the last result while its text and languages are unchanged
+    result = st.session_state.get('text_result')
+    if result and result['input'] == input_text and result['languages'] == (selected_src_code, selected_dest_code):
+        translated_text = result['translation']
+        detected_lang = result['detected']
+        
+        # Display translation
+        st.subheader("📝 Translation Result")
+        
+        # Show detected language if auto-detect was used
+        if selected_src_code == 'auto' and detected_lang:
+            detected_name = LANGUAGES.get(detected_lang, detected_lang)
+            st.info(f"🔍 Detected language: **{detected_name}** ({detected_lang})")
+        
+        st.markdown(f'<div class="translation-box"><h4>🎯 {LANGUAGES[selected_dest_code]}:</h4><p style="font-size: 1.1em; line-height: 1.5;">{translated_text}</p></div>', unsafe_allow_html=True)
+        
+        if result['suggestions']:
+            with st.expander(f"♻️ {len(result['suggestions'])} similar sentence(s) in translation memory"):
+                for sentence, match in result['suggestions']:
+                    st.markdown(f"**{match.score:.0%} match** for: {sentence}")
+                    st.markdown(f"- Stored: {match.source}")
+                    st.markdown(f"- Translation: {match.translation}")
+        
+        # Download as file option
+        col1, col2 = st.columns([1, 3])
         with col1:
-            st.markdown("**From Language:**")
-            source_options = list(LANGUAGES.keys())
-            source_labels = [f"{LANGUAGES[code]} ({code})" for code in source_options]
-            
-            selected_src_idx = st.selectbox(
-                "Source language:",
-                range(len(source_options)),
-                format_func=lambda x: source_labels[x],
-                key="src_lang_text",
-                index=0  # Default to auto-detect
+            st.download_button(
+                label="📥 Download as .txt",
+                data=translated_text,
+                file_name=f"translated_text_{selected_dest_code}.txt",
+                mime='text/plain'
             )
-            selected_src_code = source_options[selected_src_idx]
         
-        with col2:
-            st.markdown("**To Language:**")
-            target_options = [code for code in LANGUAGES.keys() if code != 'auto']
-            target_labels = [f"{LANGUAGES[code]} ({code})" for code in target_options]
-            
-            # Default to English
-            default_target = target_options.index('en') if 'en' in target_options else 0
-            
-            selected_dest_idx = st.selectbox(
-                "Target language:",
-                range(len(target_options)),
-                format_func=lambda x: target_labels[x],
-                key="dest_lang_text",
-                index=default_target
-            )
-            selected_dest_code = target_options[selected_dest_idx]
-        
-        # Translation interface
-        st.subheader("✍️ Translation")
-        
-        # Input text
-        input_text = st.text_area(
-            "Enter text to translate:",
-            height=150,
-            placeholder="Type your text here...",
-            key="input_text"
-        )
-        
-        # Translation controls
-        col1, col2, col3 = st.columns([1, 1, 2])
-        
-        with col1:
-            translate_button = st.button("🚀 Translate", type="primary", use_container_width=True)
-        
-        with col2:
-            clear_button = st.button("🗑️ Clear", use_container_width=True)
-        
-        if clear_button:
-            st.session_state.input_text = ""
-            st.rerun()
-        
-        # Perform translation
-        if translate_button and input_text.strip():
-            with st.spinner("Translating..."):
-                translated_text, detected_lang = translate_text(input_text, selected_src_code, selected_dest_code)
-                
-                if translated_text:
-                    # Display translation
-                    st.subheader("📝 Translation Result")
-                    
-                    # Show detected language if auto-detect was used
-                    if selected_src_code == 'auto' and detected_lang:
-                        detected_name = LANGUAGES.get(detected_lang, detected_lang)
-                        st.info(f"🔍 Detected language: **{detected_name}** ({detected_lang})")
-                    
-                    st.markdown(f'<div class="translation-box"><h4>🎯 {LANGUAGES[selected_dest_code]}:</h4><p style="font-size: 1.1em; line-height: 1.5;">{translated_text}</p></div>', unsafe_allow_html=True)
-                    
-                    # Download as file option
-                    col1, col2 = st.columns([1, 3])
-                    with col1:
-                        st.download_button(
-                            label="📥 Download as .txt",
-                            data=translated_text,
-                            file_name=f"translated_text_{selected_dest_code}.txt",
-                            mime='text/plain'
-                        )
-                    
-                    # Add to history
-                    from_lang_name = LANGUAGES.get(detected_lang, detected_lang) if selected_src_code == 'auto' else LANGUAGES[selected_src_code]
-                    translation_record = {
-                        'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
-                        'type': 'text',
-                        'from_lang': from_lang_name,
-                        'to_lang': LANGUAGES[selected_dest_code],
-                        'original': input_text,
-                        'translated': translated_text,
-                        'user': st.session_state.username
-                    }
-                    st.session_state.translation_history.insert(0, translation_record)
-                    
-                    # Keep only last 20 translations
-                    st.session_state.translation_history = st.session_state.translation_history[:20]
-                    
-                    # Copy button
-                    st.code(translated_text, language=None)
-                    
-                    # Success message
-                    st.markdown('<div class="success-message">✅ Translation completed successfully!</div>', unsafe_allow_html=True)
+        # Copy button
+        st.code(translated_text, language=None)
         
-        elif translate_button and not input_text.strip():
-            st.markdown('<div class="error-message">❌ Please enter some text to translate.</div>', unsafe_allow_html=True)
+        # Success message
+        st.markdown('<div class="success-message">✅ Translation completed successfully!</div>', unsafe_allow_html=True)
+
+def main():
+    # Header
+    st.markdown('<h1 class="main-header">🌐 Secure File Translator</h1>', unsafe_allow_html=True)
+    st.markdown("**Multi-language translation with secure access control**")
+    
+    # Each tab and the history panel rerun on their own, so an interaction
+    # only redoes the work of the part of the page it belongs to
+    tab1, tab2 = st.tabs(["📄 File Translation", "✍️ Text Translation"])
+    
+    with tab1:
+        file_tab()
+    
+    with tab2:
+        text_tab()
     
     # Translation history
-    if st.session_state.translation_history:
-        st.subheader("📚 Recent Activity")
-        
-        # Filter by current user or show all for admin
-        user_history = st.session_state.translation_history
-        if st.session_state.username != 'admin':
-            user_history = [record for record in st.session_state.translation_history 
-                          if record.get('user') == st.session_state.username]
-        
-        for i, record in enumerate(user_history[:5]):
-            if record.get('type') == 'batch_files':
-                with st.expander(f"📁 Batch: {record['file_count']} files | {record['from_lang']} → {record['to_lang']} ({record['timestamp']})"):
-                    if st.session_state.username == 'admin':
-                        st.markdown(f"**User:** {record.get('user', 'Unknown')}")
-                    st.markdown(f"**Files translated:** {record['file_count']}")
-                    st.markdown(f"**Languages:** {record['from_lang']} → {record['to_lang']}")
-                    st.markdown("**Files:**")
-                    for filename in record['files']:
-                        st.markdown(f"• {filename}")
-            else:
-                with st.expander(f"✍️ Text: {record['from_lang']} → {record['to_lang']} ({record['timestamp']})"):
-                    if st.session_state.username == 'admin':
-                        st.markdown(f"**User:** {record.get('user', 'Unknown')}")
-                    st.markdown(f"**Original ({record['from_lang']}):**")
-                    st.write(record['original'])
-                    st.markdown(f"**Translation ({record['to_lang']}):**")
-                    st.write(record['translated'])
+    render_history()
     
     # Sidebar info
     with st.sidebar:
@@ -565,6 +788,24 @@ def main():
         st.markdown("• Markdown (.md)")
         st.markdown("• Code files (.py, .js, .html)")
         st.markdown("• Data files (.csv, .json, .xml)")
+        st.markdown("*Only text content is translated in structured files; keys, markup and code are kept.*")
+        
+        st.markdown("---")
+        st.markdown("**Translation Memory:**")
+        st.markdown("Sentences translated before are reused, so revised documents only cost the changed sentences.")
+        st.checkbox(
+            f"♻️ Reuse similar translations (≥ {get_translation_memory().threshold:.0%} match)",
+            key="reuse_fuzzy",
+            help="Also reuse stored translations of near-identical sentences instead of translating them again"
+        )
+        
+        usage = get_quota_manager().usage(st.session_state.username)
+        st.markdown("---")
+        st.markdown("**Your Usage:**")
+        st.markdown(
+            f"{usage['chars']:,} characters in {usage['requests']:,} requests"
+            + (f" ({usage['remaining']:,} of {usage['budget']:,} left)" if usage['remaining'] is not None else "")
+        )
         
         st.markdown("---")
         st.markdown("**File Translation Process:**")
@@ -579,10 +820,53 @@ def main():
         st.markdown("- User session tracking")
         st.markdown("- Secure file processing")
         st.markdown("- Activity logging")
+        
+        if st.session_state.username == 'admin':
+            st.markdown("---")
+            st.markdown("**Translation Cache:**")
+            cache_stats = get_translation_cache().stats()
+            st.markdown(f"- Hits: {cache_stats['hits']} ({cache_stats['hit_rate']:.0%})")
+            st.markdown(f"- Misses: {cache_stats['misses']}")
+            memory_stats = get_translation_memory().stats()
+            st.markdown(
+                f"**Translation Memory:** {memory_stats['segments']} sentences, "
+                f"{memory_stats['hits_exact']} exact / {memory_stats['hits_fuzzy']} fuzzy hits ({memory_stats['hit_rate']:.0%})"
+            )
+            pool_stats = get_translator_pool().stats()
+            st.markdown(f"**Translator Pool:** {pool_stats['in_use']} in use / {pool_stats['created']} created (max {pool_stats['size']})")
+            limiter_stats = get_rate_limiter().stats()
+            st.markdown(
+                f"**Upstream Rate:** {limiter_stats['rate']:.1f}/{limiter_stats['max_rate']:.1f} req/s, "
+                f"{limiter_stats['waiting']} waiting, {limiter_stats['throttled']} throttled"
+            )
+            coalescer_stats = get_request_coalescer().stats()
+            st.markdown(
+                f"**Request Coalescing:** {coalescer_stats['saved_calls']} calls saved "
+                f"({coalescer_stats['shared']} shared, {coalescer_stats['batched_texts']} texts in {coalescer_stats['batches']} batches)"
+            )
+            quota_stats = get_quota_manager().stats()
+            st.markdown(f"**Usage by User:** ({quota_stats['rejected']} requests refused over budget)")
+            for user, user_usage in quota_stats['users'].items():
+                pairs = ', '.join(f"{pair} {value['chars']:,}" for pair, value in user_usage['pairs'].items())
+                st.markdown(
+                    f"- {user or 'anonymous'}: {user_usage['chars']:,} chars, {user_usage['requests']:,} requests, "
+                    f"{user_usage['running']} running" + (f" ({pairs})" if pairs else "")
+                )
+            backends = get_backend_router().snapshot()
+            if backends:
+                st.markdown("**Backends:**")
+                for backend in backends:
+                    st.markdown(
+                        f"- {backend['backend']}: p50 {backend['p50_ms']:.0f} ms, p95 {backend['p95_ms']:.0f} ms, "
+                        f"{backend['error_rate']:.0%} errors, circuit {backend['circuit']}"
+                    )
+            render_metrics_panel()
     
     # Footer
     st.markdown("---")
     st.markdown("**Powered by TranslatePy | Secure File Translation Service**")
 
 if __name__ == "__main__":
-    main()
+    start_metrics_endpoint()
+    with rerun_timer('app'):
+        main()
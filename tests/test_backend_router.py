@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from translatepy.exceptions import NoResult
+
+from backend_router import HEDGE_MIN_SAMPLES, BackendRouter
+
+
+class Fast:
+    def translate(self, text, destination_language, source_language):
+        return f"fast:{text}"
+
+
+class Broken:
+    def translate(self, text, destination_language, source_language):
+        raise ConnectionError("connection reset")
+
+
+class Services:
+    """Stand-in for translatepy's Translator with the given service classes"""
+
+    def __init__(self, *services):
+        self.services = list(services)
+
+    def _instantiate_translator(self, service, services, index):
+        return service()
+
+
+def test_failing_backend_is_skipped_once_its_circuit_opens():
+    router = BackendRouter(failure_threshold=2, open_seconds=60)
+    translator = Services(Broken, Fast)
+    for _ in range(2):
+        assert router.translate(translator, 'hi', 'fr') == 'fast:hi'
+    assert router.order(['Broken', 'Fast']) == ['Fast']
+    circuits = {row['backend']: row['circuit'] for row in router.snapshot()}
+    assert circuits == {'Broken': 'open', 'Fast': 'closed'}
+
+
+def test_open_circuit_lets_one_trial_through_after_the_open_period():
+    router = BackendRouter(failure_threshold=1, open_seconds=0.1)
+    router.record('Broken', 0.0, False)
+    assert router.order(['Broken', 'Fast']) == ['Fast']
+    time.sleep(0.15)
+    # Half-open: one request tries it, everyone else still skips it until it succeeds
+    assert 'Broken' in router.order(['Broken', 'Fast'])
+    assert router.order(['Broken', 'Fast']) == ['Fast']
+    router.record('Broken', 0.0, True)
+    assert 'Broken' in router.order(['Broken', 'Fast'])
+
+
+def test_every_circuit_open_still_tries_all_backends():
+    router = BackendRouter(failure_threshold=1, open_seconds=60)
+    with pytest.raises(NoResult):
+        router.translate(Services(Broken), 'hi', 'fr')
+    assert router.order(['Broken']) == ['Broken']
+
+
+def test_backends_are_ordered_by_median_latency():
+    router = BackendRouter()
+    for _ in range(5):
+        router.record('Slow', 0.5, True)
+        router.record('Quick', 0.05, True)
+    assert router.order(['Slow', 'Quick', 'New']) == ['New', 'Quick', 'Slow']
+
+
+def test_a_pinned_backend_is_the_only_one_tried():
+    router = BackendRouter()
+    with pytest.raises(NoResult):
+        router.translate(Services(Fast, Broken), 'hi', 'fr', backend='Broken')
+
+
+def hedging_router(*names) -> BackendRouter:
+    """Hedging router that has learned the given backend names from one translation"""
+    router = BackendRouter(hedge=True)
+    router.translate(Services(*(type(name, (Fast,), {}) for name in names)), 'learn', 'fr')
+    return router
+
+
+def test_a_slow_attempt_is_hedged_on_the_next_backend():
+    router = hedging_router('Slow', 'Quick')
+    for _ in range(HEDGE_MIN_SAMPLES):
+        router.record('Slow', 0.01, True)
+        router.record('Quick', 0.02, True)
+    started = []
+
+    def attempt(backend, hedge):
+        started.append((backend, hedge))
+        time.sleep(1.0 if backend == 'Slow' else 0.0)
+        return backend
+
+    start = time.monotonic()
+    assert router.hedged(attempt) == 'Quick'
+    assert time.monotonic() - start < 0.5
+    assert started == [('Slow', False), ('Quick', True)]
+
+
+def test_a_failed_attempt_moves_on_to_the_next_backend():
+    router = hedging_router('Broken', 'Fast')
+    router.record('Fast', 0.5, True)
+    tried = []
+
+    def attempt(backend, hedge):
+        tried.append(backend)
+        if backend == 'Broken':
+            raise ConnectionError("connection reset")
+        return backend
+
+    assert router.hedged(attempt) == 'Fast'
+    assert tried == ['Broken', 'Fast']
+
+
+def test_without_hedging_there_is_a_single_plain_attempt():
+    router = BackendRouter(hedge=False)
+    assert router.hedged(lambda backend, hedge: (backend, hedge)) == (None, False)
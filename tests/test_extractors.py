@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+
+import pytest
+
+from extractors import apply_translations, get_extractor
+from translation_engine import CHUNK_SIZE, translate_batch
+
+SAMPLES = {
+    'data.json': '{\n  "title": "Hello world",\n  "count": 3,\n  "items": ["First item", "Say \\"hi\\"", "2024-01-01"],\n'
+                 '  "nested": {"note": "Line one\\nLine two", "flag": true}\n}\n',
+    'table.csv': 'id,name,description\n1,Widget,"A small, useful thing"\n2,Gadget,"Says ""hello"" loudly"\n3,,42\n',
+    'page.html': '<!DOCTYPE html>\n<html><head><title>My page</title><style>p { color: red; }</style></head>\n'
+                 '<body><p class="intro">Welcome to the <b>site</b> &amp; enjoy.</p>'
+                 '<script>var x = "not prose";</script></body></html>\n',
+    'doc.xml': '<?xml version="1.0"?>\n<root><item id="1">First entry</item><item id="2">Second &lt;entry&gt;</item></root>\n',
+    'script.py': '# A comment about things\ndef greet():\n    """Say hello to the user"""\n'
+                 '    return "Hello there, friend"  # Trailing remark\n\nKEY = "some_key"\n',
+    'app.js': '// Greeting helper\nfunction greet() {\n  /* Block comment here */\n'
+              '  return "Hello there, friend" + \'Second string here\';\n}\nconst key = "some_key";\n',
+}
+
+
+def shout(spans):
+    return {span.text: span.text.upper() for span in spans}
+
+
+@pytest.mark.parametrize('filename', sorted(SAMPLES))
+def test_untouched_translations_round_trip(filename):
+    content = SAMPLES[filename]
+    spans = get_extractor(filename)(content)
+    assert spans
+    assert apply_translations(content, spans, {span.text: span.text for span in spans}) == content
+    assert apply_translations(content, spans, {}) == content
+
+
+@pytest.mark.parametrize('filename', sorted(SAMPLES))
+def test_spans_do_not_overlap(filename):
+    spans = sorted(get_extractor(filename)(SAMPLES[filename]), key=lambda span: span.start)
+    for previous, span in zip(spans, spans[1:]):
+        assert previous.end <= span.start
+
+
+def test_json_translates_string_values_only():
+    content = SAMPLES['data.json']
+    spans = get_extractor('data.json')(content)
+    assert {span.text for span in spans} == {'Hello world', 'First item', 'Say "hi"', 'Line one\nLine two'}
+    data = json.loads(apply_translations(content, spans, shout(spans)))
+    assert data == {'title': 'HELLO WORLD', 'count': 3, 'items': ['FIRST ITEM', 'SAY "HI"', '2024-01-01'],
+                    'nested': {'note': 'LINE ONE\nLINE TWO', 'flag': True}}
+
+
+def test_csv_keeps_rows_and_quoting_valid():
+    content = SAMPLES['table.csv']
+    spans = get_extractor('table.csv')(content)
+    rows = list(csv.reader(io.StringIO(apply_translations(content, spans, shout(spans)))))
+    original = list(csv.reader(io.StringIO(content)))
+    assert len(rows) == len(original)
+    assert [len(row) for row in rows] == [len(row) for row in original]
+    assert rows[1][2] == 'A SMALL, USEFUL THING'
+    assert rows[2][2] == 'SAYS "HELLO" LOUDLY'
+    assert rows[3] == ['3', '', '42']
+
+
+def test_markup_skips_tags_scripts_and_styles():
+    content = SAMPLES['page.html']
+    spans = get_extractor('page.html')(content)
+    texts = ' '.join(span.text for span in spans)
+    assert 'Welcome to the' in texts and 'My page' in texts
+    assert 'not prose' not in texts and 'color' not in texts and 'class' not in texts
+    translated = apply_translations(content, spans, shout(spans))
+    assert '<p class="intro">' in translated and 'var x = "not prose";' in translated
+
+
+def test_code_translates_comments_and_prose_strings_only():
+    for filename in ('script.py', 'app.js'):
+        content = SAMPLES[filename]
+        spans = get_extractor(filename)(content)
+        translated = apply_translations(content, spans, shout(spans))
+        assert 'HELLO THERE, FRIEND' in translated
+        assert '"some_key"' in translated
+        assert 'def greet' in translated or 'function greet' in translated
+
+
+def test_plain_text_has_no_extractor():
+    assert get_extractor('notes.txt') is None
+    assert get_extractor('README') is None
+
+
+@pytest.mark.parametrize('content, expected', [
+    ('x = "hello world"\n\x0c\n# a comment here\ny = "another string value"\n',
+     'x = "HELLO WORLD"\n\x0c\n# A COMMENT HERE\ny = "ANOTHER STRING VALUE"\n'),
+    ('# first comment line\r\nvalue = "some prose text"\r\n# trailing \x85 remark\n',
+     '# FIRST COMMENT LINE\r\nvalue = "SOME PROSE TEXT"\r\n# TRAILING \x85 REMARK\n'),
+])
+def test_python_offsets_survive_unusual_line_breaks(content, expected):
+    spans = get_extractor('script.py')(content)
+    assert apply_translations(content, spans, shout(spans)) == expected
+
+
+def large_json() -> str:
+    data = {f"key{i}": f"Value number {i} is here." for i in range(2000)}
+    data['multi'] = "Line one\nLine two"
+    return json.dumps(data, indent=1)
+
+
+def test_structured_spans_are_packed_into_few_requests():
+    content = large_json()
+    requests = []
+
+    def translate(text, src_lang):
+        requests.append(text)
+        return text.upper()
+
+    [(output, errors)] = translate_batch([content], translate, ['data.json'])
+    assert errors == []
+    assert len(requests) <= 2 * len(content) // CHUNK_SIZE
+    assert all(len(text) <= CHUNK_SIZE for text in requests)
+    data = json.loads(output)
+    assert data['key5'] == 'VALUE NUMBER 5 IS HERE.'
+    assert data['multi'] == 'LINE ONE\nLINE TWO'
+
+
+def test_packed_lines_fall_back_when_the_backend_merges_them():
+    content = large_json()
+    [(output, errors)] = translate_batch([content], lambda text, src_lang: text.replace('\n', ' ').upper(),
+                                         ['data.json'])
+    assert errors == []
+    data = json.loads(output)
+    assert data['key5'] == 'VALUE NUMBER 5 IS HERE.'
+    assert data['key1999'] == 'VALUE NUMBER 1999 IS HERE.'
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import pytest
+
+from http_api import HTTPError, TranslationAPI, parse_api_keys
+
+
+class StubService:
+    """Records who each translation is made for"""
+
+    def __init__(self):
+        self.users = []
+
+    def translate_text(self, text, src_lang, dest_lang, user='', fuzzy=False):
+        self.users.append(user)
+        return text.upper(), 'en', []
+
+
+def request(api, headers, path='/translate', body=b'{"text": "hi", "to": "fr"}'):
+    return asyncio.run(api.handle('POST', path, headers, body))
+
+
+@pytest.fixture
+def api():
+    return TranslationAPI(StubService(), workers=2, api_keys=parse_api_keys("alice=k-alice, bob=k-bob"))
+
+
+def test_parse_api_keys():
+    assert parse_api_keys("alice=k1, bob = k2=x,broken,=k3,empty=") == {'alice': 'k1', 'bob': 'k2=x'}
+
+
+@pytest.mark.parametrize('headers', [{}, {'x-api-key': ''}, {'x-api-key': 'k-mallory'},
+                                     {'authorization': 'Bearer k-alic'}, {'authorization': 'Basic k-alice'}])
+def test_requests_without_a_valid_key_are_refused(api, headers):
+    with pytest.raises(HTTPError) as error:
+        request(api, headers)
+    assert error.value.status == 401
+    assert api.service.users == []
+
+
+def test_the_key_name_identifies_the_caller(api):
+    status, _, body = request(api, {'authorization': 'Bearer k-alice', 'x-user': 'bob'})
+    assert status == 200 and json.loads(body) == {'translation': 'HI', 'detected_language': 'en'}
+    request(api, {'x-api-key': 'k-bob'})
+    assert api.service.users == ['alice', 'bob']
+
+
+def test_only_health_is_open(api):
+    assert asyncio.run(api.handle('GET', '/health', {}, b''))[0] == 200
+    with pytest.raises(HTTPError) as error:
+        asyncio.run(api.handle('GET', '/metrics', {}, b''))
+    assert error.value.status == 401
+    assert asyncio.run(api.handle('GET', '/metrics', {'x-api-key': 'k-bob'}, b''))[0] == 200
+
+
+def test_without_configured_keys_every_request_is_refused():
+    api = TranslationAPI(StubService(), workers=1, api_keys={})
+    with pytest.raises(HTTPError) as error:
+        request(api, {'x-api-key': ''})
+    assert error.value.status == 401
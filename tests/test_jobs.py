@@ -0,0 +1,47 @@
+import threading
+import time
+
+from jobs import DONE, QUEUED, JobManager
+from quota import QuotaManager
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_jobs_over_the_user_limit_stay_queued_without_taking_a_worker():
+    quota = QuotaManager(default_budget=0, budgets={}, max_jobs=1)
+    jobs = JobManager(workers=2)
+    release = threading.Event()
+    started = []
+
+    def run(job):
+        started.append(job.user)
+        if job.user == 'u':
+            release.wait(5)
+
+    first = jobs.submit('u', run, slot=quota.admit('u', 10))
+    second = jobs.submit('u', run, slot=quota.admit('u', 10))
+    other = jobs.submit('v', run, slot=quota.admit('v', 10))
+    # u's second batch waits in the queue; v's batch still gets the other worker
+    assert wait_for(lambda: other.status == DONE)
+    assert second.status == QUEUED and jobs.pending('u') == 1
+    assert started == ['u', 'v']
+
+    release.set()
+    assert wait_for(lambda: first.status == DONE and second.status == DONE)
+    assert started == ['u', 'v', 'u']
+    assert jobs.pending() == 0
+    assert quota.usage('u')['running'] == 0
+
+
+def test_jobs_without_a_slot_run_straight_away():
+    jobs = JobManager(workers=1)
+    job = jobs.submit('u', lambda job: job.update_progress({'done': True}))
+    assert wait_for(lambda: job.status == DONE)
+    assert job.snapshot()['progress'] == {'done': True}
@@ -0,0 +1,75 @@
+import pytest
+
+from quota import QuotaExceeded, QuotaManager, parse_budgets
+
+
+def test_parse_budgets():
+    assert parse_budgets("admin=0, team=20000") == {'admin': 0, 'team': 20000}
+    assert parse_budgets("") == {}
+
+
+def test_admission_reserves_its_estimate():
+    quota = QuotaManager(default_budget=1000, budgets={})
+    quota.admit('u', 600)
+    assert quota.remaining('u') == 400
+    # A second batch cannot overdraw the budget together with the first
+    with pytest.raises(QuotaExceeded):
+        quota.admit('u', 500)
+    assert quota.stats()['rejected'] == 1
+
+
+def test_metering_shrinks_the_reservation_instead_of_double_counting():
+    quota = QuotaManager(default_budget=1000, budgets={})
+    with quota.admit('u', 600) as admission:
+        admission.record('u', 'fr', 'en', 200)
+        usage = quota.usage('u')
+        assert (usage['chars'], usage['reserved'], usage['remaining']) == (200, 400, 400)
+    # Unused reservation is released when the batch ends
+    assert quota.remaining('u') == 800
+    assert quota.usage('u')['pairs'] == {'fr→en': {'chars': 200, 'requests': 1}}
+
+
+def test_requests_outside_a_batch_must_fit_the_remaining_budget():
+    quota = QuotaManager(default_budget=100, budgets={})
+    quota.record('u', 'fr', 'en', 60)
+    with pytest.raises(QuotaExceeded):
+        quota.record('u', 'fr', 'en', 50)
+    quota.record('u', 'fr', 'en', 40)
+    assert quota.usage('u')['chars'] == 100
+    # Budgets are per user
+    quota.record('v', 'fr', 'en', 100)
+
+
+def test_zero_budget_is_unlimited():
+    quota = QuotaManager(default_budget=10, budgets={'admin': 0})
+    assert quota.remaining('admin') is None
+    quota.admit('admin', 10 ** 9)
+    quota.record('admin', 'fr', 'en', 10 ** 6)
+
+
+def test_concurrency_slots_are_claimed_without_blocking():
+    quota = QuotaManager(default_budget=0, budgets={}, max_jobs=1)
+    first = quota.admit('u', 10)
+    second = quota.admit('u', 10)
+    with first:
+        assert not second.try_start()
+        with pytest.raises(QuotaExceeded):
+            quota.admit('u', 10, start=True)
+        # Other users have slots of their own
+        with quota.admit('v', 10, start=True):
+            pass
+    assert second.try_start()
+    with second:
+        assert quota.usage('u')['running'] == 1
+    assert quota.usage('u')['running'] == 0
+
+
+def test_entering_a_batch_without_a_free_slot_is_refused():
+    quota = QuotaManager(default_budget=1000, budgets={}, max_jobs=1)
+    with quota.admit('u', 100):
+        second = quota.admit('u', 100)
+        with pytest.raises(QuotaExceeded):
+            with second:
+                pass
+        # The refused batch gave its reservation back
+        assert quota.remaining('u') == 900
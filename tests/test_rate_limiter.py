@@ -0,0 +1,94 @@
+import threading
+import time
+
+from backend_router import BackendRouter
+from rate_limiter import (MIN_RATE, PRIORITY_BULK, PRIORITY_INTERACTIVE, RECOVERY_STEP, RateLimiter,
+                          is_throttling_error)
+
+
+def queue_in_order(limiter, requests):
+    """Queue (user, priority) requests one by one while the limiter is paused; return the grant order"""
+    granted = []
+    threads = []
+    for user, priority in requests:
+        thread = threading.Thread(target=lambda u=user, p=priority: (limiter.acquire(u, p), granted.append(u)))
+        thread.start()
+        threads.append(thread)
+        while limiter.stats()['waiting'] < len(threads):
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join(timeout=10)
+    return granted
+
+
+def paused_limiter() -> RateLimiter:
+    limiter = RateLimiter(rate=100, burst=1)
+    limiter.report_throttled()  # Nothing is granted for a second, so every request queues first
+    return limiter
+
+
+def test_interactive_requests_go_before_bulk():
+    limiter = paused_limiter()
+    granted = queue_in_order(limiter, [('batch', PRIORITY_BULK), ('batch', PRIORITY_BULK),
+                                       ('alice', PRIORITY_INTERACTIVE), ('batch', PRIORITY_BULK),
+                                       ('bob', PRIORITY_INTERACTIVE)])
+    assert granted == ['alice', 'bob', 'batch', 'batch', 'batch']
+
+
+def test_users_are_served_round_robin():
+    limiter = paused_limiter()
+    granted = queue_in_order(limiter, [('a', PRIORITY_BULK)] * 3 + [('b', PRIORITY_BULK)] * 2
+                             + [('c', PRIORITY_BULK)])
+    assert granted == ['a', 'b', 'c', 'a', 'b', 'a']
+
+
+def test_throttling_halves_the_rate_and_success_recovers_it():
+    limiter = RateLimiter(rate=8, burst=1)
+    limiter.report_throttled()
+    assert limiter.stats()['rate'] == 4
+    for _ in range(3):
+        limiter.report_throttled()
+    assert limiter.stats()['rate'] == max(MIN_RATE, 0.5)
+    limiter.report_success()
+    assert limiter.stats()['rate'] == max(MIN_RATE, 0.5) + RECOVERY_STEP
+    for _ in range(1000):
+        limiter.report_success()
+    assert limiter.stats()['rate'] == 8
+
+
+def test_burst_is_granted_without_waiting():
+    limiter = RateLimiter(rate=1, burst=5)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire('u')
+    assert time.monotonic() - start < 0.5
+
+
+def test_throttling_error_heuristic():
+    assert is_throttling_error(Exception("HTTP 429 Too Many Requests"))
+    assert is_throttling_error(Exception("Rate limit exceeded"))
+    assert not is_throttling_error(Exception("Connection reset by peer"))
+
+
+class Throttled:
+    def translate(self, text, destination_language, source_language):
+        raise Exception("HTTP 429 Too Many Requests")
+
+
+class Works:
+    def translate(self, text, destination_language, source_language):
+        return text.upper()
+
+
+class TwoBackends:
+    services = [Throttled, Works]
+
+    def _instantiate_translator(self, service, services, index):
+        return service()
+
+
+def test_router_reports_throttled_backends_even_when_another_answers():
+    limiter = RateLimiter(rate=8, burst=1)
+    router = BackendRouter(limiter=limiter)
+    assert router.translate(TwoBackends(), 'hello', 'fr', 'en') == 'HELLO'
+    assert limiter.stats()['rate'] == 4
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from request_coalescing import MicroBatcher, RequestCoalescer
+
+
+class Upstream:
+    """translate_fn recording each request with the priority of the caller it belongs to"""
+
+    def __init__(self, delay: float = 0.0):
+        self.requests = []
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def fn(self, priority):
+        def translate(text, dest_lang, src_lang):
+            with self._lock:
+                self.requests.append((priority, text))
+            time.sleep(self.delay)
+            return type('Result', (), {'result': text.upper()})()
+        return translate
+
+
+def translate_together(coalescer, calls):
+    """Start every (translate_fn, text, priority) call at once; return the results in order"""
+    results = [None] * len(calls)
+    threads = [threading.Thread(target=lambda i=i, fn=fn, text=text, priority=priority: results.__setitem__(
+        i, coalescer.translate(fn, text, 'fr', 'en', priority).result)) for i, (fn, text, priority) in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results
+
+
+def test_batches_are_sent_at_the_priority_of_their_members():
+    upstream = Upstream()
+    coalescer = RequestCoalescer(batcher=MicroBatcher(window=0.2))
+    results = translate_together(coalescer, [(upstream.fn(1), 'bulk one', 1), (upstream.fn(0), 'typed', 0),
+                                             (upstream.fn(1), 'bulk two', 1)])
+    assert results == ['BULK ONE', 'TYPED', 'BULK TWO']
+    # The interactive text did not ride in the bulk batch
+    assert sorted((priority, sorted(text.split('\n'))) for priority, text in upstream.requests) == [
+        (0, ['typed']), (1, ['bulk one', 'bulk two'])]
+
+
+def test_short_texts_are_batched_one_per_line():
+    upstream = Upstream()
+    coalescer = RequestCoalescer(batcher=MicroBatcher(window=0.2))
+    texts = [f"text number {i}" for i in range(5)]
+    assert translate_together(coalescer, [(upstream.fn(1), text, 1) for text in texts]) == [
+        text.upper() for text in texts]
+    [(_, sent)] = upstream.requests
+    assert sorted(sent.split('\n')) == texts
+    assert coalescer.stats()['saved_calls'] == 4
+
+
+def test_merged_lines_fall_back_to_one_request_per_text():
+    requests = []
+
+    def merging(text, dest_lang, src_lang):
+        requests.append(text)
+        return type('Result', (), {'result': text.replace('\n', ' ').upper()})()
+
+    coalescer = RequestCoalescer(batcher=MicroBatcher(window=0.2))
+    assert translate_together(coalescer, [(merging, 'alpha', 1), (merging, 'beta', 1)]) == ['ALPHA', 'BETA']
+    assert len(requests) == 3 and sorted(requests[1:]) == ['alpha', 'beta']
+    assert coalescer.stats()['fallbacks'] == 1
+
+
+def test_long_multiline_or_unknown_source_texts_are_not_batched():
+    batcher = MicroBatcher(item_max_chars=20)
+    assert batcher.accepts('short', 'en')
+    assert not batcher.accepts('short', 'auto')
+    assert not batcher.accepts('two\nlines', 'en')
+    assert not batcher.accepts('x' * 21, 'en')
+
+
+def test_identical_requests_share_one_call():
+    upstream = Upstream(delay=0.2)
+    coalescer = RequestCoalescer()
+    text = 'same multi-line\ntext'
+    assert translate_together(coalescer, [(upstream.fn(1), text, 1)] * 4) == [text.upper()] * 4
+    assert upstream.requests == [(1, text)]
+    assert coalescer.stats()['shared'] == 3
+
+
+def test_errors_reach_every_member_of_a_batch():
+    def failing(text, dest_lang, src_lang):
+        raise RuntimeError("upstream down")
+
+    coalescer = RequestCoalescer(batcher=MicroBatcher(window=0.2))
+    errors = []
+
+    def call(text):
+        try:
+            coalescer.translate(failing, text, 'fr', 'en', 1)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call, args=(text,)) for text in ('a one', 'b two')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert errors == ["upstream down"] * 2
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from segmenter import iter_segments, segment_text, split_sentences, split_whitespace
+
+
+def sample_text(paragraphs: int = 300, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    separators = ['\n\n', '\n \n', '\r\n\r\n', '\n\n\n  ']
+    parts = []
+    for _ in range(paragraphs):
+        sentences = [' '.join(f"word{rng.randint(0, 99)}" for _ in range(rng.randint(3, 15))) + rng.choice('.!?')
+                     for _ in range(rng.randint(1, 6))]
+        parts.append(' '.join(sentences) + rng.choice(separators))
+    return ''.join(parts)
+
+
+TEXTS = [
+    '',
+    'One sentence.',
+    'Trailing blank lines.\n\n\n',
+    '\n\nLeading blank lines.',
+    'x' * 12000,                                    # No boundary at all
+    'word ' * 3000,                                 # Words only
+    'Line one.\nLine two.\n' * 800,                 # Lines, no paragraphs
+    'Short.\n\n' + 'A long paragraph. ' * 700 + '\n\nTail.',
+    sample_text(),
+]
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_segments_are_lossless_and_within_budget(text):
+    segments = segment_text(text, 1000)
+    assert ''.join(segments) == text
+    assert all(0 < len(segment) <= 1000 for segment in segments)
+
+
+@pytest.mark.parametrize('piece_size', [1, 7, 100, 999, 4096])
+def test_streaming_matches_whole_text(piece_size):
+    text = sample_text()
+    pieces = [text[i:i + piece_size] for i in range(0, len(text), piece_size)]
+    assert list(iter_segments(pieces, 1000)) == segment_text(text, 1000)
+
+
+def test_whole_paragraphs_are_packed_up_to_the_budget():
+    text = sample_text()
+    segments = segment_text(text, 2000)
+    # Every segment but the last would have overflowed with the next paragraph added
+    assert len(segments) <= 2 * len(text) // 2000 + 1
+    for segment in segments[:-1]:
+        assert segment.endswith(('\n\n', '\n \n', '\r\n\r\n', '\n\n\n  '))
+
+
+def test_only_an_oversized_paragraph_is_cut_inside():
+    paragraph = 'A long sentence goes here. ' * 100
+    segments = segment_text('Short.\n\n' + paragraph + '\n\nTail.', 1000)
+    # The short paragraph is not split to fill its segment; the long one is cut at sentence ends
+    assert segments[0] == 'Short.\n\n'
+    assert all(segment.endswith('here. ') for segment in segments[1:-1])
+    assert segments[-1].endswith('here. \n\nTail.')
+
+
+def test_split_sentences_is_lossless_and_cores_have_no_line_breaks():
+    text = 'First one. Second one!\nA line\n\n  "Quoted." (Bracketed.) Last'
+    units = split_sentences(text)
+    assert ''.join(units) == text
+    for unit in units:
+        lead, core, trail = split_whitespace(unit)
+        assert lead + core + trail == unit
+        assert '\n' not in core
@@ -0,0 +1,55 @@
+import time
+
+from translation_cache import TranslationCache
+
+
+def test_memory_tier_is_an_lru():
+    cache = TranslationCache(path='', memory_entries=2)
+    cache.put('one', 'en', 'fr', 'b', 'un')
+    cache.put('two', 'en', 'fr', 'b', 'deux')
+    assert cache.get('one', 'en', 'fr', 'b') == ('un', None)
+    cache.put('three', 'en', 'fr', 'b', 'trois')
+    # 'two' was the least recently used
+    assert cache.get('two', 'en', 'fr', 'b') is None
+    assert cache.get('one', 'en', 'fr', 'b') == ('un', None)
+    assert cache.stats()['hits_memory'] == 2 and cache.stats()['misses'] == 1
+
+
+def test_keys_cover_language_pair_backend_and_unicode_spelling():
+    cache = TranslationCache(path='')
+    cache.put('caf\u00e9', 'en', 'fr', 'b', 'caf\u00e9!', 'en')
+    # The decomposed spelling of the same text shares the entry
+    assert cache.get('cafe\u0301', 'en', 'fr', 'b') == ('caf\u00e9!', 'en')
+    assert cache.get('caf\u00e9', 'en', 'de', 'b') is None
+    assert cache.get('caf\u00e9', 'en', 'fr', 'other') is None
+
+
+def test_disk_tier_survives_a_restart_and_promotes_hits(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = TranslationCache(path=path, memory_entries=1)
+    cache.put('hello', 'en', 'fr', 'b', 'bonjour')
+    cache.put('bye', 'en', 'fr', 'b', 'au revoir')
+    # Evicted from memory and not flushed yet: still found in the write queue
+    assert cache.get('hello', 'en', 'fr', 'b') == ('bonjour', None)
+    cache.flush()
+
+    reopened = TranslationCache(path=path)
+    assert reopened.get('bye', 'en', 'fr', 'b') == ('au revoir', None)
+    assert reopened.get('bye', 'en', 'fr', 'b') == ('au revoir', None)
+    assert (reopened.stats()['hits_disk'], reopened.stats()['hits_memory']) == (1, 1)
+
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    cache = TranslationCache(path=str(tmp_path / 'cache.sqlite3'), ttl=1)
+    cache.put('hello', 'en', 'fr', 'b', 'bonjour')
+    cache.flush()
+    assert cache.get('hello', 'en', 'fr', 'b') is not None
+    time.sleep(1.1)
+    assert cache.get('hello', 'en', 'fr', 'b') is None
+
+
+def test_detections_are_cached_apart_from_translations():
+    cache = TranslationCache(path='')
+    cache.put_detection('bonjour', 'b', 'fr')
+    assert cache.get_detection('bonjour', 'b') == 'fr'
+    assert cache.get('bonjour', 'auto', 'fr', 'b') is None
@@ -0,0 +1,225 @@
+import io
+import random
+import threading
+import time
+import zipfile
+
+from translation_engine import (CHUNK_SIZE, SpooledOutput, ZipBundle, incremental_translate, iter_decoded,
+                                translate_batch)
+
+
+def paragraphs(count: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    return ''.join(' '.join(f"Sentence {i}.{j} of the text." for j in range(rng.randint(20, 60))) + '\n\n'
+                   for i in range(count))
+
+
+def jittery(text, src_lang):
+    """Upper-cases like a backend whose answers arrive in random order"""
+    time.sleep(random.random() * 0.01)
+    return text.upper()
+
+
+def test_chunks_translated_concurrently_are_reassembled_in_order():
+    text = paragraphs(100)
+    assert len(text) > 10 * CHUNK_SIZE
+    [(output, errors)] = translate_batch([text], jittery, max_workers=8)
+    assert errors == []
+    assert output == text.upper()
+
+
+def test_whitespace_around_chunks_is_kept_verbatim():
+    text = '\n\n  First paragraph.  \n\n\n\tSecond paragraph.\n'
+    [(output, errors)] = translate_batch([text], lambda chunk, src_lang: f"<{chunk}>")
+    assert errors == []
+    assert output == '\n\n  <First paragraph.  \n\n\n\tSecond paragraph.>\n'
+
+
+def test_failed_chunks_are_retried():
+    attempts = {}
+    lock = threading.Lock()
+
+    def flaky(text, src_lang):
+        with lock:
+            attempts[text] = attempts.get(text, 0) + 1
+            if attempts[text] < 3:
+                raise ConnectionError("reset by peer")
+        return text.upper()
+
+    text = paragraphs(10)
+    [(output, errors)] = translate_batch([text], flaky, retries=2)
+    assert errors == []
+    assert output == text.upper()
+    assert set(attempts.values()) == {3}
+
+
+def test_a_chunk_that_keeps_failing_keeps_its_text_and_reports_its_index():
+    # Paragraphs too long to share a chunk
+    good, bad = 'Good sentence. ' * 200, 'Bad sentence. ' * 200
+    text = f"{good}\n\n{bad}\n\n{good}"
+
+    def failing(chunk, src_lang):
+        if 'Bad' in chunk:
+            raise RuntimeError("upstream said no")
+        return chunk.upper()
+
+    [(output, errors)] = translate_batch([text], failing, retries=1)
+    assert errors == [(1, "upstream said no")]
+    assert output == f"{good.upper()}\n\n{bad}\n\n{good.upper()}"
+
+
+def test_identical_chunks_are_translated_once():
+    calls = []
+    text = ('Same paragraph here.' + ' filler' * 600 + '\n\n') * 6
+    [(output, errors)] = translate_batch([text], lambda chunk, src_lang: calls.append(chunk) or chunk.upper())
+    assert output == text.upper()
+    assert len(calls) == 1
+
+
+def test_documents_share_one_pool_capped_at_max_workers():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def tracked(text, src_lang):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return text.upper()
+
+    documents = [f"File {i} has a single short paragraph." for i in range(12)]
+    start = time.monotonic()
+    results = translate_batch(documents, tracked, max_workers=4)
+    assert [output for output, _ in results] == [document.upper() for document in documents]
+    assert peak[0] == 4
+    # Twelve one-chunk files take about three rounds of the pool, not twelve
+    assert time.monotonic() - start < 12 * 0.05
+
+
+def test_every_document_is_reported_as_it_finishes():
+    finished, snapshots = [], []
+    documents = ['First file.', paragraphs(3), 'Third file.']
+    results = translate_batch(documents, lambda text, src_lang: text.upper(),
+                              on_file_done=lambda index, output, errors: finished.append((index, output)),
+                              on_progress=snapshots.append)
+    assert sorted(finished) == [(i, output) for i, (output, _) in enumerate(results)]
+    last = snapshots[-1]
+    assert last['done_files'] == last['total_files'] == 3
+    assert last['done_chunks'] == last['total_chunks']
+    assert last['done_bytes'] == last['total_bytes'] == sum(len(document.encode()) for document in documents)
+
+
+def test_streamed_uploads_match_whole_uploads():
+    text = paragraphs(30) + 'Ünïcödé café ☕ 日本語 text.\n'
+    data = text.encode('utf-8')
+    # Tiny blocks split multi-byte characters across reads
+    pieces = list(iter_decoded(io.BytesIO(data), block_size=7))
+    assert ''.join(pieces) == text
+    sink = SpooledOutput(max_memory=1024)
+    [(output, errors)] = translate_batch([iter(pieces)], lambda chunk, src_lang: chunk.upper(), sinks=[sink],
+                                         sizes=[len(data)])
+    assert output is sink and errors == []
+    assert sink.getvalue().decode('utf-8') == text.upper()
+    assert b''.join(sink.iter_blocks(100)) == sink.getvalue()
+    assert sink.preview == text.upper()[:sink.preview_chars]
+    sink.close()
+
+
+def test_an_undecodable_upload_fails_alone():
+    bad = iter_decoded(io.BytesIO(b'Valid start \xff\xfe not utf-8'))
+    results = translate_batch([bad, 'Fine file.'], lambda chunk, src_lang: chunk.upper())
+    [(_, bad_errors), (good_output, good_errors)] = results
+    assert [index for index, _ in bad_errors] == [None]
+    assert (good_output, good_errors) == ('FINE FILE.', [])
+
+
+def test_fan_out_reads_and_detects_each_document_once():
+    reads, detections, calls = [], [], []
+
+    def pieces(name, text):
+        reads.append(name)
+        yield text
+
+    def translate(text, src_lang, dest_lang):
+        calls.append((src_lang, dest_lang))
+        return f"[{dest_lang}] {text}"
+
+    def detect(sample):
+        detections.append(sample)
+        return 'en'
+
+    documents = [pieces('a', 'First document.'), pieces('b', 'Second document.')]
+    done = []
+    results = translate_batch(documents, translate, detect_fn=detect, dest_langs=['fr', 'de', 'es'],
+                              on_file_done=lambda index, output, errors, dest: done.append((index, dest)))
+    assert reads == ['a', 'b'] and len(detections) == 2
+    assert results[0] == [('[fr] First document.', []), ('[de] First document.', []), ('[es] First document.', [])]
+    assert results[1][2] == ('[es] Second document.', [])
+    assert sorted(calls) == sorted([('en', dest) for dest in ('fr', 'de', 'es')] * 2)
+    assert sorted(done) == [(index, dest) for index in (0, 1) for dest in ('de', 'es', 'fr')]
+
+
+class Recorder:
+    """translate_fn for incremental_translate that records what is sent"""
+
+    def __init__(self, merge_lines: bool = False):
+        self.sent = []
+        self.merge_lines = merge_lines
+
+    def __call__(self, text):
+        self.sent.append(text)
+        translated = text.upper()
+        return (translated.replace('\n', ' ') if self.merge_lines else translated), 'en'
+
+
+def test_only_edited_sentences_are_sent_again():
+    translate = Recorder()
+    text = "First sentence. Second sentence.\nThird sentence."
+    translation, detected, segments = incremental_translate(translate, text)
+    assert (translation, detected) == ("FIRST SENTENCE. SECOND SENTENCE.\nTHIRD SENTENCE.", 'en')
+    assert translate.sent == ["First sentence.\nSecond sentence.\nThird sentence."]
+
+    edited = "First sentence. Second one changed.\nThird sentence. New fourth."
+    translation, _, segments = incremental_translate(translate, edited, segments)
+    assert translation == "FIRST SENTENCE. SECOND ONE CHANGED.\nTHIRD SENTENCE. NEW FOURTH."
+    assert translate.sent[1:] == ["Second one changed.\nNew fourth."]
+
+    # Nothing changed: nothing is sent
+    assert incremental_translate(translate, edited, segments)[0] == translation
+    assert len(translate.sent) == 2
+
+
+def test_sentences_are_sent_one_by_one_when_the_backend_merges_lines():
+    translate = Recorder(merge_lines=True)
+    translation, _, _ = incremental_translate(translate, "One here. Two here. One here.")
+    assert translation == "ONE HERE. TWO HERE. ONE HERE."
+    # One joint request, then each distinct sentence once
+    assert translate.sent == ["One here.\nTwo here.", "One here.", "Two here."]
+
+
+def spooled(text: str) -> SpooledOutput:
+    output = SpooledOutput(max_memory=64)
+    output.write(text)
+    return output
+
+
+def test_bundle_holds_every_document_under_a_unique_name():
+    bundle = ZipBundle()
+    big = paragraphs(50)
+    names = [bundle.add('notes_fr.txt', spooled('Bonjour')), bundle.add('notes_fr.txt', spooled('Salut')),
+             bundle.add('README', spooled('Lisez-moi')), bundle.add('README', spooled('Encore')),
+             bundle.add('big_fr.txt', spooled(big))]
+    assert names == ['notes_fr.txt', 'notes_fr (2).txt', 'README', 'README (2)', 'big_fr.txt']
+    bundle.finalize()
+    bundle.finalize()
+    with zipfile.ZipFile(io.BytesIO(bundle.getvalue())) as archive:
+        assert archive.namelist() == names
+        assert archive.read('notes_fr (2).txt') == b'Salut'
+        assert archive.read('big_fr.txt').decode('utf-8') == big
+        assert archive.getinfo('big_fr.txt').compress_type == zipfile.ZIP_DEFLATED
+    assert bundle.count == 5 and bundle.size == sum(len(text.encode()) for text in
+                                                    ('Bonjour', 'Salut', 'Lisez-moi', 'Encore', big))
+    assert len(bundle.getvalue()) < bundle.size
+    bundle.close()
@@ -0,0 +1,48 @@
+import threading
+
+from translation_memory import TranslationMemory
+
+
+def test_exact_and_fuzzy_matches():
+    memory = TranslationMemory(path='', threshold=0.85)
+    memory.add([("The weather is lovely today.", "Il fait beau aujourd'hui.")], 'en', 'fr')
+    assert memory.lookup("The weather is lovely today.", 'en', 'fr').score == 1.0
+    fuzzy = memory.lookup("The weather is lovely today!", 'en', 'fr')
+    assert fuzzy.translation == "Il fait beau aujourd'hui." and 0.85 <= fuzzy.score < 1.0
+    assert memory.lookup("The weather is lovely today!", 'en', 'fr', threshold=1.0) is None
+    assert memory.lookup("The weather is lovely today.", 'en', 'de') is None
+    assert memory.stats()['hits_exact'] == 1 and memory.stats()['hits_fuzzy'] == 1
+
+
+def test_rows_are_written_in_batches_and_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'tm.sqlite3')
+    memory = TranslationMemory(path=path)
+    memory.add([("First sentence here.", "Première phrase ici.")], 'en', 'fr')
+    memory.add([("First sentence here.", "Première phrase, ici.")], 'en', 'fr')
+    # Queued rows are found before they reach the disk
+    assert memory.lookup("First sentence here.", 'en', 'fr').translation == "Première phrase, ici."
+    memory.flush()
+    reopened = TranslationMemory(path=path)
+    assert reopened.lookup("First sentence here.", 'en', 'fr').translation == "Première phrase, ici."
+    assert reopened.stats()['segments'] == 1
+
+
+def test_concurrent_adds_and_lookups():
+    memory = TranslationMemory(path='')
+    errors = []
+
+    def work(worker):
+        try:
+            for i in range(200):
+                memory.add([(f"Sentence number {i} from worker {worker}.", f"Phrase {i} {worker}.")], 'en', 'fr')
+                assert memory.lookup(f"Sentence number {i} from worker {worker}.", 'en', 'fr') is not None
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert memory.stats()['segments'] == 800
@@ -0,0 +1,232 @@
+"""Shared two-tier translation cache (in-process LRU + on-disk SQLite)"""
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+import metrics
+
+# Cache configuration (override through environment variables)
+CACHE_PATH = os.environ.get("TRANSLATION_CACHE_PATH", ".translation_cache.sqlite3")
+CACHE_MEMORY_ENTRIES = int(os.environ.get("TRANSLATION_CACHE_MEMORY_ENTRIES", "4096"))
+CACHE_MAX_ROWS = int(os.environ.get("TRANSLATION_CACHE_MAX_ROWS", "200000"))
+CACHE_TTL_SECONDS = int(os.environ.get("TRANSLATION_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# Pseudo target language under which language detections are cached
+DETECTION_TARGET = "_detect"
+
+# Run disk eviction once every N writes instead of on every insert
+PRUNE_EVERY = 500
+
+# New rows and last-access updates are committed to disk in batches of this
+# many, or once this many seconds have passed since the previous commit
+WRITE_BATCH = 64
+WRITE_INTERVAL_SECONDS = 1.0
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so equivalent Unicode spellings share a cache entry"""
+    return unicodedata.normalize("NFC", text)
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of the normalized text"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def cache_key(text: str, src_lang: str, dest_lang: str, backend: str) -> str:
+    """Build the cache key for a (text, source, target, backend) tuple"""
+    return f"{backend}:{src_lang}:{dest_lang}:{text_hash(text)}"
+
+
+class TranslationCache:
+    """Content-addressed translation cache shared by all sessions.
+
+    Lookups hit the in-memory LRU first and fall back to SQLite; disk hits are
+    promoted into memory. Entries expire after ``ttl`` seconds and the disk
+    tier is trimmed to ``max_rows`` least recently used entries.
+
+    Disk I/O never runs under the LRU lock, so memory hits do not wait on
+    SQLite. Writes and access-time updates are queued and committed in
+    batches (see ``flush``) rather than one commit per lookup or insert.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, memory_entries: int = CACHE_MEMORY_ENTRIES,
+                 max_rows: int = CACHE_MAX_ROWS, ttl: int = CACHE_TTL_SECONDS):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._pending = {}      # key -> row not yet written to disk
+        self._touched = {}      # key -> last access not yet written to disk
+        self._last_flush = time.time()
+        self._writes = 0
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS translations (
+                        key TEXT PRIMARY KEY,
+                        translation TEXT NOT NULL,
+                        detected TEXT,
+                        created_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                """)
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_translations_accessed ON translations (accessed_at)")
+                self._db.commit()
+            except sqlite3.Error:
+                # Fall back to a memory-only cache if the disk tier is unavailable
+                self._db = None
+        if self._db is not None:
+            atexit.register(self.flush)
+
+    def get(self, text: str, src_lang: str, dest_lang: str, backend: str) -> Optional[tuple]:
+        """Return ``(translation, detected_lang)`` or None on a miss"""
+        key = cache_key(text, src_lang, dest_lang, backend)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                translation, detected, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits_memory += 1
+                    metrics.inc('translation_cache_lookups_total', result='hit_memory')
+                    return translation, detected
+                del self._memory[key]
+
+        row = None
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    row = self._db.execute(
+                        "SELECT translation, detected, created_at FROM translations WHERE key = ?", (key,)
+                    ).fetchone()
+            except sqlite3.Error:
+                pass
+
+        with self._lock:
+            if row is None:
+                # Not written to disk yet, but possibly already evicted from memory
+                pending = self._pending.get(key)
+                row = pending[1:4] if pending is not None else None
+            if row is not None and now - row[2] <= self.ttl:
+                self._remember(key, row[0], row[1], row[2])
+                self._touched[key] = now
+                self.hits_disk += 1
+                metrics.inc('translation_cache_lookups_total', result='hit_disk')
+                flush = self._flush_due(now)
+            else:
+                self.misses += 1
+                metrics.inc('translation_cache_lookups_total', result='miss')
+                return None
+        if flush:
+            self.flush()
+        return row[0], row[1]
+
+    def put(self, text: str, src_lang: str, dest_lang: str, backend: str,
+            translation: str, detected: Optional[str] = None) -> None:
+        """Store a translation in both tiers (on disk with the next batch)"""
+        key = cache_key(text, src_lang, dest_lang, backend)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, translation, detected, now)
+            if self._db is None:
+                return
+            self._pending[key] = (key, translation, detected, now, now)
+            self._touched.pop(key, None)
+            flush = self._flush_due(now)
+        if flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """Commit queued rows and access times to disk in one transaction"""
+        with self._lock:
+            rows = list(self._pending.values())
+            touched = [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            self._pending.clear()
+            self._touched.clear()
+            self._last_flush = time.time()
+        if self._db is None or not (rows or touched):
+            return
+
+        with self._db_lock:
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO translations (key, translation, detected, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._db.executemany("UPDATE translations SET accessed_at = ? WHERE key = ?", touched)
+                self._db.commit()
+                writes = self._writes
+                self._writes += len(rows)
+                if self._writes // PRUNE_EVERY != writes // PRUNE_EVERY:
+                    self._prune(time.time())
+            except sqlite3.Error:
+                pass
+
+    def get_detection(self, text: str, backend: str) -> Optional[str]:
+        """Return the cached detected language of a text, if any"""
+        cached = self.get(text, 'auto', DETECTION_TARGET, backend)
+        return cached[0] if cached is not None else None
+
+    def put_detection(self, text: str, backend: str, language: str) -> None:
+        """Remember the detected language of a text"""
+        self.put(text, 'auto', DETECTION_TARGET, backend, language, language)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for display"""
+        with self._lock:
+            hits = self.hits_memory + self.hits_disk
+            total = hits + self.misses
+            return {
+                'hits': hits,
+                'hits_memory': self.hits_memory,
+                'hits_disk': self.hits_disk,
+                'misses': self.misses,
+                'hit_rate': hits / total if total else 0.0,
+                'memory_entries': len(self._memory),
+            }
+
+    def _flush_due(self, now: float) -> bool:
+        """Whether enough disk work is queued to commit it (lock held)"""
+        return (len(self._pending) + len(self._touched) >= WRITE_BATCH
+                or now - self._last_flush >= WRITE_INTERVAL_SECONDS)
+
+    def _remember(self, key: str, translation: str, detected: Optional[str], created_at: float) -> None:
+        """Insert into the memory tier, evicting the least recently used entry (lock held)"""
+        self._memory[key] = (translation, detected, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _prune(self, now: float) -> None:
+        """Drop expired rows and trim the disk tier to ``max_rows`` (disk lock held)"""
+        self._db.execute("DELETE FROM translations WHERE created_at < ?", (now - self.ttl,))
+        count = self._db.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        if count > self.max_rows:
+            self._db.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_rows,)
+            )
+        self._db.commit()
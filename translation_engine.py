@@ -0,0 +1,768 @@
+"""Streamlit-free translation core: cached upstream calls and concurrent chunk translation"""
+import codecs
+import io
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from difflib import SequenceMatcher
+from itertools import chain
+from typing import Callable, Iterable, Iterator, List, Optional, Union
+
+import metrics
+from extractors import apply_translations, get_extractor
+from language_detection import SAMPLE_CHARS, detect_language
+from rate_limiter import PRIORITY_BULK, RateLimiter, is_throttling_error
+from request_coalescing import RequestCoalescer
+from segmenter import MAX_SEGMENT_CHARS, iter_segments, segment_text, split_sentences, split_whitespace
+from translation_cache import DETECTION_TARGET, TranslationCache
+from translation_memory import TranslationMemory
+
+# Backend identifier used in translation cache keys
+TRANSLATION_BACKEND = "translatepy"
+
+# Maximum number of chunk translations in flight at once
+MAX_CONCURRENT_CHUNKS = int(os.environ.get("TRANSLATION_MAX_CONCURRENCY", "8"))
+
+# Maximum characters per upstream request
+CHUNK_SIZE = MAX_SEGMENT_CHARS
+
+# Uploads are read and decoded in blocks of this many bytes
+READ_BLOCK_SIZE = 64 * 1024
+
+# Translated output stays in memory up to this size, then spills to a temp file
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+# Characters of each document kept for previews
+PREVIEW_CHARS = 1000
+
+# How many times a failed chunk is resubmitted on its own
+CHUNK_RETRIES = int(os.environ.get("TRANSLATION_CHUNK_RETRIES", "2"))
+
+
+class UpstreamTranslator:
+    """Translator facade used by the engine for every upstream call.
+
+    Each ``translate``/``language`` call first waits for the rate limiter
+    (as ``user`` at ``priority``), then borrows a client from the pool only
+    for the duration of the call and, if a router is given, lets it pick
+    the backend. Throttling errors feed the limiter's adaptive backoff.
+    Hedged attempts (see ``BackendRouter.hedged``) each pass the limiter
+    and borrow their own client.
+    With a coalescer, concurrent identical translations share one call and
+    short texts may be micro-batched with other users' requests of the same
+    priority. A ``meter`` (see ``quota``) is charged for every request made
+    on the user's behalf, whether or not it ends up shared with others.
+    """
+
+    def __init__(self, pool, router=None, limiter: Optional[RateLimiter] = None,
+                 user: str = '', priority: int = PRIORITY_BULK, coalescer: Optional[RequestCoalescer] = None,
+                 meter=None):
+        self.pool = pool
+        self.router = router
+        self.limiter = limiter
+        self.user = user
+        self.priority = priority
+        self.coalescer = coalescer
+        self.meter = meter
+
+    def translate(self, text: str, destination_language: str, source_language: str = 'auto'):
+        if self.meter is not None:
+            self.meter.record(self.user, source_language, destination_language, len(text))
+        if self.coalescer is not None:
+            return self.coalescer.translate(self._translate, text, destination_language, source_language,
+                                            self.priority)
+        return self._translate(text, destination_language, source_language)
+
+    def _translate(self, text: str, destination_language: str, source_language: str):
+        return self._call('translate', text, destination_language, source_language)
+
+    def language(self, text: str):
+        if self.meter is not None:
+            self.meter.record(self.user, 'auto', DETECTION_TARGET, len(text))
+        return self._call('language', text)
+
+    def _call(self, method: str, *args):
+        if method == 'translate' and self.router is not None and self.router.hedge:
+            return self.router.hedged(lambda backend, hedge: self._attempt(method, args, backend, hedge))
+        return self._attempt(method, args)
+
+    def _attempt(self, method: str, args: tuple, backend: Optional[str] = None, hedge: bool = False):
+        """One upstream request on a client of its own (a hedge is metered as an extra request)"""
+        metrics.inc('translation_upstream_requests_total', method=method)
+        if method == 'translate':
+            metrics.inc('translation_characters_total', len(args[0]))
+            if hedge and self.meter is not None:
+                self.meter.record(self.user, args[2], args[1], len(args[0]))
+        if self.limiter is not None:
+            with metrics.span('translation_stage_seconds', stage='rate_limit_wait'):
+                self.limiter.acquire(self.user, self.priority)
+        try:
+            with metrics.span('translation_stage_seconds', stage='upstream', method=method), \
+                    self.pool.checkout() as translator:
+                target = self.router.bind(translator, backend) if self.router is not None else translator
+                result = getattr(target, method)(*args)
+        except Exception as e:
+            # A router sharing the limiter has already reported each throttled backend it tried
+            reported = method == 'translate' and self.router is not None and self.router.limiter is self.limiter
+            if self.limiter is not None and not reported and is_throttling_error(e):
+                self.limiter.report_throttled()
+            raise
+        if self.limiter is not None:
+            self.limiter.report_success()
+        return result
+
+
+def language_code(language) -> str:
+    """Return the short code for a translatepy Language (or pass strings through)"""
+    return getattr(language, 'alpha2', None) or getattr(language, 'id', None) or str(language)
+
+
+def detected_language(result) -> Optional[str]:
+    """Source language reported by a translation result, if the backend returned one"""
+    language = getattr(result, 'source_language', None)
+    if language is None:
+        return None
+    code = language_code(language)
+    return code if code and code != 'auto' else None
+
+
+# Whether the backend reports the detected source language in its translation
+# results; learned from the first auto-detect translation of the process
+_result_reports_source = None
+
+
+def translate_with_detection(translator, cache: Optional[TranslationCache], text: str, dest_lang: str) -> tuple:
+    """Translate with auto-detection in a single round trip where possible.
+
+    A cached or confident local detection pins the source language. Otherwise the detected
+    language is taken from the translation result; only when the backend
+    does not report it is ``translator.language`` called, concurrently with
+    the translation. Detections are cached by text hash.
+    """
+    global _result_reports_source
+
+    known = cache.get_detection(text, TRANSLATION_BACKEND) if cache is not None else None
+    if not known:
+        known = detect_language(text)
+    if known:
+        result = translator.translate(text, dest_lang, known)
+        return result.result, known
+
+    if _result_reports_source is False:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            detection = executor.submit(translator.language, text)
+            result = translator.translate(text, dest_lang)
+            detected = detected_language(result) or language_code(detection.result().result)
+    else:
+        result = translator.translate(text, dest_lang)
+        detected = detected_language(result)
+        _result_reports_source = detected is not None
+        if detected is None:
+            detected = language_code(translator.language(text).result)
+
+    if cache is not None and detected:
+        cache.put_detection(text, TRANSLATION_BACKEND, detected)
+    return result.result, detected
+
+
+def detect_source_language(translator, cache: Optional[TranslationCache], text: str) -> Optional[str]:
+    """Detect a document's language locally, falling back to one cached remote call"""
+    detected = detect_language(text)
+    if detected:
+        return detected
+
+    detected = cache.get_detection(text, TRANSLATION_BACKEND) if cache is not None else None
+    if detected:
+        return detected
+
+    try:
+        detected = language_code(translator.language(text).result)
+    except Exception:
+        return None
+    if cache is not None and detected:
+        cache.put_detection(text, TRANSLATION_BACKEND, detected)
+    return detected
+
+
+def cached_translate(translator, cache: Optional[TranslationCache], text: str, src_lang: str,
+                     dest_lang: str, detect: bool = True) -> tuple:
+    """Translate through the shared cache, returning (translation, detected source)"""
+    if cache is not None:
+        cached = cache.get(text, src_lang, dest_lang, TRANSLATION_BACKEND)
+        if cached is not None:
+            return cached
+
+    if src_lang == 'auto' and detect:
+        translation, detected = translate_with_detection(translator, cache, text, dest_lang)
+    elif src_lang == 'auto':
+        result = translator.translate(text, dest_lang)
+        translation, detected = result.result, detected_language(result)
+    else:
+        result = translator.translate(text, dest_lang, src_lang)
+        translation, detected = result.result, src_lang
+
+    if cache is not None:
+        cache.put(text, src_lang, dest_lang, TRANSLATION_BACKEND, translation, detected)
+    return translation, detected
+
+
+def memory_translate(translator, cache: Optional[TranslationCache], memory: Optional[TranslationMemory],
+                     text: str, src_lang: str, dest_lang: str, fuzzy: bool = False, detect: bool = True) -> tuple:
+    """Translate sentence by sentence through the translation memory.
+
+    Sentences found in the memory (exactly, or with ``fuzzy`` at or above its
+    threshold) are reused; only the remaining ones are sent upstream, in one
+    request with one sentence per line, and stored back. If the backend does
+    not keep the lines apart the whole text is translated as usual. Returns
+    (translation, detected source) like ``cached_translate``.
+    """
+    if memory is None:
+        return cached_translate(translator, cache, text, src_lang, dest_lang, detect)
+
+    # The memory is keyed by language pair, so the source must be known
+    language = src_lang
+    if language == 'auto':
+        language = detect_language(text) or (cache.get_detection(text, TRANSLATION_BACKEND) if cache else None)
+    if not language:
+        translation, detected = cached_translate(translator, cache, text, src_lang, dest_lang, detect)
+        if detected:
+            memory.add([(text.strip(), translation.strip())], detected, dest_lang)
+        return translation, detected
+
+    units = [split_whitespace(unit) for unit in split_sentences(text)]
+    threshold = None if fuzzy else 1.0
+    translations = {}
+    missing = []
+    for _, core, _ in units:
+        if core and core not in translations:
+            match = memory.lookup(core, language, dest_lang, threshold)
+            translations[core] = match.translation if match else None
+            if match is None:
+                missing.append(core)
+
+    if missing:
+        translated, _ = cached_translate(translator, cache, '\n'.join(missing), language, dest_lang, detect=False)
+        lines = translated.split('\n')
+        if len(lines) != len(missing):
+            translation, _ = cached_translate(translator, cache, text, language, dest_lang, detect=False)
+            memory.add([(text.strip(), translation.strip())], language, dest_lang)
+            return translation, language
+        pairs = [(core, line.strip()) for core, line in zip(missing, lines)]
+        memory.add(pairs, language, dest_lang)
+        translations.update(pairs)
+
+    return ''.join(lead + translations[core] + trail if core else lead for lead, core, trail in units), language
+
+
+def memory_suggestions(memory: TranslationMemory, text: str, src_lang: str, dest_lang: str) -> List[tuple]:
+    """(sentence, match) for sentences with a fuzzy but no exact translation memory match"""
+    language = detect_language(text) if src_lang == 'auto' else src_lang
+    if not language:
+        return []
+    suggestions = []
+    for unit in dict.fromkeys(split_sentences(text)):
+        _, core, _ = split_whitespace(unit)
+        if core and memory.lookup(core, language, dest_lang, threshold=1.0) is None:
+            match = memory.lookup(core, language, dest_lang)
+            if match is not None:
+                suggestions.append((core, match))
+    return suggestions
+
+
+def incremental_translate(translate_fn: Callable[[str], tuple], text: str,
+                          previous: Optional[List[tuple]] = None) -> tuple:
+    """Re-translate only the sentences that changed since the previous version of a text.
+
+    ``previous`` is the segment list returned by the last call for the same
+    language pair: (sentence, translation) pairs. The sentences of ``text``
+    are diffed against it; unchanged ones keep their translation and only
+    inserted or edited ones are sent through ``translate_fn(text) ->
+    (translation, detected)``, in one request with one sentence per line.
+    Returns (translation, detected source or None, segments).
+    """
+    previous = previous or []
+    units = [split_whitespace(unit) for unit in split_sentences(text)]
+    cores = [core for _, core, _ in units]
+    translations = [None] * len(units)
+
+    matcher = SequenceMatcher(None, [core for core, _ in previous], cores, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            for offset in range(j2 - j1):
+                translations[j1 + offset] = previous[i1 + offset][1]
+
+    changed = list(dict.fromkeys(core for core, translation in zip(cores, translations)
+                                 if core and translation is None))
+    detected = None
+    if changed:
+        translated, detected = translate_fn('\n'.join(changed))
+        lines = translated.split('\n')
+        if len(lines) != len(changed):
+            # The backend merged or split lines: translate the changed sentences one by one
+            lines = [translate_fn(core)[0] for core in changed]
+        fresh = {core: line.strip() for core, line in zip(changed, lines)}
+        translations = [fresh[core] if translation is None and core else translation
+                        for core, translation in zip(cores, translations)]
+
+    segments = [(core, translation or '') for core, translation in zip(cores, translations)]
+    translation = ''.join(lead + (translated or '') + trail for (lead, _, trail), translated in zip(units, translations))
+    return translation, detected, segments
+
+
+def split_chunks(content: str, size: int = CHUNK_SIZE) -> List[str]:
+    """Split content on paragraph/line/sentence boundaries into request-sized chunks"""
+    return segment_text(content, size)
+
+
+def join_chunks(chunks: List[str]) -> str:
+    """Reassemble translated chunks (separators are kept inside the chunks)"""
+    return ''.join(chunks)
+
+
+def iter_decoded(stream, encoding: str = 'utf-8', errors: str = 'strict',
+                 block_size: int = READ_BLOCK_SIZE) -> Iterator[str]:
+    """Read a binary stream block by block and decode it incrementally.
+
+    Multi-byte sequences split across blocks are carried over by the
+    incremental decoder, so no block boundary can corrupt a character.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    if hasattr(stream, 'seek'):
+        stream.seek(0)
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        with metrics.span('translation_stage_seconds', stage='decode'):
+            text = decoder.decode(block)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+class SpooledOutput:
+    """Translated document kept in memory while small and spilled to a temp file when large"""
+
+    def __init__(self, max_memory: int = SPOOL_MAX_MEMORY, preview_chars: int = PREVIEW_CHARS):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory, mode='w+b')
+        self._lock = threading.Lock()
+        self.preview_chars = preview_chars
+        self.preview = ''
+        self.size = 0
+
+    def write(self, text: str) -> None:
+        if len(self.preview) < self.preview_chars:
+            self.preview += text[:self.preview_chars - len(self.preview)]
+        data = text.encode('utf-8')
+        with self._lock:
+            self._file.write(data)
+        self.size += len(data)
+
+    def getvalue(self) -> bytes:
+        """Read back the whole document (for downloads)"""
+        with self._lock:
+            self._file.seek(0)
+            data = self._file.read()
+            self._file.seek(0, io.SEEK_END)
+        return data
+
+    def iter_blocks(self, block_size: int = READ_BLOCK_SIZE) -> Iterator[bytes]:
+        """Read back the document block by block (for copying it elsewhere)"""
+        with self._lock:
+            self._file.seek(0)
+            try:
+                while True:
+                    block = self._file.read(block_size)
+                    if not block:
+                        break
+                    yield block
+            finally:
+                self._file.seek(0, io.SEEK_END)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ZipBundle:
+    """ZIP archive of translated documents, built in a temp file as they finish.
+
+    ``add`` compresses a finished ``SpooledOutput`` into the archive block
+    by block, so no document is ever held in memory whole; ``finalize``
+    writes the archive's directory, after which ``getvalue`` returns it for
+    download. Names already in the archive get a numbered suffix.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._zip = zipfile.ZipFile(self._file, 'w', compression=zipfile.ZIP_DEFLATED)
+        self._lock = threading.Lock()
+        self._names = set()
+        self.count = 0
+        self.size = 0
+        self.finalized = False
+
+    def add(self, name: str, output: SpooledOutput) -> str:
+        """Compress one document into the archive and return its name there"""
+        with self._lock:
+            stem, dot, ext = name.rpartition('.')
+            unique, number = name, 1
+            while unique in self._names:
+                number += 1
+                unique = f"{stem} ({number}){dot}{ext}" if dot else f"{name} ({number})"
+            self._names.add(unique)
+            with metrics.span('translation_stage_seconds', stage='bundle'):
+                with self._zip.open(unique, 'w', force_zip64=output.size >= zipfile.ZIP64_LIMIT) as entry:
+                    for block in output.iter_blocks():
+                        entry.write(block)
+            self.count += 1
+            self.size += output.size
+            return unique
+
+    def finalize(self) -> None:
+        with self._lock:
+            if not self.finalized:
+                self._zip.close()
+                self.finalized = True
+
+    def getvalue(self) -> bytes:
+        """Read back the finished archive (for downloads)"""
+        with self._lock:
+            self._file.seek(0)
+            data = self._file.read()
+            self._file.seek(0, io.SEEK_END)
+        return data
+
+    def close(self) -> None:
+        self.finalize()
+        self._file.close()
+
+
+def plan_document(content: Union[str, Iterable[str]], filename: str = '') -> tuple:
+    """Return (chunks, assemble) for a document given as a string or a stream of text pieces.
+
+    Structured formats with an extractor need the whole document: only their
+    distinct text spans are sent upstream and ``assemble`` writes the
+    translations back into the original structure. Single-line spans are
+    packed one per line into chunks of up to ``CHUNK_SIZE`` characters, so a
+    file of many short strings takes as few requests as the same amount of
+    prose; longer or multi-line spans are segmented on their own. Plain text, and documents
+    the extractor cannot parse, are segmented as prose while they stream in;
+    ``assemble`` is None because the translated chunks are simply written out
+    in order.
+    """
+    pieces = [content] if isinstance(content, str) else content
+
+    extractor = get_extractor(filename)
+    if extractor is not None:
+        content = join_chunks(pieces)
+        pieces = [content]
+        try:
+            spans = extractor(content)
+        except ValueError:
+            spans = None
+
+        if spans is not None:
+            texts = list(dict.fromkeys(span.text for span in spans))
+            packed = []     # Lists of single-line texts, one chunk each
+            alone = []      # Texts segmented on their own
+            length = CHUNK_SIZE
+            for text in texts:
+                if '\n' in text or len(text) > CHUNK_SIZE:
+                    alone.append(text)
+                    continue
+                if length + 1 + len(text) > CHUNK_SIZE:
+                    packed.append([])
+                    length = -1
+                packed[-1].append(text)
+                length += 1 + len(text)
+            groups = [split_chunks(text) for text in alone]
+
+            def assemble(translated_chunks: List[str]) -> str:
+                translations = {}
+                for lines, chunk in zip(packed, translated_chunks):
+                    translated_lines = chunk.split('\n')
+                    if len(translated_lines) == len(lines):
+                        translations.update(zip(lines, (line.strip() for line in translated_lines)))
+                pos = len(packed)
+                for text, group in zip(alone, groups):
+                    translations[text] = join_chunks(translated_chunks[pos:pos + len(group)])
+                    pos += len(group)
+                return apply_translations(content, spans, translations)
+
+            return ['\n'.join(lines) for lines in packed] + [chunk for group in groups for chunk in group], assemble
+
+    return iter_segments(pieces, CHUNK_SIZE), None
+
+
+class _Document:
+    """Reading state of one source document in a batch"""
+
+    def __init__(self, index: int, size: int):
+        self.index = index
+        self.size = size
+        self.chunks = None
+        self.assemble = None
+        self.language = None
+        self.produced = 0
+        self.exhausted = False
+        self.outputs = []     # One _Output per target language
+
+
+class _Output:
+    """Write state of one document translated into one target language"""
+
+    def __init__(self, doc: _Document, dest_lang: Optional[str], sink):
+        self.doc = doc
+        self.dest_lang = dest_lang
+        self.sink = sink
+        self.done = 0
+        self.done_bytes = 0
+        self.finished = False
+        self.next_write = 0
+        self.pending = {}     # Finished chunks waiting for earlier ones (streamed prose)
+        self.results = []     # All translated chunks (structured documents)
+        self.errors = []
+
+
+def translate_batch(documents: List[Union[str, Iterable[str]]], translate_fn: Callable[..., str],
+                    filenames: Optional[List[str]] = None, src_lang: str = 'auto',
+                    detect_fn: Callable[[str], Optional[str]] = detect_language,
+                    sinks: Optional[list] = None, sizes: Optional[List[int]] = None,
+                    max_workers: int = MAX_CONCURRENT_CHUNKS, retries: int = CHUNK_RETRIES,
+                    on_progress: Optional[Callable[[dict], None]] = None,
+                    on_file_done: Optional[Callable[..., None]] = None,
+                    dest_langs: Optional[List[str]] = None) -> List:
+    """Translate several documents through one shared chunk queue.
+
+    Documents are strings or iterables of text pieces (see ``iter_decoded``).
+    Prose is segmented while it streams in and its translation is written to
+    the document's sink in order as soon as each chunk is ready, so memory
+    is bounded by the number of chunks in flight rather than document size.
+    ``sinks`` are objects with a ``write(str)`` method (``SpooledOutput``);
+    without them each document is collected into a string.
+
+    Chunks from every document share one pool capped at ``max_workers``
+    in-flight requests, so many small files finish in about the time of the
+    slowest one. ``filenames`` selects format-aware extraction per document
+    (see ``plan_document``). Only the text of each chunk is sent upstream as
+    ``translate_fn(text, source_language)``; its surrounding whitespace is
+    kept verbatim, and identical chunks in flight are translated once. A
+    failed chunk is resubmitted on its own up to ``retries`` times; if it
+    still fails it keeps its original text and the error is reported as
+    ``(chunk_index, message)``. A document that cannot be read at all gets a
+    ``(None, message)`` error.
+
+    With ``src_lang='auto'`` each document's language is detected once with
+    ``detect_fn`` on a sample of its text and pinned for all of its chunks;
+    documents that cannot be detected are sent with ``'auto'``.
+
+    With ``dest_langs`` each document is still read, segmented and detected
+    once, and every chunk is fanned out to all target languages through the
+    same queue as ``translate_fn(text, source_language, dest_lang)``. Then
+    ``sinks[i]`` is a list with one sink per target, ``on_file_done`` also
+    receives the target language, and each document's result is a list of
+    ``(output, errors)`` per target.
+
+    Callbacks run in the calling thread, which makes them safe for UI updates:
+    ``on_progress`` receives chunk and byte counters, retries and seconds
+    spent per stage (read, translate, assemble, wall) after every chunk and
+    ``on_file_done(index, output, errors)`` fires as soon as a document (in
+    one target language) is complete. Returns ``(output, errors)`` per document, where ``output`` is
+    the sink or, without sinks, the translated string.
+    """
+    fan_out = dest_langs is not None
+    targets = list(dest_langs) if fan_out else [None]
+    collect = sinks is None
+    if collect:
+        sinks = [[io.StringIO() for _ in targets] for _ in documents]
+    elif not fan_out:
+        sinks = [[sink] for sink in sinks]
+    names = filenames or [''] * len(documents)
+    if sizes is None:
+        sizes = [len(document.encode('utf-8')) if isinstance(document, str) else 0 for document in documents]
+
+    docs = []
+    for index in range(len(documents)):
+        doc = _Document(index, sizes[index])
+        doc.outputs = [_Output(doc, dest, sinks[index][t]) for t, dest in enumerate(targets)]
+        docs.append(doc)
+    progress = {
+        'done_chunks': 0,
+        'total_chunks': 0,
+        'done_bytes': 0,
+        'total_bytes': sum(sizes) * len(targets),
+        'done_files': 0,
+        'total_files': len(documents) * len(targets),
+        'retries': 0,
+        # Seconds spent per stage; chunk translations overlap, so 'translate' can exceed the wall time
+        'stage_seconds': {'read': 0.0, 'translate': 0.0, 'assemble': 0.0, 'wall': 0.0},
+    }
+    stage_seconds = progress['stage_seconds']
+    started = time.perf_counter()
+    in_flight = {}      # future -> ((text, language, dest, keep_lines), attempt)
+    waiting = {}        # (text, language, dest, keep_lines) -> [(output, chunk_index, chunk)]
+    limit = max(1, max_workers) * 4
+
+    def snapshot() -> dict:
+        stage_seconds['wall'] = time.perf_counter() - started
+        return {**progress, 'stage_seconds': dict(stage_seconds)}
+
+    def timed_translate(text: str, language: str, dest: Optional[str], keep_lines: bool) -> tuple:
+        """Translate one chunk in a worker, returning its duration with the result.
+
+        Chunks of structured documents (``keep_lines``) carry one text per
+        line; if the backend merges or splits lines they are translated one
+        by one so every line can be matched back to its text.
+        """
+        def translate(part: str) -> str:
+            return translate_fn(part, language) if dest is None else translate_fn(part, language, dest)
+
+        start = time.perf_counter()
+        with metrics.span('translation_stage_seconds', stage='chunk'):
+            translation = translate(text)
+            if keep_lines and translation.count('\n') != text.count('\n'):
+                translation = '\n'.join(translate(line) if line.strip() else line for line in text.split('\n'))
+        return translation, time.perf_counter() - start
+
+    def result(out: _Output):
+        return out.sink.getvalue() if collect else out.sink
+
+    def start(doc: _Document) -> None:
+        """Plan the document and pin its source language"""
+        chunks, doc.assemble = plan_document(documents[doc.index], names[doc.index])
+        doc.language = src_lang
+        if src_lang == 'auto':
+            # Buffer just enough leading chunks to detect the language from a sample
+            head, sample = [], ''
+            chunks = iter(chunks)
+            for chunk in chunks:
+                head.append(chunk)
+                sample += chunk
+                if len(sample) >= SAMPLE_CHARS:
+                    break
+            doc.language = detect_fn(sample[:SAMPLE_CHARS]) or 'auto'
+            chunks = chain(head, chunks)
+        doc.chunks = enumerate(chunks)
+
+    def finish(out: _Output) -> None:
+        doc = out.doc
+        if out.finished or not doc.exhausted or out.done < doc.produced:
+            return
+        out.finished = True
+        if doc.assemble is not None and not any(i is None for i, _ in out.errors):
+            start = time.perf_counter()
+            with metrics.span('translation_stage_seconds', stage='assemble'):
+                out.sink.write(doc.assemble(out.results))
+            stage_seconds['assemble'] += time.perf_counter() - start
+        progress['done_bytes'] += max(0, doc.size - out.done_bytes)
+        progress['done_files'] += 1
+        if on_progress:
+            on_progress(snapshot())
+        if on_file_done:
+            if fan_out:
+                on_file_done(doc.index, result(out), out.errors, out.dest_lang)
+            else:
+                on_file_done(doc.index, result(out), out.errors)
+
+    def deliver(out: _Output, i: int, text: str, chunk: str) -> None:
+        """Record a finished chunk and write out everything that is now in order"""
+        if out.doc.assemble is not None:
+            out.results[i] = text
+        else:
+            out.pending[i] = text
+            while out.next_write in out.pending:
+                out.sink.write(out.pending.pop(out.next_write))
+                out.next_write += 1
+        chunk_bytes = len(chunk.encode('utf-8'))
+        out.done += 1
+        out.done_bytes += chunk_bytes
+        progress['done_chunks'] += 1
+        progress['done_bytes'] += chunk_bytes
+        if out.doc.exhausted and out.done == out.doc.produced:
+            finish(out)
+        elif on_progress:
+            on_progress(snapshot())
+
+    def buffered() -> int:
+        return sum(len(out.pending) for doc in docs for out in doc.outputs)
+
+    def pull(executor) -> None:
+        """Submit chunks in document order until the in-flight limit is reached"""
+        for doc in docs:
+            while not doc.exhausted and len(in_flight) + buffered() < limit:
+                read_start = time.perf_counter()
+                chunk = None
+                try:
+                    if doc.chunks is None:
+                        start(doc)
+                    i, chunk = next(doc.chunks)
+                except StopIteration:
+                    pass
+                except Exception as e:
+                    # Unreadable document (e.g. invalid encoding): stop reading it
+                    for out in doc.outputs:
+                        out.errors.append((None, str(e)))
+
+                # Reading includes decoding, extraction and segmentation of the chunk
+                elapsed = time.perf_counter() - read_start
+                stage_seconds['read'] += elapsed
+                metrics.observe('translation_stage_seconds', elapsed, stage='segment', outcome='ok')
+                if chunk is None:
+                    doc.exhausted = True
+                    for out in doc.outputs:
+                        finish(out)
+                    break
+
+                doc.produced += 1
+                progress['total_chunks'] += len(doc.outputs)
+                _, core, _ = split_whitespace(chunk)
+                for out in doc.outputs:
+                    if doc.assemble is not None:
+                        out.results.append(chunk)
+                    if not core:
+                        deliver(out, i, chunk, chunk)  # Blank chunks stay as is
+                        continue
+                    key = (core, doc.language, out.dest_lang, doc.assemble is not None)
+                    if key in waiting:
+                        waiting[key].append((out, i, chunk))
+                        continue
+                    waiting[key] = [(out, i, chunk)]
+                    in_flight[executor.submit(timed_translate, *key)] = (key, 0)
+            if len(in_flight) + buffered() >= limit:
+                return
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pull(executor)
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, attempt = in_flight.pop(future)
+                try:
+                    translation, elapsed = future.result()
+                    stage_seconds['translate'] += elapsed
+                except Exception as e:
+                    if attempt < retries:
+                        progress['retries'] += 1
+                        metrics.inc('translation_chunk_retries_total')
+                        in_flight[executor.submit(timed_translate, *key)] = (key, attempt + 1)
+                        continue
+                    translation = None
+                    error = str(e)
+
+                for out, i, chunk in waiting.pop(key):
+                    if translation is None:
+                        out.errors.append((i, error))
+                        deliver(out, i, chunk, chunk)
+                    else:
+                        lead, _, trail = split_whitespace(chunk)
+                        deliver(out, i, lead + translation + trail, chunk)
+            pull(executor)
+
+    if fan_out:
+        return [[(result(out), out.errors) for out in doc.outputs] for doc in docs]
+    return [(result(doc.outputs[0]), doc.outputs[0].errors) for doc in docs]
@@ -0,0 +1,284 @@
+"""Sentence-level translation memory with exact and fuzzy (near-duplicate) lookup.
+
+Every translated sentence is stored per language pair in SQLite. Exact
+matches are found through a hash index; near-duplicates are found with
+MinHash signatures over character trigrams, bucketed with locality-sensitive
+hashing (LSH) so a lookup only inspects the few stored sentences that share a
+band with the query instead of scanning the whole memory. Candidates are then
+scored with an edit-based similarity ratio, the usual "fuzzy match" measure of
+translation memories.
+
+Only the in-memory indexes are read and updated under the lock: stored rows
+are fetched and candidates scored outside it, and new rows are committed in
+batches like the translation cache's (see ``TranslationMemory.flush``).
+"""
+import atexit
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+import metrics
+from translation_cache import WRITE_BATCH, WRITE_INTERVAL_SECONDS, normalize_text, text_hash
+
+# Memory configuration (override through environment variables)
+MEMORY_PATH = os.environ.get("TRANSLATION_MEMORY_PATH", ".translation_memory.sqlite3")
+
+# Fuzzy matches at or above this similarity are offered for reuse
+FUZZY_THRESHOLD = float(os.environ.get("TRANSLATION_MEMORY_FUZZY_THRESHOLD", "0.85"))
+
+# MinHash signature length, split into BANDS bands of ROWS values for LSH
+BANDS = 6
+ROWS = 3
+SHINGLE_SIZE = 3
+
+# Most similar LSH candidates verified per lookup
+MAX_CANDIDATES = 32
+
+# Sentences shorter than this are only matched exactly
+MIN_FUZZY_CHARS = 12
+
+_PRIME = (1 << 61) - 1
+_random = random.Random(1)  # Fixed seed: stored signatures must stay comparable across restarts
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(_PRIME)) for _ in range(BANDS * ROWS)]
+
+
+class Match(NamedTuple):
+    """A translation memory hit; ``score`` is 1.0 for exact matches"""
+    source: str
+    translation: str
+    score: float
+
+
+def _fuzzy_form(text: str) -> str:
+    """Case- and whitespace-insensitive form used for similarity"""
+    return ' '.join(normalize_text(text).lower().split())
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    """MinHash signature of the character trigrams of a text"""
+    form = _fuzzy_form(text)
+    if len(form) <= SHINGLE_SIZE:
+        shingles = {form}
+    else:
+        shingles = {form[i:i + SHINGLE_SIZE] for i in range(len(form) - SHINGLE_SIZE + 1)}
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def _bands(signature: Tuple[int, ...]):
+    return [hash(signature[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
+
+
+class _PairIndex:
+    """In-memory exact and LSH indexes of one language pair (rows live in SQLite)"""
+
+    def __init__(self):
+        self.exact = set()                          # source hashes
+        self.buckets = [{} for _ in range(BANDS)]   # band hash -> [source hash]
+
+    def add(self, source_hash: str, signature: Optional[Tuple[int, ...]]) -> None:
+        if source_hash in self.exact:
+            return
+        self.exact.add(source_hash)
+        if signature is not None:
+            for bucket, band in zip(self.buckets, _bands(signature)):
+                bucket.setdefault(band, []).append(source_hash)
+
+    def candidates(self, signature: Tuple[int, ...]) -> list:
+        """Source hashes sharing at least one band, most shared bands first"""
+        shared = Counter()
+        for bucket, band in zip(self.buckets, _bands(signature)):
+            shared.update(bucket.get(band, ()))
+        return [source_hash for source_hash, _ in shared.most_common(MAX_CANDIDATES)]
+
+
+class TranslationMemory:
+    """Translation memory shared by all sessions.
+
+    ``add`` stores (source, translation) sentence pairs for a language pair;
+    ``lookup`` returns the exact match or, failing that, the most similar
+    stored sentence scoring at least ``threshold``. Indexes are built lazily
+    per language pair from the database.
+    """
+
+    def __init__(self, path: str = MEMORY_PATH, threshold: float = FUZZY_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._indexes = {}
+        self._pending = {}      # (src, dest, source hash) -> row not yet written to disk
+        self._last_flush = time.time()
+        self.hits_exact = 0
+        self.hits_fuzzy = 0
+        self.misses = 0
+
+        try:
+            self._db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error:
+            # Keep a memory-only store if the database file is unavailable
+            self._db = sqlite3.connect(':memory:', check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                src TEXT NOT NULL,
+                dest TEXT NOT NULL,
+                source_hash TEXT NOT NULL,
+                source TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                signature BLOB,
+                created_at REAL NOT NULL,
+                UNIQUE (src, dest, source_hash)
+            )
+        """)
+        self._db.commit()
+        atexit.register(self.flush)
+
+    def lookup(self, source: str, src_lang: str, dest_lang: str,
+               threshold: Optional[float] = None) -> Optional[Match]:
+        """Best match for a sentence; pass ``threshold=1.0`` for exact matches only"""
+        threshold = self.threshold if threshold is None else threshold
+        index = self._index(src_lang, dest_lang)
+        source_hash = text_hash(source)
+        fuzzy = threshold < 1.0 and len(source) >= MIN_FUZZY_CHARS
+        signature = minhash(source) if fuzzy else None
+        with self._lock:
+            exact = source_hash in index.exact
+            candidates = [] if exact or not fuzzy else index.candidates(signature)
+
+        if exact:
+            row = self._rows(src_lang, dest_lang, [source_hash]).get(source_hash)
+            if row is not None:
+                self._count('exact')
+                return Match(row[0], row[1], 1.0)
+
+        best = None
+        form = _fuzzy_form(source)
+        for stored, translation in self._rows(src_lang, dest_lang, candidates).values():
+            matcher = SequenceMatcher(None, form, _fuzzy_form(stored), autojunk=False)
+            if matcher.quick_ratio() < threshold:
+                continue
+            score = matcher.ratio()
+            if score >= threshold and (best is None or score > best.score):
+                best = Match(stored, translation, score)
+        self._count('miss' if best is None else 'fuzzy')
+        return best
+
+    def add(self, pairs: Iterable[Tuple[str, str]], src_lang: str, dest_lang: str) -> None:
+        """Store translated sentence pairs (existing sources are updated; on disk with the next batch)"""
+        now = time.time()
+        rows = []
+        for source, translation in pairs:
+            if not source.strip() or not translation.strip():
+                continue
+            source = normalize_text(source)
+            signature = minhash(source) if len(source) >= MIN_FUZZY_CHARS else None
+            rows.append((text_hash(source), source, translation, signature))
+        if not rows:
+            return
+
+        index = self._index(src_lang, dest_lang)
+        with self._lock:
+            for source_hash, source, translation, signature in rows:
+                index.add(source_hash, signature)
+                self._pending[(src_lang, dest_lang, source_hash)] = (
+                    src_lang, dest_lang, source_hash, source, translation,
+                    array('Q', signature).tobytes() if signature else None, now
+                )
+            flush = len(self._pending) >= WRITE_BATCH or now - self._last_flush >= WRITE_INTERVAL_SECONDS
+        if flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """Commit queued rows to disk in one transaction"""
+        with self._lock:
+            rows = list(self._pending.values())
+            self._last_flush = time.time()
+        if not rows:
+            return
+        with self._db_lock:
+            try:
+                self._db.executemany(
+                    "INSERT INTO segments (src, dest, source_hash, source, translation, signature, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (src, dest, source_hash) DO UPDATE SET translation = excluded.translation",
+                    rows
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                return
+        with self._lock:
+            # Rows updated again while this batch was written stay queued
+            for row in rows:
+                key = row[:3]
+                if self._pending.get(key) is row:
+                    del self._pending[key]
+
+    def stats(self) -> dict:
+        """Hit/miss counters and memory size for display"""
+        self.flush()
+        with self._db_lock:
+            segments = self._db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        with self._lock:
+            lookups = self.hits_exact + self.hits_fuzzy + self.misses
+            return {
+                'segments': segments,
+                'hits_exact': self.hits_exact,
+                'hits_fuzzy': self.hits_fuzzy,
+                'misses': self.misses,
+                'hit_rate': (self.hits_exact + self.hits_fuzzy) / lookups if lookups else 0.0,
+            }
+
+    def _index(self, src_lang: str, dest_lang: str) -> _PairIndex:
+        """Index of a language pair, loaded from the database on first use"""
+        with self._lock:
+            index = self._indexes.get((src_lang, dest_lang))
+        if index is not None:
+            return index
+
+        loaded = _PairIndex()
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT source_hash, signature FROM segments WHERE src = ? AND dest = ?", (src_lang, dest_lang)
+            ).fetchall()
+        for source_hash, blob in rows:
+            loaded.add(source_hash, tuple(array('Q', blob)) if blob else None)
+        with self._lock:
+            # Another thread may have loaded (and added to) the index meanwhile
+            return self._indexes.setdefault((src_lang, dest_lang), loaded)
+
+    def _rows(self, src_lang: str, dest_lang: str, source_hashes: list) -> dict:
+        """(source, translation) of stored sentences by source hash, in the order asked for"""
+        found = {}
+        with self._lock:
+            for source_hash in source_hashes:
+                row = self._pending.get((src_lang, dest_lang, source_hash))
+                if row is not None:
+                    found[source_hash] = (row[3], row[4])
+        missing = [source_hash for source_hash in source_hashes if source_hash not in found]
+        if missing:
+            with self._db_lock:
+                rows = self._db.execute(
+                    f"SELECT source_hash, source, translation FROM segments WHERE src = ? AND dest = ?"
+                    f" AND source_hash IN ({', '.join('?' * len(missing))})",
+                    (src_lang, dest_lang, *missing)
+                ).fetchall()
+            found.update((source_hash, (source, translation)) for source_hash, source, translation in rows)
+        return {source_hash: found[source_hash] for source_hash in source_hashes if source_hash in found}
+
+    def _count(self, result: str) -> None:
+        with self._lock:
+            if result == 'exact':
+                self.hits_exact += 1
+            elif result == 'fuzzy':
+                self.hits_fuzzy += 1
+            else:
+                self.misses += 1
+        metrics.inc('translation_memory_lookups_total', result=result)
@@ -0,0 +1,161 @@
+"""Importable translation engine: text and file translation without Streamlit.
+
+``TranslationService`` wires the shared pieces of the stack (translator pool,
+backend router, rate limiter, request coalescer, cache and translation
+memory) and exposes the same text and file paths the Streamlit app uses. The
+app builds one from its process-wide resources; the command line (``cli.py``)
+and the HTTP API (``http_api.py``) build their own.
+"""
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from backend_router import BackendRouter
+from quota import Admission, QuotaManager
+from rate_limiter import PRIORITY_BULK, PRIORITY_INTERACTIVE, RateLimiter
+from request_coalescing import RequestCoalescer
+from translation_cache import TranslationCache
+from translation_engine import (MAX_CONCURRENT_CHUNKS, PREVIEW_CHARS, UpstreamTranslator, detect_source_language,
+                                incremental_translate, iter_decoded, memory_translate, translate_batch)
+from translation_memory import TranslationMemory
+from translator_pool import TranslatorPool
+
+# Files with these extensions must be valid UTF-8; other files are decoded leniently
+TEXT_EXTENSIONS = ('.txt', '.md', '.py', '.js', '.html', '.xml', '.json', '.csv')
+
+
+def decode_errors(filename: str, content_type: str = '') -> str:
+    """Decoding error policy for a file: strict for known text formats, lenient otherwise"""
+    if content_type == "text/plain" or filename.endswith(TEXT_EXTENSIONS):
+        return 'strict'
+    return 'ignore'
+
+
+def read_text(stream, filename: str = '', content_type: str = '',
+              previews: Optional[Dict[str, str]] = None) -> Iterator[str]:
+    """Stream a binary file as decoded text, optionally keeping its first characters in ``previews``"""
+    if previews is not None:
+        previews[filename] = ''
+    for piece in iter_decoded(stream, errors=decode_errors(filename, content_type)):
+        if previews is not None and len(previews[filename]) < PREVIEW_CHARS:
+            previews[filename] += piece[:PREVIEW_CHARS - len(previews[filename])]
+        yield piece
+
+
+def translated_filename(filename: str, dest_lang: str) -> str:
+    """Create the output name for a translated file"""
+    name_parts = filename.rsplit('.', 1)
+    if len(name_parts) == 2:
+        return f"{name_parts[0]}_translated_{dest_lang}.{name_parts[1]}"
+    return f"{filename}_translated_{dest_lang}.txt"
+
+
+class TranslationService:
+    """Text and file translation over one shared, thread-safe translation stack.
+
+    Components that are not given are created with their defaults, so
+    ``TranslationService()`` is a complete engine backed by translatepy and
+    the on-disk cache and translation memory. ``user`` arguments identify the
+    caller to the rate limiter's fair scheduling and, with a ``quota``, to
+    usage metering and budgets.
+    """
+
+    def __init__(self, pool: Optional[TranslatorPool] = None, router: Optional[BackendRouter] = None,
+                 limiter: Optional[RateLimiter] = None, coalescer: Optional[RequestCoalescer] = None,
+                 cache: Optional[TranslationCache] = None, memory: Optional[TranslationMemory] = None,
+                 quota: Optional[QuotaManager] = None, max_workers: int = MAX_CONCURRENT_CHUNKS):
+        self.pool = pool or TranslatorPool()
+        self.limiter = limiter or RateLimiter()
+        self.router = router or BackendRouter(limiter=self.limiter)
+        self.coalescer = coalescer or RequestCoalescer()
+        self.cache = cache or TranslationCache()
+        self.memory = memory or TranslationMemory()
+        self.quota = quota
+        self.max_workers = max_workers
+
+    def translator(self, user: str = '', priority: int = PRIORITY_BULK, meter=None) -> UpstreamTranslator:
+        """Rate limited, pooled, routed and metered translator (safe to use from worker threads)"""
+        return UpstreamTranslator(self.pool, self.router, self.limiter, user=user,
+                                  priority=priority, coalescer=self.coalescer, meter=meter or self.quota)
+
+    def admit(self, user: str, estimate: int, start: bool = False) -> Optional[Admission]:
+        """Admit a batch of about ``estimate`` characters (raises ``QuotaExceeded``); None without quotas.
+
+        With ``start`` the batch also takes one of the user's concurrency slots
+        now, or is refused when none is free.
+        """
+        return self.quota.admit(user, estimate, start) if self.quota is not None else None
+
+    def translate_text(self, text: str, src_lang: str, dest_lang: str, user: str = '',
+                       previous: Optional[list] = None, fuzzy: bool = False) -> tuple:
+        """Translate text, re-translating only sentences changed since ``previous``.
+
+        Returns (translation, detected language, segments); pass the segments
+        back as ``previous`` on the next call for the same language pair.
+        Raises ``QuotaExceeded`` when what has to be sent upstream (after the
+        cache, the translation memory and unchanged sentences) does not fit
+        in the user's budget.
+        """
+        translator = self.translator(user, PRIORITY_INTERACTIVE)
+        return incremental_translate(
+            lambda changed: memory_translate(translator, self.cache, self.memory, changed, src_lang, dest_lang,
+                                             fuzzy=fuzzy),
+            text, previous
+        )
+
+    def chunk_translator(self, dest_lang: str, user: str = '', fuzzy: bool = False,
+                         meter=None) -> Callable[[str, str], str]:
+        """Per-chunk translate function used for file content"""
+        translator = self.translator(user, PRIORITY_BULK, meter)
+
+        def translate_chunk(chunk: str, src_lang: str) -> str:
+            # Sentences already in the translation memory are not sent upstream again
+            translation, _ = memory_translate(translator, self.cache, self.memory, chunk, src_lang, dest_lang,
+                                              fuzzy=fuzzy, detect=False)
+            return translation
+
+        return translate_chunk
+
+    def multi_target_translator(self, dest_langs: List[str], user: str = '', fuzzy: bool = False,
+                                meter=None) -> Callable[[str, str, str], str]:
+        """Per-chunk translate function fanning one file out to several targets"""
+        translators = {dest_lang: self.chunk_translator(dest_lang, user, fuzzy, meter) for dest_lang in dest_langs}
+        return lambda chunk, src_lang, dest_lang: translators[dest_lang](chunk, src_lang)
+
+    def language_detector(self, user: str = '', meter=None) -> Callable[[str], Optional[str]]:
+        """Once-per-file source language detector used for auto-detect"""
+        translator = self.translator(user, PRIORITY_BULK, meter)
+        return lambda sample: detect_source_language(translator, self.cache, sample)
+
+    def translate_file_content(self, content: str, src_lang: str, dest_lang: str, filename: str = '',
+                               user: str = '', fuzzy: bool = False) -> tuple:
+        """Translate the content of one file; returns (translated content, chunk errors).
+
+        Raises ``QuotaExceeded`` when the file does not fit in the user's budget.
+        """
+        admission = self.admit(user, len(content), start=True)
+        with admission or nullcontext():
+            [result] = translate_batch(
+                [content], self.chunk_translator(dest_lang, user, fuzzy, admission), filenames=[filename],
+                src_lang=src_lang, detect_fn=self.language_detector(user, admission), max_workers=self.max_workers
+            )
+        return result
+
+    def translate_documents(self, documents: List[Union[str, Iterable[str]]], filenames: List[str],
+                            src_lang: str, dest_langs: List[str], user: str = '', fuzzy: bool = False,
+                            admission: Optional[Admission] = None, **options) -> List[list]:
+        """Translate many documents into several languages through one shared chunk queue.
+
+        Each document is read, segmented and detected once. With an
+        ``admission`` (see ``admit``) the batch first waits for a free
+        concurrency slot and its usage is charged against the reservation.
+        ``options`` are passed on to ``translate_batch`` (``sinks``,
+        ``sizes``, ``on_progress``, ``on_file_done``). Returns, per document,
+        a list of (output, errors) per target language.
+        """
+        options.setdefault('max_workers', self.max_workers)
+        with admission or nullcontext():
+            return translate_batch(
+                documents, self.multi_target_translator(dest_langs, user, fuzzy, admission), filenames=filenames,
+                src_lang=src_lang, detect_fn=self.language_detector(user, admission), dest_langs=list(dest_langs),
+                **options
+            )
@@ -0,0 +1,80 @@
+"""Process-wide pool of translatepy clients with keep-alive HTTP connections"""
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from requests.adapters import HTTPAdapter
+from translatepy import Translator
+from translatepy.utils.request import Request
+
+# Number of translator clients shared by all sessions
+POOL_SIZE = int(os.environ.get("TRANSLATOR_POOL_SIZE", "8"))
+
+# Keep-alive connections kept open per upstream host by each client
+HTTP_POOL_MAXSIZE = int(os.environ.get("TRANSLATOR_HTTP_POOL_MAXSIZE", "10"))
+
+
+def create_translator() -> Translator:
+    """Create a translator with its own pooled, keep-alive HTTP session"""
+    request = Request()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_MAXSIZE, pool_maxsize=HTTP_POOL_MAXSIZE)
+    request.session.mount('https://', adapter)
+    request.session.mount('http://', adapter)
+    return Translator(request=request)
+
+
+class TranslatorPool:
+    """Thread-safe pool of translator clients.
+
+    Clients are created lazily up to ``size`` and handed out one per caller
+    with ``checkout()``, which blocks while all of them are in use. The most
+    recently returned client is handed out first so its connections and
+    backend state stay warm.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, factory=create_translator):
+        self.size = max(1, size)
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    @contextmanager
+    def checkout(self, timeout: float = None):
+        """Borrow a translator for the duration of a ``with`` block"""
+        translator = self._acquire(timeout)
+        try:
+            yield translator
+        finally:
+            self._idle.put(translator)
+
+    def stats(self) -> dict:
+        """Pool usage for display"""
+        with self._lock:
+            created = self._created
+        idle = self._idle.qsize()
+        return {'size': self.size, 'created': created, 'in_use': created - idle}
+
+    def _acquire(self, timeout: float = None):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No translator available in the pool")